@@ -1,9 +1,18 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, domains
+from app.api.v1.endpoints import auth, domains, keywords, rankings, imports, analytics, backlinks, onpage, jobs, uploads, exports
 
 router = APIRouter()
 
 router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 router.include_router(domains.router, prefix="/domains", tags=["Domains"])
+router.include_router(keywords.router, prefix="/keywords", tags=["Keywords"])
+router.include_router(rankings.router, prefix="/rankings", tags=["Rankings"])
+router.include_router(imports.router, prefix="/import", tags=["Import"])
+router.include_router(backlinks.router, prefix="/backlinks", tags=["Backlinks"])
+router.include_router(onpage.router, prefix="/onpage", tags=["On-Page"])
+router.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+router.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+router.include_router(uploads.router, prefix="/uploads", tags=["Uploads"])
+router.include_router(exports.router, prefix="/export", tags=["Export"])
 
 __all__ = ["router"]
@@ -0,0 +1,71 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+from app.database import get_async_db, engine
+from app.models.auth import APIKeyPermission
+from app.models.analytics import DomainAnalyticsSnapshot
+from app.schemas.seo import DomainAnalytics
+from app.core.security import require_permissions, ensure_domain_access
+from app.services.domain_analytics import recompute, recompute_all, load_snapshot
+
+router = APIRouter()
+
+
+def _recompute(domain_id: int) -> dict:
+    with engine.begin() as conn:
+        recompute(conn, domain_id)
+        return load_snapshot(conn, domain_id)
+
+
+@router.get("/domains/{domain_id}", response_model=DomainAnalytics, tags=["Analytics"])
+async def get_domain_analytics(
+    domain_id: int,
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_REPORTS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Analytics do domínio (snapshot mantido pelos imports; leitura de uma linha).
+
+    updated_at/computed_at indicam a idade dos dados e is_stale=true avisa que
+    uma atualização falhou (use /recompute). Na primeira consulta o snapshot
+    é calculado por completo (inclui os dados anteriores a ele).
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+
+    result = await db.execute(
+        select(DomainAnalyticsSnapshot.__table__).where(DomainAnalyticsSnapshot.domain_id == domain_id)
+    )
+    snapshot = result.mappings().first()
+    if snapshot is None or snapshot["computed_at"] is None:
+        await db.close()
+        return DomainAnalytics(**await asyncio.to_thread(_recompute, domain_id))
+    return DomainAnalytics(**snapshot)
+
+
+@router.post("/domains/{domain_id}/recompute", response_model=DomainAnalytics, tags=["Analytics"])
+async def recompute_domain_analytics(
+    domain_id: int,
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_REPORTS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Recalcula o snapshot do domínio a partir das tabelas (reparo)
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    await db.close()
+
+    return DomainAnalytics(**await asyncio.to_thread(_recompute, domain_id))
+
+
+# ============= ADMIN =============
+
+@router.post("/recompute", tags=["Admin - Analytics"])
+async def recompute_all_analytics():
+    """
+    Recalcula os snapshots de analytics de todos os domínios
+    """
+    domains = await asyncio.to_thread(recompute_all, engine)
+    return {"message": "Snapshots recalculados", "domains": domains}
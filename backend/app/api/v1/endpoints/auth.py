@@ -1,33 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, tuple_
+from typing import List, Optional, Literal
 from datetime import datetime, timedelta
-from app.database import get_db
-from app.models.auth import Client, APIKey, APIKeyStatus, UsageLog
+import asyncio
+from app.database import get_async_db, engine
+from app.models.auth import Client, APIKey, APIKeyStatus, UsageLog, UsageRollup
 from app.schemas.auth import (
     ClientCreate, ClientUpdate, ClientResponse,
     APIKeyCreate, APIKeyResponse, APIKeyListItem,
-    UsageLogResponse, ClientInfoResponse
+    UsageLogResponse, ClientInfoResponse, UsageSummaryItem
 )
 from app.core.security import get_current_client, require_permissions
-from app.core.cache import Cache
+from app.core.cache import AsyncCache
+from app.core.auth_cache import AuthInvalidation
+from app.core.usage_counters import usage_counters
+from app.core.usage_rollups import bucket_start, rebuild_rollups
+from app.core.pagination import decode_cursor, paginate
 
 router = APIRouter()
 
 
+async def invalidate_client_auth_cache(client_id: int) -> None:
+    """
+    Remove do cache (Redis e L1 de todos os workers) as API Keys de um cliente
+    """
+    await AsyncCache.invalidate_tags(f"client:{client_id}")
+    await AuthInvalidation.client(client_id)
+
+
 # ============= CLIENT MANAGEMENT (Admin endpoints) =============
 
 @router.post("/clients", response_model=ClientResponse, tags=["Admin - Clients"])
 async def create_client(
     client_data: ClientCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Cria um novo cliente (empresa/departamento/sistema)
     """
     # Verifica se email já existe
-    existing = db.query(Client).filter(Client.email == client_data.email).first()
+    existing = await db.scalar(select(Client).where(Client.email == client_data.email))
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -36,40 +49,51 @@ async def create_client(
     
     client = Client(**client_data.model_dump())
     db.add(client)
-    db.commit()
-    db.refresh(client)
+    await db.commit()
+    await db.refresh(client)
     
     return client
 
 
 @router.get("/clients", response_model=List[ClientResponse], tags=["Admin - Clients"])
 async def list_clients(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     is_active: bool = Query(None),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor do header X-Next-Cursor (ignora skip)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Lista todos os clientes
+    Lista todos os clientes (ordenados por id)
+    
+    O cursor da próxima página vem no header X-Next-Cursor.
     """
-    query = db.query(Client)
+    query = select(Client).order_by(Client.id)
     
     if is_active is not None:
-        query = query.filter(Client.is_active == is_active)
+        query = query.where(Client.is_active == is_active)
     
-    clients = query.offset(skip).limit(limit).all()
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        query = query.where(Client.id > last_id)
+    else:
+        query = query.offset(skip)
+    
+    clients = (await db.scalars(query.limit(limit + 1))).all()
+    clients, _ = paginate(clients, limit, lambda c: [c.id], response)
     return clients
 
 
 @router.get("/clients/{client_id}", response_model=ClientResponse, tags=["Admin - Clients"])
 async def get_client(
     client_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Busca um cliente por ID
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.scalar(select(Client).where(Client.id == client_id))
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -82,12 +106,12 @@ async def get_client(
 async def update_client(
     client_id: int,
     client_data: ClientUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Atualiza informações de um cliente
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.scalar(select(Client).where(Client.id == client_id))
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,11 +123,11 @@ async def update_client(
         setattr(client, field, value)
     
     client.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(client)
+    await db.commit()
+    await db.refresh(client)
     
     # Limpa cache das API keys deste cliente
-    Cache.clear_pattern(f"api_key:client:{client_id}:*")
+    await invalidate_client_auth_cache(client_id)
     
     return client
 
@@ -111,23 +135,23 @@ async def update_client(
 @router.delete("/clients/{client_id}", tags=["Admin - Clients"])
 async def delete_client(
     client_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Deleta um cliente (e todas suas API keys)
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.scalar(select(Client).where(Client.id == client_id))
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cliente não encontrado"
         )
     
-    db.delete(client)
-    db.commit()
+    await db.delete(client)
+    await db.commit()
     
     # Limpa cache
-    Cache.clear_pattern(f"api_key:client:{client_id}:*")
+    await invalidate_client_auth_cache(client_id)
     
     return {"message": "Cliente deletado com sucesso"}
 
@@ -138,7 +162,7 @@ async def delete_client(
 async def create_api_key(
     client_id: int,
     key_data: APIKeyCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Cria uma nova API Key para um cliente
@@ -146,7 +170,7 @@ async def create_api_key(
     **IMPORTANTE**: A key completa é mostrada apenas uma vez. Guarde-a em local seguro!
     """
     # Verifica se cliente existe
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.scalar(select(Client).where(Client.id == client_id))
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -154,10 +178,12 @@ async def create_api_key(
         )
     
     # Verifica limite de keys
-    existing_keys = db.query(APIKey).filter(
-        APIKey.client_id == client_id,
-        APIKey.status == APIKeyStatus.ACTIVE
-    ).count()
+    existing_keys = await db.scalar(
+        select(func.count(APIKey.id)).where(
+            APIKey.client_id == client_id,
+            APIKey.status == APIKeyStatus.ACTIVE
+        )
+    )
     
     if existing_keys >= client.max_api_keys:
         raise HTTPException(
@@ -189,8 +215,8 @@ async def create_api_key(
     )
     
     db.add(api_key)
-    db.commit()
-    db.refresh(api_key)
+    await db.commit()
+    await db.refresh(api_key)
     
     # Retorna com a key completa
     return APIKeyResponse(
@@ -214,47 +240,52 @@ async def create_api_key(
 async def list_api_keys(
     client_id: int,
     status_filter: APIKeyStatus = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Lista todas as API Keys de um cliente
     """
-    query = db.query(APIKey).filter(APIKey.client_id == client_id)
+    query = select(APIKey).where(APIKey.client_id == client_id)
     
     if status_filter:
-        query = query.filter(APIKey.status == status_filter)
+        query = query.where(APIKey.status == status_filter)
     
-    keys = query.order_by(APIKey.created_at.desc()).all()
+    keys = await db.scalars(query.order_by(APIKey.created_at.desc()))
     
-    return [
-        APIKeyListItem(
+    items = []
+    for key in keys:
+        # Inclui os usos ainda não gravados pelo flusher
+        total_requests, last_used_at = usage_counters.merge(
+            key.id, key.total_requests, key.last_used_at
+        )
+        items.append(APIKeyListItem(
             id=key.id,
             name=key.name,
             key_preview=f"{key.key_prefix}_****{key.key_last_chars}",
             status=key.status,
             permissions=key.permissions,
             created_at=key.created_at,
-            last_used_at=key.last_used_at,
-            total_requests=key.total_requests,
+            last_used_at=last_used_at,
+            total_requests=total_requests,
             expires_at=key.expires_at
-        )
-        for key in keys
-    ]
+        ))
+    
+    return items
 
 
 @router.patch("/clients/{client_id}/api-keys/{key_id}/revoke", tags=["Admin - API Keys"])
 async def revoke_api_key(
     client_id: int,
     key_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Revoga uma API Key
     """
-    api_key = db.query(APIKey).filter(
+    api_key = await db.scalar(select(APIKey).where(
         APIKey.id == key_id,
         APIKey.client_id == client_id
-    ).first()
+    ))
     
     if not api_key:
         raise HTTPException(
@@ -264,10 +295,11 @@ async def revoke_api_key(
     
     api_key.status = APIKeyStatus.REVOKED
     api_key.revoked_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     # Limpa do cache
-    Cache.delete(f"api_key:{api_key.key_hash}")
+    await AsyncCache.invalidate_tags(f"api_key:{api_key.id}")
+    await AuthInvalidation.api_key(api_key.key_hash)
     
     return {"message": "API Key revogada com sucesso"}
 
@@ -276,15 +308,15 @@ async def revoke_api_key(
 async def delete_api_key(
     client_id: int,
     key_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Deleta permanentemente uma API Key
     """
-    api_key = db.query(APIKey).filter(
+    api_key = await db.scalar(select(APIKey).where(
         APIKey.id == key_id,
         APIKey.client_id == client_id
-    ).first()
+    ))
     
     if not api_key:
         raise HTTPException(
@@ -293,36 +325,73 @@ async def delete_api_key(
         )
     
     # Limpa do cache
-    Cache.delete(f"api_key:{api_key.key_hash}")
+    await AsyncCache.invalidate_tags(f"api_key:{api_key.id}")
+    await AuthInvalidation.api_key(api_key.key_hash)
     
-    db.delete(api_key)
-    db.commit()
+    await db.delete(api_key)
+    await db.commit()
     
     return {"message": "API Key deletada com sucesso"}
 
 
+# ============= USAGE ROLLUPS (Admin) =============
+
+@router.post("/usage/rollups/rebuild", tags=["Admin - Usage"])
+async def rebuild_usage_rollups(
+    start: datetime = Query(..., description="Início (alinhado ao dia)"),
+    end: datetime = Query(..., description="Fim (alinhado ao dia seguinte)")
+):
+    """
+    Recalcula os rollups de uso a partir de usage_logs (reparo/backfill).
+    A gravação dos logs de uso espera o fim do rebuild.
+    """
+    def rebuild() -> int:
+        with engine.begin() as conn:
+            return rebuild_rollups(conn, start, end)
+    
+    buckets = await asyncio.to_thread(rebuild)
+    return {"message": "Rollups recalculados", "buckets": buckets}
+
+
 # ============= AUTHENTICATED CLIENT ENDPOINTS =============
 
 @router.get("/me", response_model=ClientInfoResponse, tags=["Client Info"])
 async def get_my_info(
     auth_data: tuple = Depends(get_current_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retorna informações do cliente autenticado via API Key
     """
     client, api_key = auth_data
     
-    # Estatísticas de uso
-    total_requests_today = db.query(func.count(UsageLog.id)).filter(
-        UsageLog.client_id == client.id,
-        UsageLog.created_at >= datetime.utcnow().replace(hour=0, minute=0, second=0)
-    ).scalar()
+    # Contadores de uso vêm do banco (o snapshot do cache pode estar defasado)
+    # somados aos usos ainda não gravados pelo flusher
+    counters = (await db.execute(
+        select(APIKey.total_requests, APIKey.last_used_at).where(APIKey.id == api_key.id)
+    )).first()
+    total_requests, last_used_at = counters or (api_key.total_requests, api_key.last_used_at)
+    total_requests, last_used_at = usage_counters.merge(
+        api_key.id, total_requests, last_used_at
+    )
     
-    avg_response_time = db.query(func.avg(UsageLog.response_time_ms)).filter(
-        UsageLog.client_id == client.id,
-        UsageLog.created_at >= datetime.utcnow() - timedelta(days=7)
-    ).scalar()
+    # Estatísticas de uso (a partir dos rollups, sem varrer usage_logs)
+    now = datetime.utcnow()
+    total_requests_today = await db.scalar(select(func.sum(UsageRollup.request_count)).where(
+        UsageRollup.client_id == client.id,
+        UsageRollup.granularity == "day",
+        UsageRollup.bucket_start == bucket_start(now, "day")
+    ))
+    
+    week = (await db.execute(select(
+        func.sum(UsageRollup.request_count),
+        func.sum(UsageRollup.total_response_time_ms)
+    ).where(
+        UsageRollup.client_id == client.id,
+        UsageRollup.granularity == "hour",
+        UsageRollup.bucket_start >= bucket_start(now - timedelta(days=7), "hour")
+    ))).first()
+    avg_response_time = week[1] / week[0] if week and week[0] else None
     
     return ClientInfoResponse(
         client=ClientResponse.model_validate(client),
@@ -330,8 +399,8 @@ async def get_my_info(
             "name": api_key.name,
             "key_preview": f"{api_key.key_prefix}_****{api_key.key_last_chars}",
             "permissions": api_key.permissions,
-            "total_requests": api_key.total_requests,
-            "last_used": api_key.last_used_at.isoformat() if api_key.last_used_at else None,
+            "total_requests": total_requests,
+            "last_used": last_used_at.isoformat() if last_used_at else None,
             "expires_at": api_key.expires_at.isoformat() if api_key.expires_at else None
         },
         usage_summary={
@@ -347,20 +416,84 @@ async def get_my_info(
 
 @router.get("/usage/logs", response_model=List[UsageLogResponse], tags=["Client Info"])
 async def get_usage_logs(
+    response: Response,
     auth_data: tuple = Depends(get_current_client),
     limit: int = Query(100, ge=1, le=1000),
     skip: int = Query(0, ge=0),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Cursor do header X-Next-Cursor (ignora skip)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Retorna logs de uso da API Key autenticada
+    Retorna logs de uso da API Key autenticada (mais recentes primeiro)
+    
+    O cursor da próxima página vem no header X-Next-Cursor.
     """
     client, api_key = auth_data
     
-    logs = db.query(UsageLog).filter(
+    query = select(UsageLog).where(
         UsageLog.client_id == client.id
     ).order_by(
-        UsageLog.created_at.desc()
-    ).offset(skip).limit(limit).all()
+        UsageLog.created_at.desc(), UsageLog.id.desc()
+    )
     
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, 2)
+        query = query.where(
+            tuple_(UsageLog.created_at, UsageLog.id) < tuple_(last_created_at, last_id)
+        )
+    else:
+        query = query.offset(skip)
+    
+    logs = (await db.scalars(query.limit(limit + 1))).all()
+    logs, _ = paginate(logs, limit, lambda log: [log.created_at, log.id], response)
     return logs
+
+
+@router.get("/usage/summary", response_model=List[UsageSummaryItem], tags=["Client Info"])
+async def get_usage_summary(
+    auth_data: tuple = Depends(get_current_client),
+    granularity: Literal["hour", "day"] = Query("day"),
+    start: Optional[datetime] = Query(None, description="Default: 7 dias atrás"),
+    end: Optional[datetime] = Query(None, description="Default: agora"),
+    group_by: Literal["none", "endpoint", "api_key"] = Query("none"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Resumo de uso por hora/dia do cliente autenticado (a partir dos rollups)
+    """
+    client, _ = auth_data
+    
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=7)
+    
+    columns = [UsageRollup.bucket_start]
+    if group_by == "endpoint":
+        columns.append(UsageRollup.endpoint)
+    elif group_by == "api_key":
+        columns.append(UsageRollup.api_key_id)
+    
+    query = select(
+        *columns,
+        func.sum(UsageRollup.request_count).label("requests"),
+        func.sum(UsageRollup.error_count).label("errors"),
+        func.sum(UsageRollup.total_response_time_ms).label("total_response_time_ms")
+    ).where(
+        UsageRollup.client_id == client.id,
+        UsageRollup.granularity == granularity,
+        UsageRollup.bucket_start >= bucket_start(start, granularity),
+        UsageRollup.bucket_start < end
+    ).group_by(*columns).order_by(*columns)
+    
+    rows = (await db.execute(query)).mappings()
+    
+    return [
+        UsageSummaryItem(
+            bucket_start=row["bucket_start"],
+            endpoint=row.get("endpoint"),
+            api_key_id=row.get("api_key_id") or None,
+            requests=row["requests"],
+            errors=row["errors"],
+            avg_response_time_ms=round(row["total_response_time_ms"] / row["requests"], 2) if row["requests"] else 0
+        )
+        for row in rows
+    ]
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+import asyncio
+from app.database import engine
+from app.services.backlinks import backfill_backlink_hashes
+
+router = APIRouter()
+
+
+# ============= ADMIN =============
+
+@router.post("/hashes/backfill", tags=["Admin - Backlinks"])
+async def backfill_hashes():
+    """
+    Preenche url_hash dos backlinks antigos e remove as duplicatas
+    (migração para a deduplicação por hash)
+    """
+    stats = await asyncio.to_thread(backfill_backlink_hashes, engine)
+    return {"message": "Hashes de backlinks preenchidos", **stats}
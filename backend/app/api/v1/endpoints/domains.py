@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_async_db
 from app.models.domain import Domain
 from app.schemas.seo import DomainCreate, DomainUpdate, DomainResponse
 from app.core.security import get_current_client
+from app.core.pagination import decode_cursor, paginate
 
 router = APIRouter()
 
@@ -12,12 +14,12 @@ router = APIRouter()
 async def create_domain(
     domain_data: DomainCreate,
     auth_data: tuple = Depends(get_current_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Cria um novo domínio"""
     client, _ = auth_data
     
-    existing = db.query(Domain).filter(Domain.url == domain_data.url).first()
+    existing = await db.scalar(select(Domain).where(Domain.url == domain_data.url))
     if existing:
         raise HTTPException(status_code=400, detail="Domínio já existe")
     
@@ -27,38 +29,50 @@ async def create_domain(
         name=domain_data.name
     )
     db.add(domain)
-    db.commit()
-    db.refresh(domain)
+    await db.commit()
+    await db.refresh(domain)
     return domain
 
 @router.get("/", response_model=List[DomainResponse], tags=["Domains"])
 async def list_domains(
+    response: Response,
     auth_data: tuple = Depends(get_current_client),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Sem limite se omitido"),
+    cursor: Optional[str] = Query(None, description="Cursor do header X-Next-Cursor"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Lista domínios do cliente"""
+    """Lista domínios do cliente (cursor da próxima página no header X-Next-Cursor)"""
     client, api_key = auth_data
     
-    query = db.query(Domain).filter(Domain.client_id == client.id)
+    query = select(Domain).where(Domain.client_id == client.id).order_by(Domain.id)
     
     if api_key.allowed_domains_ids:
-        query = query.filter(Domain.id.in_(api_key.allowed_domains_ids))
+        query = query.where(Domain.id.in_(api_key.allowed_domains_ids))
     
-    return query.all()
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        query = query.where(Domain.id > last_id)
+    
+    if limit is None:
+        return (await db.scalars(query)).all()
+    
+    domains = (await db.scalars(query.limit(limit + 1))).all()
+    domains, _ = paginate(domains, limit, lambda d: [d.id], response)
+    return domains
 
 @router.get("/{domain_id}", response_model=DomainResponse, tags=["Domains"])
 async def get_domain(
     domain_id: int,
     auth_data: tuple = Depends(get_current_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Busca um domínio"""
     client, api_key = auth_data
     
-    domain = db.query(Domain).filter(
+    domain = await db.scalar(select(Domain).where(
         Domain.id == domain_id,
         Domain.client_id == client.id
-    ).first()
+    ))
     
     if not domain:
         raise HTTPException(status_code=404, detail="Domínio não encontrado")
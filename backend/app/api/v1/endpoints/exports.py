@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Literal, Optional
+from app.database import get_async_db
+from app.models.auth import APIKeyPermission
+from app.core.security import require_permissions, ensure_domain_access
+from app.services.exports import export_columns, export_rows
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+async def _export(dataset: str, domain_id: int, columns: Optional[str], export_format: str, gzip: bool,
+                  since: Optional[datetime], until: Optional[datetime], trailer: bool,
+                  auth_data: tuple, db: AsyncSession) -> StreamingResponse:
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    try:
+        selected = export_columns(dataset, columns)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # O export usa a própria conexão (cursor no servidor) enquanto envia
+    await db.close()
+
+    headers = {"Content-Disposition": f'attachment; filename="{dataset}_{domain_id}.{export_format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_rows(dataset, domain_id, selected, export_format, gzip, since, until, trailer),
+        media_type=MEDIA_TYPES[export_format],
+        headers=headers
+    )
+
+
+@router.get("/keywords", tags=["Export"])
+async def export_keywords(
+    domain_id: int = Query(..., description="Domínio"),
+    columns: Optional[str] = Query(None, description="Colunas separadas por vírgula (padrão: todas)"),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    gzip: bool = Query(False, description="Comprime a resposta (Content-Encoding: gzip)"),
+    since: Optional[datetime] = Query(None, description="last_updated a partir de"),
+    until: Optional[datetime] = Query(None, description="last_updated antes de"),
+    trailer: bool = Query(True, description="Última linha com o total de linhas exportadas"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_KEYWORDS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Todas as keywords do domínio em NDJSON ou CSV, enviadas em fluxo.
+
+    A resposta começa na hora e a memória do servidor não cresce com o
+    tamanho do export. A última linha é o trailer com o total
+    (`{"_trailer": {"row_count": N}}` ou `# row_count=N`); sem ela, o export
+    foi interrompido.
+    """
+    return await _export("keywords", domain_id, columns, export_format, gzip, since, until, trailer, auth_data, db)
+
+
+@router.get("/rankings", tags=["Export"])
+async def export_rankings(
+    domain_id: int = Query(..., description="Domínio"),
+    columns: Optional[str] = Query(None, description="Colunas separadas por vírgula (padrão: todas)"),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    gzip: bool = Query(False, description="Comprime a resposta (Content-Encoding: gzip)"),
+    since: Optional[datetime] = Query(None, description="checked_at a partir de"),
+    until: Optional[datetime] = Query(None, description="checked_at antes de"),
+    trailer: bool = Query(True, description="Última linha com o total de linhas exportadas"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_RANKINGS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Todos os rankings do domínio (histórico completo) em NDJSON ou CSV, enviados em fluxo"""
+    return await _export("rankings", domain_id, columns, export_format, gzip, since, until, trailer, auth_data, db)
+
+
+@router.get("/backlinks", tags=["Export"])
+async def export_backlinks(
+    domain_id: int = Query(..., description="Domínio"),
+    columns: Optional[str] = Query(None, description="Colunas separadas por vírgula (padrão: todas)"),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    gzip: bool = Query(False, description="Comprime a resposta (Content-Encoding: gzip)"),
+    since: Optional[datetime] = Query(None, description="last_seen a partir de"),
+    until: Optional[datetime] = Query(None, description="last_seen antes de"),
+    trailer: bool = Query(True, description="Última linha com o total de linhas exportadas"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_BACKLINKS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Todos os backlinks do domínio em NDJSON ou CSV, enviados em fluxo"""
+    return await _export("backlinks", domain_id, columns, export_format, gzip, since, until, trailer, auth_data, db)
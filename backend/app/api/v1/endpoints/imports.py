@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, Query, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+import asyncio
+from app.database import get_async_db
+from app.models.auth import APIKeyPermission
+from app.schemas.seo import ImportResult
+from app.core.security import require_permissions, ensure_domain_access
+from app.services.uploads import resolve_import_file, release_import_file, save_batch_uploads, remove_upload
+from app.services.importers.semrush_importer import import_semrush_csv
+from app.services.importers.batch import import_semrush_batch
+
+router = APIRouter()
+
+
+@router.post("/semrush/{import_type}", response_model=ImportResult, tags=["Import"])
+async def import_semrush(
+    import_type: Literal["keywords", "rankings", "backlinks"],
+    domain_id: int = Query(..., description="Domínio que recebe os dados"),
+    file: Optional[UploadFile] = File(None, description="CSV ou planilha .xlsx exportada do SemRush"),
+    upload_id: Optional[str] = Query(None, description="Upload em partes já completo (POST /uploads), no lugar de file"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Importa um CSV ou planilha .xlsx do SemRush (keywords, rankings ou backlinks)
+    para um domínio.
+    
+    O arquivo é gravado em disco e processado em blocos; linhas inválidas são
+    ignoradas e listadas em `errors`, com a taxa de linhas/segundo no resultado.
+    Arquivos grandes podem vir de um upload em partes (`upload_id`), que só é
+    removido quando o import termina. Um import interrompido continua do
+    último bloco gravado quando o mesmo arquivo (mesmo conteúdo) é importado
+    de novo para o domínio, reenviado ou pelo mesmo `upload_id`.
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    
+    # Libera a conexão antes do import, que pode demorar
+    await db.close()
+    
+    path = await resolve_import_file(file, upload_id, client.id, prefix=f"semrush_{import_type}")
+    result = None
+    try:
+        result = await asyncio.to_thread(import_semrush_csv, path, domain_id, import_type)
+        return result
+    finally:
+        release_import_file(path, upload_id, done=result is not None and result.success)
+
+
+@router.post("/semrush/{import_type}/batch", response_model=List[ImportResult], tags=["Import"])
+async def import_semrush_files(
+    import_type: Literal["keywords", "rankings", "backlinks"],
+    domain_id: List[int] = Query(..., description="Um domínio para todos os arquivos ou um por arquivo, na ordem"),
+    files: List[UploadFile] = File(..., description="CSVs ou planilhas .xlsx exportados do SemRush"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Importa vários arquivos do SemRush de uma vez (ex.: um export por domínio).
+
+    A leitura e a validação rodam em paralelo em IMPORT_PARSE_WORKERS processos
+    e a gravação em um único writer; devolve um ImportResult por arquivo, na
+    ordem do envio.
+    """
+    client, api_key = auth_data
+    for target in set(domain_id):
+        await ensure_domain_access(target, client, api_key, db)
+
+    await db.close()
+
+    targets = await save_batch_uploads(files, domain_id, prefix=f"semrush_{import_type}")
+    try:
+        results = await asyncio.to_thread(import_semrush_batch, targets, import_type)
+    finally:
+        for path, _ in targets:
+            remove_upload(path)
+    for result, file in zip(results, files):
+        result.filename = file.filename
+    return results
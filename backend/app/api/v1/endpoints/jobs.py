@@ -0,0 +1,218 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File, status
+from sqlalchemy import select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional, Dict, Any
+import asyncio
+from app.config import settings
+from app.database import get_async_db
+from app.models.auth import APIKeyPermission
+from app.models.job import Job, JobStatus
+from app.schemas.seo import JobResponse
+from app.core.security import get_current_client, require_permissions, ensure_domain_access
+from app.core.pagination import decode_cursor, paginate
+from app.services.uploads import resolve_import_file, release_import_file, save_batch_uploads, remove_upload
+from app.services.jobs import submit_job, cancel_job, JobLimitExceeded
+
+router = APIRouter()
+
+
+async def _submit(db: AsyncSession, client_id: int, job_type: str, domain_id: int,
+                  params: Dict[str, Any]) -> Job:
+    """Envia o job e devolve a linha gravada (status atual)"""
+    # Libera a conexão: no modo eager o job roda durante a submissão
+    await db.close()
+    try:
+        job_id = await asyncio.to_thread(submit_job, client_id, job_type, domain_id, params)
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fila de jobs indisponível"
+        )
+    return await db.get(Job, job_id)
+
+
+async def _client_job(db: AsyncSession, job_id: str, client_id: int) -> Job:
+    job = await db.scalar(select(Job).where(Job.id == job_id, Job.client_id == client_id))
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    return job
+
+
+# ============= SUBMISSÃO =============
+
+@router.post("/import/semrush/{import_type}", response_model=JobResponse,
+             status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_semrush_import(
+    import_type: Literal["keywords", "rankings", "backlinks"],
+    domain_id: int = Query(..., description="Domínio que recebe os dados"),
+    file: Optional[UploadFile] = File(None, description="CSV ou planilha .xlsx exportada do SemRush"),
+    upload_id: Optional[str] = Query(None, description="Upload em partes já completo (POST /uploads), no lugar de file"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Import de CSV (ou .xlsx) do SemRush em background: o arquivo é gravado e o job
+    devolvido na hora; o ImportResult fica em `result` do job.
+    Se o worker cair no meio, o job é reassumido e continua do último bloco
+    gravado (um ImportResult só, do arquivo inteiro).
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+
+    path = await resolve_import_file(file, upload_id, client.id, prefix=f"semrush_{import_type}")
+    params = {"path": path, "import_type": import_type, "upload_id": upload_id}
+    try:
+        return await _submit(db, client.id, "semrush_import", domain_id, params)
+    except HTTPException:
+        release_import_file(path, upload_id, done=False)
+        raise
+
+
+@router.post("/import/semrush/{import_type}/batch", response_model=JobResponse,
+             status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_semrush_batch_import(
+    import_type: Literal["keywords", "rankings", "backlinks"],
+    domain_id: List[int] = Query(..., description="Um domínio para todos os arquivos ou um por arquivo, na ordem"),
+    files: List[UploadFile] = File(..., description="CSVs ou planilhas .xlsx exportados do SemRush"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Import em lote em background (mesmo processamento de POST
+    /import/semrush/{tipo}/batch); os ImportResult, um por arquivo, ficam em
+    `result.results` do job.
+    """
+    client, api_key = auth_data
+    for target in set(domain_id):
+        await ensure_domain_access(target, client, api_key, db)
+
+    targets = await save_batch_uploads(files, domain_id, prefix=f"semrush_{import_type}")
+    params = {
+        "import_type": import_type,
+        "files": [
+            {"path": path, "domain_id": target, "filename": file.filename}
+            for (path, target), file in zip(targets, files)
+        ],
+    }
+    try:
+        return await _submit(db, client.id, "semrush_import_batch",
+                             domain_id[0] if len(set(domain_id)) == 1 else None, params)
+    except HTTPException:
+        for path, _ in targets:
+            remove_upload(path)
+        raise
+
+
+@router.post("/crawl", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_crawl(
+    domain_id: int = Query(..., description="Domínio"),
+    max_pages: Optional[int] = Query(None, ge=1, le=10000, description="Padrão: CRAWLER_MAX_PAGES"),
+    full: bool = Query(False, description="Ignora o recrawl incremental e regrava todas as páginas"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Crawl do site do domínio em background (mesmo resultado de POST /onpage/crawl)"""
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    return await _submit(db, client.id, "crawl", domain_id, {
+        "max_pages": max_pages or settings.CRAWLER_MAX_PAGES, "full": full
+    })
+
+
+@router.post("/onpage/analyze", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_onpage_analyze(
+    domain_id: int = Query(..., description="Domínio"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Análise on-page das páginas gravadas em background"""
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    return await _submit(db, client.id, "onpage_analyze", domain_id, {})
+
+
+@router.post("/analytics/recompute", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_analytics_recompute(
+    domain_id: int = Query(..., description="Domínio"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_REPORTS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Recálculo completo do snapshot de analytics em background"""
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    return await _submit(db, client.id, "analytics_recompute", domain_id, {})
+
+
+@router.post("/enrichment/refresh", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_enrichment_refresh(
+    domain_id: int = Query(..., description="Domínio"),
+    days: Optional[int] = Query(None, ge=1, le=480, description="Janela do GSC (padrão: ENRICHMENT_GSC_DAYS)"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.WRITE_KEYWORDS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Recálculo do enriquecimento SemRush + GSC em background"""
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    return await _submit(db, client.id, "enrichment_refresh", domain_id, {"days": days})
+
+
+# ============= ACOMPANHAMENTO =============
+
+@router.get("", response_model=List[JobResponse], tags=["Jobs"])
+async def list_jobs(
+    response: Response,
+    job_status: Optional[JobStatus] = Query(None, alias="status"),
+    domain_id: Optional[int] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor do header X-Next-Cursor"),
+    auth_data: tuple = Depends(get_current_client),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Jobs do cliente, dos mais recentes para os mais antigos"""
+    client, _ = auth_data
+
+    query = select(Job).where(Job.client_id == client.id)
+    if job_status:
+        query = query.where(Job.status == job_status)
+    if domain_id is not None:
+        query = query.where(Job.domain_id == domain_id)
+    if cursor:
+        last_created, last_id = decode_cursor(cursor, 2)
+        query = query.where(or_(
+            Job.created_at < last_created,
+            and_(Job.created_at == last_created, Job.id < last_id)
+        ))
+
+    jobs = (await db.execute(query.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1))).scalars().all()
+    jobs, _ = paginate(jobs, limit, lambda job: [job.created_at, job.id], response)
+    return jobs
+
+
+@router.get("/{job_id}", response_model=JobResponse, tags=["Jobs"])
+async def get_job(
+    job_id: str,
+    auth_data: tuple = Depends(get_current_client),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Status, progresso, ETA e resultado do job"""
+    client, _ = auth_data
+    return await _client_job(db, job_id, client.id)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse, tags=["Jobs"])
+async def cancel(
+    job_id: str,
+    auth_data: tuple = Depends(get_current_client),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Cancela o job: na fila, na hora; em execução, o job para na próxima
+    atualização de progresso (o que já foi gravado fica).
+    """
+    client, _ = auth_data
+    await db.close()
+    if not await asyncio.to_thread(cancel_job, job_id, client.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    return await _client_job(db, job_id, client.id)
@@ -0,0 +1,175 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+import asyncio
+import time
+from app.config import settings
+from app.database import get_async_db, engine
+from app.models.auth import APIKeyPermission
+from app.models.analytics import KeywordEnrichment
+from app.models.job import Job, ACTIVE_JOB_STATUSES
+from app.schemas.seo import (
+    KeywordBulkCreate, KeywordBulkResult, EnrichedKeyword, EnrichmentResult, SearchPerformanceBulkCreate
+)
+from app.core.security import require_permissions, ensure_domain_access
+from app.core.pagination import decode_cursor, paginate
+from app.services.keywords import bulk_upsert_keywords
+from app.services.enrichment import refresh_enrichment, source_size, upsert_search_performance
+from app.services.jobs import submit_job, JobLimitExceeded
+
+router = APIRouter()
+
+# Ordenações do enriquecimento (sempre desc; id desempata). Métricas do GSC
+# nulas (keyword só no SemRush) vão para o fim.
+ENRICHED_SORTS = {
+    "search_volume": KeywordEnrichment.search_volume,
+    "real_impressions": func.coalesce(KeywordEnrichment.real_impressions, -1),
+    "real_clicks": func.coalesce(KeywordEnrichment.real_clicks, -1),
+    "volume_vs_impressions_ratio": func.coalesce(KeywordEnrichment.volume_vs_impressions_ratio, -1.0),
+}
+
+
+@router.post("/bulk", response_model=KeywordBulkResult, tags=["Keywords"])
+async def bulk_upsert(
+    data: KeywordBulkCreate,
+    domain_id: int = Query(..., description="Domínio das keywords"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.WRITE_KEYWORDS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Cria ou atualiza keywords em lote (chave: domínio + keyword).
+    
+    Keywords com as mesmas métricas já gravadas não são reescritas; o retorno
+    traz as contagens de inseridas, atualizadas e inalteradas por lote.
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    await db.close()
+    
+    started_at = time.perf_counter()
+    rows = [keyword.model_dump() for keyword in data.keywords]
+    batches = await asyncio.to_thread(bulk_upsert_keywords, domain_id, rows)
+    
+    return KeywordBulkResult(
+        domain_id=domain_id,
+        total=len(rows),
+        inserted=sum(b["inserted"] for b in batches),
+        updated=sum(b["updated"] for b in batches),
+        unchanged=sum(b["unchanged"] for b in batches),
+        batches=batches,
+        duration_seconds=round(time.perf_counter() - started_at, 3)
+    )
+
+
+@router.post("/performance/bulk", tags=["Keywords"])
+async def bulk_upsert_performance(
+    data: SearchPerformanceBulkCreate,
+    domain_id: int = Query(..., description="Domínio"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.WRITE_KEYWORDS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Grava o desempenho diário por query do Google Search Console
+    (domínio + query + dia; reenvios sobrescrevem)
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    await db.close()
+    
+    rows = [row.model_dump() for row in data.rows]
+    
+    def write() -> int:
+        with engine.begin() as conn:
+            return upsert_search_performance(conn, domain_id, rows)
+    
+    written = await asyncio.to_thread(write)
+    return {"message": "Desempenho gravado", "domain_id": domain_id, "rows": written}
+
+
+@router.post("/enriched/refresh", response_model=EnrichmentResult, tags=["Keywords"])
+async def refresh_enriched_keywords(
+    domain_id: int = Query(..., description="Domínio"),
+    days: Optional[int] = Query(None, ge=1, le=480, description="Janela do GSC (padrão: ENRICHMENT_GSC_DAYS)"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.WRITE_KEYWORDS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Recalcula o cruzamento SemRush + GSC do domínio
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    await db.close()
+    
+    return await asyncio.to_thread(refresh_enrichment, domain_id, days)
+
+
+@router.get("/enriched", response_model=List[EnrichedKeyword], tags=["Keywords"])
+async def list_enriched_keywords(
+    response: Response,
+    domain_id: int = Query(..., description="Domínio"),
+    sort: Literal["search_volume", "real_impressions", "real_clicks", "volume_vs_impressions_ratio"] = Query("search_volume"),
+    data_freshness: Optional[Literal["semrush", "gsc", "enriched"]] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor do header X-Next-Cursor"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_KEYWORDS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Keywords enriquecidas (SemRush + GSC), em ordem decrescente da métrica
+    escolhida; cursor da próxima página no header X-Next-Cursor.
+    
+    Na primeira consulta de um domínio ainda sem enriquecimento, o cálculo é
+    feito na hora se as fontes tiverem até ENRICHMENT_INLINE_MAX_KEYWORDS
+    keywords; acima disso vai para um job enrichment_refresh e o header
+    X-Pending-Enrichment informa o tamanho das fontes.
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    
+    if cursor is None:
+        computed = await db.scalar(
+            select(KeywordEnrichment.id).where(KeywordEnrichment.domain_id == domain_id).limit(1)
+        )
+        if computed is None:
+            await db.close()
+            
+            def count_sources() -> int:
+                with engine.connect() as conn:
+                    return source_size(conn, domain_id)
+            
+            pending = await asyncio.to_thread(count_sources)
+            # Domínio sem keywords nem GSC: nada a calcular
+            if pending and pending <= settings.ENRICHMENT_INLINE_MAX_KEYWORDS:
+                await asyncio.to_thread(refresh_enrichment, domain_id)
+            elif pending:
+                response.headers["X-Pending-Enrichment"] = str(pending)
+                running = await db.scalar(
+                    select(Job.id).where(
+                        Job.domain_id == domain_id, Job.job_type == "enrichment_refresh",
+                        Job.status.in_(ACTIVE_JOB_STATUSES)
+                    ).limit(1)
+                )
+                if running is None:
+                    await db.close()
+                    try:
+                        await asyncio.to_thread(submit_job, client.id, "enrichment_refresh", domain_id, {})
+                    except JobLimitExceeded:
+                        pass
+                    except Exception as e:
+                        print(f"Enrichment job submit error (domain {domain_id}): {e}")
+    
+    order = ENRICHED_SORTS[sort]
+    query = select(KeywordEnrichment, order.label("sort_value")).where(KeywordEnrichment.domain_id == domain_id)
+    if data_freshness:
+        query = query.where(KeywordEnrichment.data_freshness == data_freshness)
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, 2)
+        query = query.where(or_(
+            order < last_value,
+            and_(order == last_value, KeywordEnrichment.id > last_id)
+        ))
+    
+    rows = (await db.execute(query.order_by(order.desc(), KeywordEnrichment.id).limit(limit + 1))).all()
+    rows, _ = paginate(rows, limit, lambda row: [row.sort_value, row.KeywordEnrichment.id], response)
+    return [row.KeywordEnrichment for row in rows]
@@ -0,0 +1,128 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
+from app.config import settings
+from app.database import get_async_db
+from app.models.auth import APIKeyPermission
+from app.models.domain import Page
+from app.models.job import Job, ACTIVE_JOB_STATUSES
+from app.schemas.seo import PageAnalysisResponse
+from app.core.security import require_permissions, ensure_domain_access
+from app.core.pagination import decode_cursor, paginate
+from app.services.crawler.pages import crawl_domain
+from app.services.onpage.batch import analyze_domain_pages
+from app.services.jobs import submit_job, JobLimitExceeded
+
+router = APIRouter()
+
+
+@router.post("/crawl", tags=["On-Page"])
+async def crawl(
+    domain_id: int = Query(..., description="Domínio"),
+    max_pages: Optional[int] = Query(None, ge=1, le=10000, description="Padrão: CRAWLER_MAX_PAGES"),
+    full: bool = Query(False, description="Ignora o recrawl incremental e regrava todas as páginas"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Faz o crawl do site do domínio e grava/atualiza as páginas.
+    
+    Respeita o robots.txt, CRAWLER_MAX_CONCURRENT requisições simultâneas e
+    CRAWLER_DELAY_SECONDS entre requisições ao mesmo host.
+    
+    Recrawl incremental: páginas que respondem 304 (ETag/Last-Modified) ou
+    com o mesmo content_hash só têm last_crawled_at atualizado
+    (not_modified, unchanged e bytes_saved nas estatísticas).
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    await db.close()
+    
+    return await crawl_domain(domain_id, max_pages or settings.CRAWLER_MAX_PAGES, incremental=not full)
+
+
+
+@router.post("/analyze", tags=["On-Page"])
+async def analyze_pages(
+    domain_id: int = Query(..., description="Domínio"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Recalcula issues e score (0-100) de todas as páginas gravadas do domínio,
+    em paralelo entre os processos de ONPAGE_ANALYSIS_WORKERS.
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    await db.close()
+    
+    return await asyncio.to_thread(analyze_domain_pages, domain_id)
+
+
+@router.get("/pages", response_model=List[PageAnalysisResponse], tags=["On-Page"])
+async def list_pages(
+    response: Response,
+    domain_id: int = Query(..., description="Domínio"),
+    max_score: Optional[int] = Query(None, ge=0, le=100, description="Só páginas com score até este valor"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor do header X-Next-Cursor"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_ONPAGE.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Páginas com issues e score, das piores para as melhores (páginas ainda
+    sem análise no fim, com score nulo); cursor da próxima página no header
+    X-Next-Cursor.
+    
+    Na primeira página da consulta, as páginas sem análise (novas ou
+    alteradas no crawl) são analisadas na hora se forem até
+    ONPAGE_INLINE_ANALYSIS_MAX_PAGES; acima disso a análise vai para um job
+    onpage_analyze e o header X-Pending-Analysis informa quantas faltam.
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    
+    if cursor is None:
+        pending = await db.scalar(
+            select(func.count()).select_from(Page).where(Page.domain_id == domain_id, Page.score.is_(None))
+        )
+        if pending and pending <= settings.ONPAGE_INLINE_ANALYSIS_MAX_PAGES:
+            await db.close()
+            await asyncio.to_thread(analyze_domain_pages, domain_id, pending_only=True)
+        elif pending:
+            response.headers["X-Pending-Analysis"] = str(pending)
+            running = await db.scalar(
+                select(Job.id).where(
+                    Job.domain_id == domain_id, Job.job_type == "onpage_analyze",
+                    Job.status.in_(ACTIVE_JOB_STATUSES)
+                ).limit(1)
+            )
+            if running is None:
+                await db.close()
+                try:
+                    await asyncio.to_thread(submit_job, client.id, "onpage_analyze", domain_id, {"pending_only": True})
+                except JobLimitExceeded:
+                    pass
+                except Exception as e:
+                    print(f"On-page analysis job submit error (domain {domain_id}): {e}")
+    
+    query = select(Page).where(Page.domain_id == domain_id)
+    if max_score is not None:
+        query = query.where(Page.score <= max_score)
+    if cursor:
+        last_score, last_id = decode_cursor(cursor, 2)
+        if last_score is None:
+            query = query.where(Page.score.is_(None), Page.id > last_id)
+        else:
+            query = query.where(or_(
+                Page.score > last_score,
+                and_(Page.score == last_score, Page.id > last_id),
+                Page.score.is_(None)
+            ))
+    
+    query = query.order_by(Page.score.asc().nulls_last(), Page.id).limit(limit + 1)
+    pages = (await db.execute(query)).scalars().all()
+    pages, _ = paginate(pages, limit, lambda page: [page.score, page.id], response)
+    return pages
@@ -0,0 +1,128 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta
+import asyncio
+from app.config import settings
+from app.database import get_async_db, engine
+from app.models.auth import APIKeyPermission
+from app.schemas.seo import RankingHistoryPoint, RankingChange
+from app.core.security import require_permissions, ensure_domain_access
+from app.services.ranking_store import ranking_store
+from app.services.ranking_changes import ranking_changes, update_previous_positions
+from app.services.domain_analytics import refresh_rankings
+
+router = APIRouter()
+
+
+@router.get("/history", response_model=List[RankingHistoryPoint], tags=["Rankings"])
+async def get_ranking_history(
+    domain_id: int = Query(..., description="Domínio"),
+    keyword_id: List[int] = Query(..., description="Keywords (até 100; repita o parâmetro)"),
+    start: datetime = Query(..., description="Início do intervalo"),
+    end: Optional[datetime] = Query(None, description="Fim do intervalo (padrão: agora)"),
+    granularity: Literal["raw", "week", "month"] = Query("raw"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_RANKINGS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Histórico de posições de keywords em um intervalo.
+    
+    - raw: pontos diários (só o período ainda não compactado)
+    - week/month: médias, melhor/pior e última posição por semana ou mês
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    
+    if len(keyword_id) > 100:
+        raise HTTPException(status_code=400, detail="Máximo de 100 keywords por consulta")
+    end = end or datetime.utcnow()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end deve ser maior que start")
+    # A consulta usa uma conexão própria (sync): não segura a da sessão junto
+    await db.close()
+    
+    def query():
+        with engine.connect() as conn:
+            return ranking_store.history(conn, domain_id, keyword_id, start, end, granularity)
+    
+    return await asyncio.to_thread(query)
+
+
+@router.get("/changes", response_model=List[RankingChange], tags=["Rankings"])
+async def get_ranking_changes(
+    domain_id: int = Query(..., description="Domínio"),
+    threshold: int = Query(1, ge=1, description="Variação mínima (posições) para gain/loss"),
+    alert_type: Optional[List[Literal["gain", "loss", "stable"]]] = Query(None),
+    max_position: Optional[int] = Query(None, ge=1, description="Só keywords no top N (atual ou anterior)"),
+    since: Optional[datetime] = Query(None, description="Ignora observações anteriores a esta data"),
+    limit: int = Query(1000, ge=1, le=50000),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.READ_RANKINGS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Variação entre as duas últimas observações de cada keyword do domínio,
+    ordenada pelas maiores variações
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    await db.close()
+    
+    def query():
+        with engine.connect() as conn:
+            return ranking_changes(conn, domain_id, threshold, alert_type, max_position, since, limit)
+    
+    return await asyncio.to_thread(query)
+
+
+@router.post("/changes/refresh", tags=["Rankings"])
+async def refresh_previous_positions(
+    domain_id: int = Query(..., description="Domínio"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.WRITE_RANKINGS.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Regrava previous_position da observação mais recente de cada keyword
+    e atualiza o snapshot de analytics (o import de rankings já faz isso ao terminar)
+    """
+    client, api_key = auth_data
+    await ensure_domain_access(domain_id, client, api_key, db)
+    await db.close()
+    
+    def refresh() -> int:
+        with engine.begin() as conn:
+            updated = update_previous_positions(conn, domain_id)
+            refresh_rankings(conn, domain_id, days=())
+            return updated
+    
+    updated = await asyncio.to_thread(refresh)
+    return {"message": "Posições anteriores atualizadas", "updated": updated}
+
+
+# ============= ADMIN =============
+
+@router.post("/history/compact", tags=["Admin - Rankings"])
+async def compact_ranking_history(
+    before: Optional[datetime] = Query(None, description="Padrão: agora - RANKING_RAW_RETENTION_DAYS")
+):
+    """
+    Compacta os meses antigos do histórico em resumos semanais/mensais
+    e remove os resumos semanais fora da retenção
+    """
+    now = datetime.utcnow()
+    before = before or now - timedelta(days=settings.RANKING_RAW_RETENTION_DAYS)
+    weekly_before = now - timedelta(days=settings.RANKING_WEEKLY_RETENTION_DAYS)
+    
+    stats = await asyncio.to_thread(ranking_store.compact, engine, before, weekly_before)
+    return {"message": "Histórico compactado", **stats}
+
+
+@router.post("/history/backfill", tags=["Admin - Rankings"])
+async def backfill_ranking_history(
+    domain_id: Optional[int] = Query(None, description="Todos os domínios se omitido")
+):
+    """
+    Copia a tabela rankings para o histórico (migração de dados existentes)
+    """
+    points = await asyncio.to_thread(ranking_store.backfill_from_rankings, engine, domain_id)
+    return {"message": "Histórico preenchido", "points": points}
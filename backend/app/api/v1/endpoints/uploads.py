@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import asyncio
+import os
+from app.database import get_async_db
+from app.models.auth import APIKeyPermission
+from app.models.upload import UploadSession
+from app.schemas.seo import UploadSessionResponse
+from app.core.security import require_permissions
+from app.services.uploads import create_upload_session, append_upload_part, delete_upload_session
+
+router = APIRouter()
+
+
+async def _client_session(db: AsyncSession, upload_id: str, client_id: int) -> UploadSession:
+    session = await db.scalar(
+        select(UploadSession).where(UploadSession.id == upload_id, UploadSession.client_id == client_id)
+    )
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload não encontrado")
+    return session
+
+
+def _session_response(session: UploadSession, response: Response) -> UploadSessionResponse:
+    try:
+        offset = os.path.getsize(session.path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload não encontrado")
+    response.headers["Upload-Offset"] = str(offset)
+    return UploadSessionResponse(
+        id=session.id,
+        filename=session.filename,
+        offset=offset,
+        total_size=session.total_size,
+        complete=offset == session.total_size if session.total_size is not None else None,
+        created_at=session.created_at,
+        updated_at=session.updated_at
+    )
+
+
+@router.post("", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED, tags=["Uploads"])
+async def create_upload(
+    response: Response,
+    filename: Optional[str] = Query(None, max_length=255, description="Nome do arquivo (a extensão define o formato)"),
+    total_size: Optional[int] = Query(None, ge=1, description="Tamanho total em bytes (recomendado)"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Abre um upload em partes, para arquivos grandes demais para um POST só.
+
+    As partes vão por `PUT /uploads/{id}?offset=N` (corpo = bytes da parte);
+    depois de uma queda, `GET /uploads/{id}` informa o offset para continuar.
+    O upload completo é importado com `upload_id` em `/import/semrush/...`
+    ou `/jobs/import/semrush/...`.
+    """
+    client, _ = auth_data
+    await db.close()
+    upload_id = await asyncio.to_thread(create_upload_session, client.id, filename, total_size)
+    return _session_response(await _client_session(db, upload_id, client.id), response)
+
+
+@router.get("/{upload_id}", response_model=UploadSessionResponse, tags=["Uploads"])
+async def get_upload(
+    upload_id: str,
+    response: Response,
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Offset atual do upload (bytes recebidos)"""
+    client, _ = auth_data
+    return _session_response(await _client_session(db, upload_id, client.id), response)
+
+
+@router.put("/{upload_id}", response_model=UploadSessionResponse, tags=["Uploads"])
+async def upload_part(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    offset: int = Query(..., ge=0, description="Posição da parte no arquivo (= offset atual do upload)"),
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Envia a próxima parte do arquivo (corpo da requisição, sem multipart).
+    Um offset diferente do já recebido devolve 409 com o offset correto no
+    header `Upload-Offset`.
+    """
+    client, _ = auth_data
+    session = await _client_session(db, upload_id, client.id)
+    # Libera a conexão durante a transferência
+    await db.close()
+    await append_upload_part(session, offset, request.stream())
+    return _session_response(await _client_session(db, upload_id, client.id), response)
+
+
+@router.delete("/{upload_id}", tags=["Uploads"])
+async def delete_upload(
+    upload_id: str,
+    auth_data: tuple = Depends(require_permissions([APIKeyPermission.IMPORT_DATA.value])),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Descarta o upload e o que já foi recebido"""
+    client, _ = auth_data
+    await db.close()
+    if not await asyncio.to_thread(delete_upload_session, upload_id, client.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload não encontrado")
+    return {"message": "Upload descartado"}
@@ -13,6 +13,10 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = "redis://redis:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
     
     # API
     API_V1_PREFIX: str = "/api/v1"
@@ -29,6 +33,30 @@ class Settings(BaseSettings):
     # Rate Limiting
     DEFAULT_RATE_LIMIT_PER_MINUTE: int = 60
     DEFAULT_RATE_LIMIT_PER_DAY: int = 10000
+    # sliding_window_counter, sliding_window_log, token_bucket ou local_lease
+    RATE_LIMIT_ALGORITHM: str = "sliding_window_counter"
+    # Política se o Redis cair: allow, deny ou local (limite/RATE_LIMIT_LOCAL_WORKERS por worker)
+    RATE_LIMIT_REDIS_FAILURE_POLICY: str = "local"
+    RATE_LIMIT_LOCAL_WORKERS: int = 4
+    # local_lease: fração do limite/minuto reservada por worker a cada renovação
+    RATE_LIMIT_LEASE_FRACTION: float = 0.1
+    RATE_LIMIT_LEASE_RECONCILE_SECONDS: float = 5.0
+    
+    # Auth cache (L1 em memória por worker)
+    AUTH_CACHE_TTL_SECONDS: int = 30
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_CHANNEL: str = "auth:invalidate"
+    
+    # Contadores de uso das API Keys (write-behind)
+    USAGE_COUNTERS_FLUSH_SECONDS: float = 5.0
+    
+    # Logs de uso (fila + gravação em lote)
+    USAGE_LOG_QUEUE_SIZE: int = 10000
+    USAGE_LOG_BATCH_SIZE: int = 500
+    USAGE_LOG_FLUSH_SECONDS: float = 2.0
+    USAGE_LOG_OVERFLOW_POLICY: str = "sample"  # drop, sample ou block
+    USAGE_LOG_SAMPLE_RATE: int = 10
+    USAGE_LOG_BLOCK_TIMEOUT_SECONDS: float = 0.05
     
     # Google APIs
     GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = None
@@ -47,6 +75,22 @@ class Settings(BaseSettings):
     # Celery
     CELERY_BROKER_URL: str = "redis://redis:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://redis:6379/0"
+    # Testes/local sem Redis: CELERY_BROKER_URL=memory:// e CELERY_TASK_ALWAYS_EAGER=true
+    CELERY_TASK_ALWAYS_EAGER: bool = False
+    
+    # Jobs em background: limites por cliente, reenvio quando o cliente está
+    # no limite e intervalo mínimo entre gravações de progresso
+    JOBS_MAX_RUNNING_PER_CLIENT: int = 2
+    JOBS_MAX_QUEUED_PER_CLIENT: int = 20
+    JOBS_RETRY_SECONDS: int = 10
+    JOBS_PROGRESS_INTERVAL_SECONDS: float = 1.0
+    # Job em execução sem heartbeat há mais que isso é dado como órfão
+    # (worker morreu) e reassumido na reentrega da task, até JOBS_MAX_ATTEMPTS vezes
+    JOBS_STALE_SECONDS: int = 600
+    JOBS_MAX_ATTEMPTS: int = 3
+    # Fila dos jobs com pool de processos (import em lote, análise on-page): consumida por um
+    # worker --pool=threads, cujo processo não é daemon e pode criar o pool (no prefork vira threads)
+    JOBS_PARALLEL_QUEUE: str = "parallel"
     
     # Email
     SMTP_HOST: Optional[str] = None
@@ -60,6 +104,10 @@ class Settings(BaseSettings):
     CRAWLER_USER_AGENT: str = "SEO-API-Bot/1.0"
     CRAWLER_MAX_CONCURRENT: int = 10
     CRAWLER_DELAY_SECONDS: float = 1.0
+    CRAWLER_MAX_PAGES: int = 500  # URLs por crawl
+    CRAWLER_TIMEOUT_SECONDS: float = 15.0
+    CRAWLER_PARSE_WORKERS: int = 4
+    CRAWLER_PARSE_PROCESSES: bool = False  # parsing em processos em vez de threads
     
     # Firecrawl
     FIRECRAWL_API_URL: Optional[str] = None
@@ -68,6 +116,43 @@ class Settings(BaseSettings):
     # Storage
     UPLOAD_DIR: str = "/tmp/uploads"
     MAX_UPLOAD_SIZE_MB: int = 50
+    # Upload em partes (/uploads): tamanho máximo do arquivo e validade da sessão
+    # (e dos checkpoints de imports interrompidos)
+    UPLOAD_SESSION_MAX_SIZE_MB: int = 10240
+    UPLOAD_SESSION_TTL_HOURS: int = 48
+    
+    # Imports (CSV do SemRush)
+    IMPORT_CHUNK_ROWS: int = 5000
+    IMPORT_MAX_REPORTED_ERRORS: int = 100
+    # Import em lote (vários arquivos): processos de parsing (0 = número de CPUs) e máximo de arquivos
+    IMPORT_PARSE_WORKERS: int = 0
+    IMPORT_BATCH_MAX_FILES: int = 100
+    
+    # Export em fluxo (/export): linhas por lote do cursor no servidor
+    EXPORT_BATCH_ROWS: int = 5000
+    
+    # Upsert em lote de keywords (linhas por INSERT ... ON CONFLICT)
+    KEYWORD_UPSERT_BATCH_SIZE: int = 5000
+    
+    # Histórico de rankings: dias mantidos em pontos diários e em resumos semanais
+    RANKING_RAW_RETENTION_DAYS: int = 90
+    RANKING_WEEKLY_RETENTION_DAYS: int = 730
+    
+    # Snapshot de analytics do domínio: dias na tendência de tráfego e itens nas listas
+    ANALYTICS_TRAFFIC_TREND_DAYS: int = 90
+    ANALYTICS_TOP_ITEMS: int = 10
+    
+    # Enriquecimento SemRush + GSC: janela (dias) de desempenho do GSC
+    ENRICHMENT_GSC_DAYS: int = 28
+    # GET /keywords/enriched: tamanho máximo (keywords + queries) calculado na própria consulta (acima disso, vira job)
+    ENRICHMENT_INLINE_MAX_KEYWORDS: int = 5000
+    
+    # Análise on-page: limites das regras e processos da análise em lote (0 = nº de CPUs)
+    ONPAGE_THIN_CONTENT_WORDS: int = 300
+    ONPAGE_SLOW_PAGE_MS: int = 3000
+    ONPAGE_ANALYSIS_WORKERS: int = 0
+    # GET /onpage/pages: páginas sem análise analisadas na própria consulta (acima disso, vira job)
+    ONPAGE_INLINE_ANALYSIS_MAX_PAGES: int = 500
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,266 @@
+"""
+Cache L1 (em memória, por worker) para autenticação via API Key.
+
+Cada worker do uvicorn mantém um snapshot do estado resolvido de
+API Key + Cliente, limitado por TTL e por número de entradas. A
+invalidação entre workers é feita via Redis pub/sub.
+"""
+from dataclasses import dataclass, asdict, fields
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, List, Any, Dict, Tuple
+import threading
+import json
+import time
+from app.config import settings
+from app.core.cache import redis_client, AsyncRedis
+from app.models.auth import APIKeyStatus
+
+
+def _dump_datetime(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _load_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+@dataclass(frozen=True)
+class ClientSnapshot:
+    """
+    Estado do cliente necessário para autenticação e /auth/me
+    """
+    id: int
+    name: str
+    company: Optional[str]
+    email: str
+    is_active: bool
+    max_api_keys: int
+    rate_limit_per_minute: int
+    rate_limit_per_day: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    rate_limit_algorithm: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, client) -> "ClientSnapshot":
+        return cls(**{f.name: getattr(client, f.name) for f in fields(cls)})
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["created_at"] = _dump_datetime(self.created_at)
+        data["updated_at"] = _dump_datetime(self.updated_at)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClientSnapshot":
+        data = dict(data)
+        data["created_at"] = _load_datetime(data.get("created_at"))
+        data["updated_at"] = _load_datetime(data.get("updated_at"))
+        return cls(**data)
+
+
+@dataclass(frozen=True)
+class APIKeySnapshot:
+    """
+    Estado da API Key necessário para autenticação e autorização
+    """
+    id: int
+    client_id: int
+    key_hash: str
+    key_prefix: str
+    key_last_chars: str
+    name: str
+    status: APIKeyStatus
+    permissions: List[str]
+    allowed_ips: Optional[List[str]] = None
+    allowed_domains_ids: Optional[List[int]] = None
+    expires_at: Optional[datetime] = None
+    last_used_at: Optional[datetime] = None
+    total_requests: int = 0
+
+    @classmethod
+    def from_model(cls, api_key) -> "APIKeySnapshot":
+        data = {f.name: getattr(api_key, f.name) for f in fields(cls)}
+        data["total_requests"] = data["total_requests"] or 0
+        return cls(**data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["status"] = self.status.value
+        data["expires_at"] = _dump_datetime(self.expires_at)
+        data["last_used_at"] = _dump_datetime(self.last_used_at)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "APIKeySnapshot":
+        data = dict(data)
+        data["status"] = APIKeyStatus(data["status"])
+        data["expires_at"] = _load_datetime(data.get("expires_at"))
+        data["last_used_at"] = _load_datetime(data.get("last_used_at"))
+        return cls(**data)
+
+
+AuthEntry = Tuple[ClientSnapshot, APIKeySnapshot]
+
+
+class LocalAuthCache:
+    """
+    Cache LRU com TTL, thread-safe, indexado pelo hash da API Key.
+    Mantém um índice client_id -> hashes para invalidação por cliente.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, AuthEntry]]" = OrderedDict()
+        self._by_client: Dict[int, set] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key_hash: str) -> Optional[AuthEntry]:
+        """Busca entrada válida (não expirada)"""
+        with self._lock:
+            item = self._entries.get(key_hash)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires < time.monotonic():
+                self._remove(key_hash)
+                return None
+            self._entries.move_to_end(key_hash)
+            return entry
+
+    def set(self, key_hash: str, entry: AuthEntry) -> None:
+        """Salva entrada, removendo as menos usadas se passar do limite"""
+        with self._lock:
+            self._remove(key_hash)
+            self._entries[key_hash] = (time.monotonic() + self.ttl, entry)
+            self._by_client.setdefault(entry[0].id, set()).add(key_hash)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_key(self, key_hash: str) -> None:
+        with self._lock:
+            self._remove(key_hash)
+
+    def invalidate_client(self, client_id: int) -> None:
+        with self._lock:
+            for key_hash in list(self._by_client.get(client_id, ())):
+                self._remove(key_hash)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_client.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key_hash: str) -> None:
+        item = self._entries.pop(key_hash, None)
+        if item is None:
+            return
+        client_id = item[1][0].id
+        hashes = self._by_client.get(client_id)
+        if hashes is not None:
+            hashes.discard(key_hash)
+            if not hashes:
+                del self._by_client[client_id]
+
+
+# Cache L1 deste worker
+local_auth_cache = LocalAuthCache(
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES
+)
+
+
+class AuthInvalidation:
+    """
+    Publica e aplica invalidações do cache L1 entre workers
+    """
+
+    @staticmethod
+    def _apply(message: Dict[str, Any]) -> None:
+        kind = message.get("type")
+        if kind == "api_key":
+            local_auth_cache.invalidate_key(message["key_hash"])
+        elif kind == "client":
+            local_auth_cache.invalidate_client(int(message["client_id"]))
+        elif kind == "all":
+            local_auth_cache.clear()
+
+    @staticmethod
+    async def _publish(message: Dict[str, Any]) -> None:
+        # Aplica localmente de imediato; os demais workers recebem via pub/sub
+        AuthInvalidation._apply(message)
+        try:
+            await AsyncRedis.get().publish(settings.AUTH_CACHE_CHANNEL, json.dumps(message))
+        except Exception as e:
+            print(f"Auth invalidation publish error: {e}")
+
+    @staticmethod
+    async def api_key(key_hash: str) -> None:
+        """Invalida uma API Key em todos os workers"""
+        await AuthInvalidation._publish({"type": "api_key", "key_hash": key_hash})
+
+    @staticmethod
+    async def client(client_id: int) -> None:
+        """Invalida todas as API Keys de um cliente em todos os workers"""
+        await AuthInvalidation._publish({"type": "client", "client_id": client_id})
+
+
+class AuthInvalidationListener:
+    """
+    Thread que escuta o canal de invalidação no Redis.
+    Se a conexão cair, limpa o cache L1 (mensagens podem ter sido perdidas)
+    e tenta se reinscrever.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="auth-invalidation-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                backoff = 1.0
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        try:
+                            AuthInvalidation._apply(json.loads(message["data"]))
+                        except (ValueError, KeyError, TypeError) as e:
+                            print(f"Auth invalidation message error: {e}")
+            except Exception as e:
+                print(f"Auth invalidation listener error: {e}")
+                local_auth_cache.clear()
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+auth_invalidation_listener = AuthInvalidationListener(settings.AUTH_CACHE_CHANNEL)
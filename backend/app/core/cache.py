@@ -1,21 +1,119 @@
 import redis
-from typing import Optional, Any
+import redis.asyncio as aioredis
+from typing import Optional, Any, List
+import itertools
 import json
+import math
+import os
+import time
 from app.config import settings
 
-# Cliente Redis
+# Cliente Redis síncrono (scripts como seed_db.py e threads em background)
 redis_client = redis.from_url(
     settings.REDIS_URL,
     decode_responses=True,
-    encoding='utf-8'
+    encoding='utf-8',
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
 )
 
 
+class AsyncRedis:
+    """
+    Cliente redis.asyncio com pool de conexões dimensionado explicitamente.
+    Criado no lifespan da aplicação (ou sob demanda) e fechado no shutdown.
+    """
+    
+    client: Optional[aioredis.Redis] = None
+    _scripts: dict = {}
+    
+    @classmethod
+    def get(cls) -> aioredis.Redis:
+        if cls.client is None:
+            pool = aioredis.ConnectionPool.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                encoding='utf-8',
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+                health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
+            )
+            cls.client = aioredis.Redis(connection_pool=pool)
+        return cls.client
+    
+    @classmethod
+    def script(cls, source: str):
+        """Script Lua registrado no cliente atual (EVALSHA com fallback para EVAL)"""
+        client = cls.get()
+        script = cls._scripts.get(source)
+        if script is None:
+            script = cls._scripts[source] = client.register_script(source)
+        return script
+    
+    @classmethod
+    async def connect(cls) -> None:
+        """Cria o pool e valida a conexão"""
+        try:
+            await cls.get().ping()
+        except Exception as e:
+            print(f"Redis connect error: {e}")
+    
+    @classmethod
+    async def close(cls) -> None:
+        if cls.client is not None:
+            await cls.client.aclose()
+            await cls.client.connection_pool.disconnect()
+            cls.client = None
+            cls._scripts = {}
+
+
+# Salva o valor e registra a key nos sets de tags (cache_tag:<tag>)
+# KEYS[1] = key, KEYS[2..] = sets de tags; ARGV = ttl, valor
+CACHE_SET_TAGGED_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+redis.call('SETEX', KEYS[1], ttl, ARGV[2])
+for i = 2, #KEYS do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    if redis.call('TTL', KEYS[i]) < ttl then
+        redis.call('EXPIRE', KEYS[i], ttl)
+    end
+end
+return 1
+"""
+
+# Remove todas as keys registradas nas tags e os próprios sets
+# KEYS = sets de tags
+CACHE_INVALIDATE_TAGS_SCRIPT = """
+local removed = 0
+for _, tag in ipairs(KEYS) do
+    local members = redis.call('SMEMBERS', tag)
+    for i = 1, #members, 500 do
+        removed = removed + redis.call('UNLINK', unpack(members, i, math.min(i + 499, #members)))
+    end
+    redis.call('UNLINK', tag)
+end
+return removed
+"""
+
+
+def tag_key(tag: str) -> str:
+    """Nome do set Redis que indexa as keys de uma tag (ex: client:3)"""
+    return f"cache_tag:{tag}"
+
+
 class Cache:
     """
     Wrapper para operações de cache
+    
+    Entradas podem ser registradas em tags (ex: "client:3", "api_key:7") e
+    invalidadas por tag em O(entradas da tag), sem varrer o keyspace.
     """
     
+    _set_tagged = redis_client.register_script(CACHE_SET_TAGGED_SCRIPT)
+    _invalidate_tags = redis_client.register_script(CACHE_INVALIDATE_TAGS_SCRIPT)
+    
     @staticmethod
     def get(key: str) -> Optional[Any]:
         """Busca valor do cache"""
@@ -29,17 +127,24 @@ class Cache:
             return None
     
     @staticmethod
-    def set(key: str, value: Any, ttl: int = 300) -> bool:
+    def set(key: str, value: Any, ttl: int = 300, tags: Optional[List[str]] = None) -> bool:
         """
         Salva valor no cache
         ttl: time to live em segundos (default 5 minutos)
+        tags: tags para invalidação em grupo (ex: ["client:3"])
         """
         try:
-            redis_client.setex(
-                key,
-                ttl,
-                json.dumps(value)
-            )
+            if tags:
+                Cache._set_tagged(
+                    keys=[key] + [tag_key(tag) for tag in tags],
+                    args=[ttl, json.dumps(value)]
+                )
+            else:
+                redis_client.setex(
+                    key,
+                    ttl,
+                    json.dumps(value)
+                )
             return True
         except Exception as e:
             print(f"Cache set error: {e}")
@@ -49,107 +154,425 @@ class Cache:
     def delete(key: str) -> bool:
         """Remove valor do cache"""
         try:
-            redis_client.delete(key)
+            redis_client.unlink(key)
             return True
         except Exception as e:
             print(f"Cache delete error: {e}")
             return False
     
     @staticmethod
-    def clear_pattern(pattern: str) -> int:
+    def invalidate_tags(*tags: str) -> int:
+        """
+        Remove todas as entradas registradas nas tags
+        Ex: invalidate_tags("client:3")
+        """
+        try:
+            return Cache._invalidate_tags(keys=[tag_key(tag) for tag in tags])
+        except Exception as e:
+            print(f"Cache invalidate tags error: {e}")
+            return 0
+    
+    @staticmethod
+    def clear_pattern(pattern: str, batch_size: int = 500) -> int:
         """
-        Remove todas as keys que correspondem ao pattern
+        Remove todas as keys que correspondem ao pattern (via SCAN, sem bloquear o Redis)
         Ex: clear_pattern("api_key:*")
+        Prefira invalidate_tags quando as entradas forem registradas com tags.
         """
         try:
-            keys = redis_client.keys(pattern)
-            if keys:
-                return redis_client.delete(*keys)
+            removed = 0
+            batch = []
+            for key in redis_client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    removed += redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                removed += redis_client.unlink(*batch)
+            return removed
+        except Exception as e:
+            print(f"Cache clear pattern error: {e}")
+            return 0
+
+
+class AsyncCache:
+    """
+    Versão assíncrona do Cache (usada nos endpoints async def)
+    """
+    
+    @staticmethod
+    async def get(key: str) -> Optional[Any]:
+        """Busca valor do cache"""
+        try:
+            value = await AsyncRedis.get().get(key)
+            if value:
+                return json.loads(value)
+            return None
+        except Exception as e:
+            print(f"Cache get error: {e}")
+            return None
+    
+    @staticmethod
+    async def set(key: str, value: Any, ttl: int = 300, tags: Optional[List[str]] = None) -> bool:
+        """Salva valor no cache (ttl em segundos), opcionalmente com tags"""
+        try:
+            if tags:
+                await AsyncRedis.script(CACHE_SET_TAGGED_SCRIPT)(
+                    keys=[key] + [tag_key(tag) for tag in tags],
+                    args=[ttl, json.dumps(value)]
+                )
+            else:
+                await AsyncRedis.get().setex(key, ttl, json.dumps(value))
+            return True
+        except Exception as e:
+            print(f"Cache set error: {e}")
+            return False
+    
+    @staticmethod
+    async def delete(key: str) -> bool:
+        """Remove valor do cache"""
+        try:
+            await AsyncRedis.get().unlink(key)
+            return True
+        except Exception as e:
+            print(f"Cache delete error: {e}")
+            return False
+    
+    @staticmethod
+    async def invalidate_tags(*tags: str) -> int:
+        """Remove todas as entradas registradas nas tags"""
+        try:
+            return await AsyncRedis.script(CACHE_INVALIDATE_TAGS_SCRIPT)(
+                keys=[tag_key(tag) for tag in tags]
+            )
+        except Exception as e:
+            print(f"Cache invalidate tags error: {e}")
             return 0
+    
+    @staticmethod
+    async def clear_pattern(pattern: str, batch_size: int = 500) -> int:
+        """Remove todas as keys que correspondem ao pattern (via SCAN)"""
+        try:
+            client = AsyncRedis.get()
+            removed = 0
+            batch = []
+            async for key in client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    removed += await client.unlink(*batch)
+                    batch = []
+            if batch:
+                removed += await client.unlink(*batch)
+            return removed
         except Exception as e:
             print(f"Cache clear pattern error: {e}")
             return 0
 
 
+# Script Lua do rate limiter: verifica e consome as janelas de minuto e dia
+# de forma atômica, em um único round trip (EVALSHA).
+# KEYS[1] = base da janela de minuto, KEYS[2] = base da janela de dia
+# ARGV = algoritmo, limite/minuto, limite/dia, custo (0 = só consulta), membro único
+RATE_LIMIT_SCRIPT = """
+local algorithm = ARGV[1]
+local limits = {tonumber(ARGV[2]), tonumber(ARGV[3])}
+local cost = tonumber(ARGV[4])
+local member = ARGV[5]
+local windows = {60000, 86400000}
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+-- Sliding window counter: bucket atual + fração do bucket anterior
+local function swc_peek(key, window)
+    local cur_start = now - (now % window)
+    local cur_key = key .. ':' .. cur_start
+    local cur = tonumber(redis.call('GET', cur_key) or '0')
+    local prev = tonumber(redis.call('GET', key .. ':' .. (cur_start - window)) or '0')
+    local weight = (window - (now - cur_start)) / window
+    return math.floor(prev * weight) + cur, cur_start + window, cur_key
+end
+
+-- Sliding window log: um membro por request no sorted set
+local function log_peek(key, window)
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    local reset = now + window
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    if oldest[2] then
+        reset = tonumber(oldest[2]) + window
+    end
+    return count, reset, key
+end
+
+-- Token bucket: capacidade = limite, recarga contínua ao longo da janela
+local function tb_peek(key, limit, window)
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1])
+    local ts = tonumber(data[2])
+    if not tokens then
+        tokens = limit
+        ts = now
+    end
+    tokens = math.min(limit, tokens + (now - ts) * limit / window)
+    -- Quando há token para o próximo request (não o balde cheio): é o Retry-After de um 429
+    local reset = now + math.ceil(math.max(0, math.max(cost, 1) - tokens) * window / limit)
+    return limit - math.floor(tokens), reset, key, tokens
+end
+
+local counts, resets, targets, tokens = {}, {}, {}, {}
+for i = 1, 2 do
+    local key, limit, window = KEYS[i], limits[i], windows[i]
+    if algorithm == 'token_bucket' then
+        counts[i], resets[i], targets[i], tokens[i] = tb_peek(key, limit, window)
+    elseif algorithm == 'sliding_window_log' and i == 1 then
+        counts[i], resets[i], targets[i] = log_peek(key, window)
+    else
+        counts[i], resets[i], targets[i] = swc_peek(key, window)
+    end
+end
+
+local reason = 0
+if cost > 0 then
+    for i = 1, 2 do
+        if counts[i] + cost > limits[i] then
+            reason = i
+            break
+        end
+    end
+end
+
+if cost > 0 and reason == 0 then
+    for i = 1, 2 do
+        local key, window = targets[i], windows[i]
+        if algorithm == 'token_bucket' then
+            redis.call('HSET', key, 'tokens', tokens[i] - cost, 'ts', now)
+            redis.call('PEXPIRE', key, window)
+        elseif algorithm == 'sliding_window_log' and i == 1 then
+            redis.call('ZADD', key, now, member)
+            redis.call('PEXPIRE', key, window)
+        else
+            redis.call('INCRBY', key, cost)
+            redis.call('PEXPIRE', key, window * 2)
+        end
+        counts[i] = counts[i] + cost
+    end
+end
+
+return {reason == 0 and 1 or 0, reason, counts[1], counts[2], resets[1], resets[2], now}
+"""
+
+
 class RateLimiter:
     """
-    Rate limiting usando Redis
+    Rate limiting usando Redis (script Lua atômico, um round trip por request)
     """
     
+    ALGORITHMS = ("sliding_window_counter", "sliding_window_log", "token_bucket", "local_lease")
+    REASONS = {1: "minute_limit_exceeded", 2: "day_limit_exceeded"}
+    
+    _script = redis_client.register_script(RATE_LIMIT_SCRIPT)
+    _sequence = itertools.count()
+    
+    @staticmethod
+    def _keys(client_id: int, algorithm: str = "sliding_window_counter") -> list:
+        """
+        Keys (minuto, dia) do algoritmo. Cada algoritmo usa um tipo de valor
+        (string por bucket, sorted set, hash), então log e token bucket têm
+        sufixo próprio: trocar o algoritmo do cliente não dá WRONGTYPE.
+        """
+        # Hash tag {client:id} mantém as keys no mesmo slot em Redis Cluster
+        base = f"rate_limit:{{client:{client_id}}}"
+        if algorithm == "token_bucket":
+            return [f"{base}:minute:tb", f"{base}:day:tb"]
+        if algorithm == "sliding_window_log":
+            # Só a janela do minuto é log; o dia segue no sliding window counter
+            return [f"{base}:minute:log", f"{base}:day"]
+        return [f"{base}:minute", f"{base}:day"]
+    
+    @staticmethod
+    def resolve_algorithm(algorithm: Optional[str]) -> str:
+        """Algoritmo do cliente ou o default configurado"""
+        if algorithm in RateLimiter.ALGORITHMS:
+            return algorithm
+        return settings.RATE_LIMIT_ALGORITHM
+    
+    @staticmethod
+    def _script_call(
+        client_id: int,
+        limit_per_minute: int,
+        limit_per_day: int,
+        algorithm: Optional[str],
+        cost: int
+    ) -> tuple[str, list, list]:
+        """Monta (algoritmo, keys, args) para o script do rate limiter"""
+        algorithm = RateLimiter.resolve_algorithm(algorithm)
+        if algorithm == "local_lease":
+            # Consultas sem consumo usam as janelas do script atômico
+            algorithm = "sliding_window_counter"
+        member = f"{os.getpid()}:{time.time_ns()}:{next(RateLimiter._sequence)}"
+        return (
+            algorithm,
+            RateLimiter._keys(client_id, algorithm),
+            [algorithm, limit_per_minute, limit_per_day, cost, member]
+        )
+    
+    @staticmethod
+    def _parse(result: list, algorithm: str, limit_per_minute: int, limit_per_day: int) -> dict:
+        """Converte o retorno do script no info_dict"""
+        allowed, reason, minute_count, day_count, minute_reset, day_reset, now = result
+        reset_at = minute_reset if reason == 1 else day_reset
+        return {
+            "allowed": bool(allowed),
+            "reason": RateLimiter.REASONS.get(reason),
+            "algorithm": algorithm,
+            "minute_count": minute_count,
+            "minute_limit": limit_per_minute,
+            "day_count": day_count,
+            "day_limit": limit_per_day,
+            "remaining_minute": max(0, limit_per_minute - minute_count),
+            "remaining_day": max(0, limit_per_day - day_count),
+            "reset_minute": math.ceil(minute_reset / 1000),
+            "reset_day": math.ceil(day_reset / 1000),
+            "retry_after": max(1, math.ceil((reset_at - now) / 1000)) if reason else 0
+        }
+    
+    @staticmethod
+    def _run(
+        client_id: int,
+        limit_per_minute: int,
+        limit_per_day: int,
+        algorithm: Optional[str],
+        cost: int
+    ) -> dict:
+        algorithm, keys, args = RateLimiter._script_call(
+            client_id, limit_per_minute, limit_per_day, algorithm, cost
+        )
+        result = RateLimiter._script(keys=keys, args=args)
+        return RateLimiter._parse(result, algorithm, limit_per_minute, limit_per_day)
+    
     @staticmethod
     def check_rate_limit(
         client_id: int,
         limit_per_minute: int,
-        limit_per_day: int
+        limit_per_day: int,
+        algorithm: Optional[str] = None
     ) -> tuple[bool, dict]:
         """
-        Verifica rate limits
+        Verifica e consome rate limits (minuto e dia) atomicamente
         Returns: (allowed, info_dict)
         """
-        from datetime import datetime
-        
-        now = datetime.utcnow()
-        
-        # Keys para rate limiting
-        minute_key = f"rate_limit:client:{client_id}:minute:{now.strftime('%Y%m%d%H%M')}"
-        day_key = f"rate_limit:client:{client_id}:day:{now.strftime('%Y%m%d')}"
+        from app.core.rate_limit_lease import lease_rate_limiter
         
         try:
-            # Incrementa contadores
-            minute_count = redis_client.incr(minute_key)
-            day_count = redis_client.incr(day_key)
-            
-            # Define expiração
-            if minute_count == 1:
-                redis_client.expire(minute_key, 60)
-            if day_count == 1:
-                redis_client.expire(day_key, 86400)
-            
-            # Verifica limites
-            allowed = True
-            reason = None
-            
-            if minute_count > limit_per_minute:
-                allowed = False
-                reason = "minute_limit_exceeded"
-            elif day_count > limit_per_day:
-                allowed = False
-                reason = "day_limit_exceeded"
-            
-            info = {
-                "allowed": allowed,
-                "reason": reason,
-                "minute_count": minute_count,
-                "minute_limit": limit_per_minute,
-                "day_count": day_count,
-                "day_limit": limit_per_day,
-                "remaining_minute": max(0, limit_per_minute - minute_count),
-                "remaining_day": max(0, limit_per_day - day_count)
-            }
-            
-            return allowed, info
+            if RateLimiter.resolve_algorithm(algorithm) == "local_lease":
+                return lease_rate_limiter.check(client_id, limit_per_minute, limit_per_day)
+            info = RateLimiter._run(client_id, limit_per_minute, limit_per_day, algorithm, cost=1)
+            return info["allowed"], info
             
         except Exception as e:
             print(f"Rate limit error: {e}")
-            # Em caso de erro no Redis, permite a requisição
-            return True, {"allowed": True, "error": str(e)}
+            return RateLimiter.fallback(client_id, limit_per_minute, limit_per_day, e)
     
     @staticmethod
-    def get_current_usage(client_id: int) -> dict:
-        """Retorna uso atual do cliente"""
-        from datetime import datetime
+    def fallback(
+        client_id: int,
+        limit_per_minute: int,
+        limit_per_day: int,
+        error: Exception
+    ) -> tuple[bool, dict]:
+        """
+        Política quando o Redis está indisponível (RATE_LIMIT_REDIS_FAILURE_POLICY):
+        allow = permite tudo, deny = recusa tudo, local = limite aproximado por worker
+        """
+        from app.core.rate_limit_lease import local_rate_limiter
         
-        now = datetime.utcnow()
-        minute_key = f"rate_limit:client:{client_id}:minute:{now.strftime('%Y%m%d%H%M')}"
-        day_key = f"rate_limit:client:{client_id}:day:{now.strftime('%Y%m%d')}"
+        policy = settings.RATE_LIMIT_REDIS_FAILURE_POLICY
+        if policy == "deny":
+            return False, {"allowed": False, "reason": "rate_limiter_unavailable", "error": str(error)}
+        if policy == "local":
+            allowed, info = local_rate_limiter.check(client_id, limit_per_minute, limit_per_day)
+            info["error"] = str(error)
+            return allowed, info
+        return True, {"allowed": True, "error": str(error)}
+    
+    @staticmethod
+    def get_current_usage(
+        client_id: int,
+        limit_per_minute: int = settings.DEFAULT_RATE_LIMIT_PER_MINUTE,
+        limit_per_day: int = settings.DEFAULT_RATE_LIMIT_PER_DAY,
+        algorithm: Optional[str] = None
+    ) -> dict:
+        """Retorna uso atual do cliente (sem consumir quota)"""
+        try:
+            info = RateLimiter._run(client_id, limit_per_minute, limit_per_day, algorithm, cost=0)
+            return {
+                "minute_count": info["minute_count"],
+                "day_count": info["day_count"],
+                "reset_minute": info["reset_minute"],
+                "reset_day": info["reset_day"]
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
+
+class AsyncRateLimiter:
+    """
+    Versão assíncrona do RateLimiter (mesmo script Lua, via redis.asyncio)
+    """
+    
+    @staticmethod
+    async def _run(
+        client_id: int,
+        limit_per_minute: int,
+        limit_per_day: int,
+        algorithm: Optional[str],
+        cost: int
+    ) -> dict:
+        algorithm, keys, args = RateLimiter._script_call(
+            client_id, limit_per_minute, limit_per_day, algorithm, cost
+        )
+        result = await AsyncRedis.script(RATE_LIMIT_SCRIPT)(keys=keys, args=args)
+        return RateLimiter._parse(result, algorithm, limit_per_minute, limit_per_day)
+    
+    @staticmethod
+    async def check_rate_limit(
+        client_id: int,
+        limit_per_minute: int,
+        limit_per_day: int,
+        algorithm: Optional[str] = None
+    ) -> tuple[bool, dict]:
+        """
+        Verifica e consome rate limits (minuto e dia) atomicamente
+        Returns: (allowed, info_dict)
+        """
+        from app.core.rate_limit_lease import lease_rate_limiter
         
         try:
-            minute_count = redis_client.get(minute_key) or 0
-            day_count = redis_client.get(day_key) or 0
+            if RateLimiter.resolve_algorithm(algorithm) == "local_lease":
+                return await lease_rate_limiter.check_async(client_id, limit_per_minute, limit_per_day)
+            info = await AsyncRateLimiter._run(client_id, limit_per_minute, limit_per_day, algorithm, cost=1)
+            return info["allowed"], info
             
+        except Exception as e:
+            print(f"Rate limit error: {e}")
+            return RateLimiter.fallback(client_id, limit_per_minute, limit_per_day, e)
+    
+    @staticmethod
+    async def get_current_usage(
+        client_id: int,
+        limit_per_minute: int = settings.DEFAULT_RATE_LIMIT_PER_MINUTE,
+        limit_per_day: int = settings.DEFAULT_RATE_LIMIT_PER_DAY,
+        algorithm: Optional[str] = None
+    ) -> dict:
+        """Retorna uso atual do cliente (sem consumir quota)"""
+        try:
+            info = await AsyncRateLimiter._run(client_id, limit_per_minute, limit_per_day, algorithm, cost=0)
             return {
-                "minute_count": int(minute_count),
-                "day_count": int(day_count)
+                "minute_count": info["minute_count"],
+                "day_count": info["day_count"],
+                "reset_minute": info["reset_minute"],
+                "reset_day": info["reset_day"]
             }
         except Exception as e:
             return {"error": str(e)}
@@ -0,0 +1,64 @@
+"""
+Paginação por cursor (keyset).
+
+O cursor é opaco para o cliente: base64url de uma lista JSON com os valores
+da chave de ordenação da última linha retornada.
+"""
+from fastapi import HTTPException, Response, status
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+import base64
+import json
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Gera o cursor a partir dos valores da chave de ordenação"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Lê um cursor gerado por encode_cursor.
+    Levanta 400 se o cursor for inválido.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("tamanho inválido")
+        return [_decode_value(v) for v in values]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cursor inválido: {e}"
+        )
+
+
+def paginate(rows: List[Any], limit: int, key, response: Optional[Response] = None) -> tuple:
+    """
+    Recebe até limit + 1 linhas; devolve (linhas da página, next_cursor).
+    Se `response` for passado, o cursor também vai no header X-Next-Cursor.
+    """
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(key(rows[-1]))
+    if response is not None and next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows, next_cursor
@@ -0,0 +1,74 @@
+"""
+Pools de execução compartilhados pelo processo (parsing do crawler, análise
+on-page em lote, parsing do import em lote).
+
+O pool é criado no primeiro uso e reaproveitado. Um ProcessPoolExecutor cujo
+processo filho morreu (ex.: OOM) fica quebrado e recusa novas tarefas com
+BrokenProcessPool: o SharedPool descarta o pool quebrado e envia a tarefa a
+um pool novo, então só as tarefas que estavam no pool morto falham.
+
+Processo daemon (worker prefork do Celery) não pode ter filhos: ali o pool é
+de threads, sem paralelismo de CPU.
+"""
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+import multiprocessing
+import threading
+
+
+def in_daemon_process() -> bool:
+    """Processo daemon (worker prefork do Celery) não pode ter filhos"""
+    return multiprocessing.current_process().daemon
+
+
+class SharedPool(Executor):
+    """
+    Executor criado sob demanda e recriado se o pool de processos quebrar.
+    workers: número de workers (lido na criação do pool)
+    processes: False para usar threads (lido na criação do pool)
+    """
+
+    def __init__(self, name: str, workers: Callable[[], int], processes: Callable[[], bool] = lambda: True):
+        self.name = name
+        self._workers = workers
+        self._processes = processes
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                processes = self._processes()
+                if processes and in_daemon_process():
+                    print(f"Pool {self.name}: processo daemon, usando threads (sem paralelismo de CPU)")
+                    processes = False
+                pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+                self._executor = pool(max_workers=self._workers())
+            return self._executor
+
+    @property
+    def uses_processes(self) -> bool:
+        return isinstance(self.executor(), ProcessPoolExecutor)
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        executor = self.executor()
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            print(f"Pool {self.name}: processo do pool morreu, recriando o pool")
+            self._discard(executor)
+            return self.executor().submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def _discard(self, executor: Executor) -> None:
+        with self._lock:
+            # Outra thread pode já ter trocado o pool
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
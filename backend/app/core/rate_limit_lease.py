@@ -0,0 +1,313 @@
+"""
+Rate limiting local com quotas pré-alocadas (leases) e fallback sem Redis.
+
+No modo `local_lease`, cada worker reserva no Redis uma fatia da quota do
+cliente e a consome em memória; só volta ao Redis quando a fatia acaba ou a
+janela de minuto vira. As sobras são devolvidas de forma assíncrona por um
+reconciliador em background.
+"""
+from dataclasses import dataclass
+from typing import Optional, Dict, Tuple
+import math
+import threading
+import time
+from app.config import settings
+from app.core.cache import redis_client, AsyncRedis
+
+
+# Reserva até ARGV[3] permissões nas janelas fixas de minuto e dia
+# KEYS[1] = base da janela de minuto, KEYS[2] = base da janela de dia
+RATE_LIMIT_LEASE_SCRIPT = """
+local limit_minute = tonumber(ARGV[1])
+local limit_day = tonumber(ARGV[2])
+local want = tonumber(ARGV[3])
+
+local now = tonumber(redis.call('TIME')[1])
+local minute_start = now - (now % 60)
+local day_start = now - (now % 86400)
+local minute_key = KEYS[1] .. ':' .. minute_start
+local day_key = KEYS[2] .. ':' .. day_start
+
+local minute_used = tonumber(redis.call('GET', minute_key) or '0')
+local day_used = tonumber(redis.call('GET', day_key) or '0')
+local grant = math.max(0, math.min(want, limit_minute - minute_used, limit_day - day_used))
+
+if grant > 0 then
+    redis.call('INCRBY', minute_key, grant)
+    redis.call('EXPIRE', minute_key, 120)
+    redis.call('INCRBY', day_key, grant)
+    redis.call('EXPIRE', day_key, 172800)
+end
+
+return {grant, minute_used + grant, day_used + grant, minute_start + 60, day_start + 86400, minute_key, day_key, now}
+"""
+
+# Devolve sobras: decrementa apenas keys que ainda existem, sem ficar negativo
+RATE_LIMIT_REFUND_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    local current = tonumber(redis.call('GET', key) or '0')
+    local amount = math.min(tonumber(ARGV[i]), current)
+    if amount > 0 then
+        redis.call('DECRBY', key, amount)
+    end
+end
+return #KEYS
+"""
+
+
+@dataclass
+class QuotaLease:
+    """
+    Fatia da quota de um cliente reservada por este worker
+    """
+    tokens: int
+    minute_count: int
+    day_count: int
+    minute_reset: float
+    day_reset: float
+    minute_key: str
+    day_key: str
+    last_used: float
+
+
+class LocalRateLimiter:
+    """
+    Limite aproximado por worker, usado quando o Redis está indisponível.
+    Cada worker aceita limite / RATE_LIMIT_LOCAL_WORKERS, o que limita a
+    admissão excedente ao arredondamento por worker.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._windows: Dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def check(self, client_id: int, limit_per_minute: int, limit_per_day: int) -> Tuple[bool, dict]:
+        now = int(time.time())
+        minute_start = now - now % 60
+        day_start = now - now % 86400
+        minute_limit = math.ceil(limit_per_minute / self.workers)
+        day_limit = math.ceil(limit_per_day / self.workers)
+
+        with self._lock:
+            window = self._windows.get(client_id)
+            if window is None or window[2] != day_start:
+                window = [minute_start, 0, day_start, 0]
+            elif window[0] != minute_start:
+                window[0], window[1] = minute_start, 0
+            self._windows[client_id] = window
+
+            reason = None
+            if window[1] >= minute_limit:
+                reason = "minute_limit_exceeded"
+            elif window[3] >= day_limit:
+                reason = "day_limit_exceeded"
+            else:
+                window[1] += 1
+                window[3] += 1
+            minute_count, day_count = window[1], window[3]
+
+        reset_at = minute_start + 60 if reason == "minute_limit_exceeded" else day_start + 86400
+        return reason is None, {
+            "allowed": reason is None,
+            "reason": reason,
+            "algorithm": "local_fallback",
+            "minute_count": minute_count,
+            "minute_limit": limit_per_minute,
+            "day_count": day_count,
+            "day_limit": limit_per_day,
+            "remaining_minute": max(0, minute_limit - minute_count),
+            "remaining_day": max(0, day_limit - day_count),
+            "reset_minute": minute_start + 60,
+            "reset_day": day_start + 86400,
+            "retry_after": max(1, reset_at - now) if reason else 0
+        }
+
+
+local_rate_limiter = LocalRateLimiter(settings.RATE_LIMIT_LOCAL_WORKERS)
+
+
+class LeaseRateLimiter:
+    """
+    Consome quotas reservadas em memória, renovando no Redis sob demanda
+    """
+
+    def __init__(self, fraction: float):
+        self.fraction = fraction
+        self._leases: Dict[int, QuotaLease] = {}
+        self._refunds: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._lease_script = redis_client.register_script(RATE_LIMIT_LEASE_SCRIPT)
+        self._refund_script = redis_client.register_script(RATE_LIMIT_REFUND_SCRIPT)
+
+    def lease_size(self, limit_per_minute: int) -> int:
+        return max(1, math.ceil(limit_per_minute * self.fraction))
+
+    def _retire(self, client_id: int, lease: QuotaLease, include_minute: bool) -> None:
+        """Agenda a devolução das sobras (chamar com o lock adquirido)"""
+        self._leases.pop(client_id, None)
+        if lease.tokens <= 0:
+            return
+        self._refunds[lease.day_key] = self._refunds.get(lease.day_key, 0) + lease.tokens
+        if include_minute:
+            self._refunds[lease.minute_key] = self._refunds.get(lease.minute_key, 0) + lease.tokens
+
+    @staticmethod
+    def _info(lease: QuotaLease, limit_per_minute: int, limit_per_day: int, reason: Optional[str], now: float) -> dict:
+        # Contagens vistas no Redis na última reserva, descontando o que ainda não foi gasto aqui
+        minute_count = lease.minute_count - lease.tokens
+        day_count = lease.day_count - lease.tokens
+        reset_at = lease.minute_reset if reason == "minute_limit_exceeded" else lease.day_reset
+        return {
+            "allowed": reason is None,
+            "reason": reason,
+            "algorithm": "local_lease",
+            "minute_count": minute_count,
+            "minute_limit": limit_per_minute,
+            "day_count": day_count,
+            "day_limit": limit_per_day,
+            "remaining_minute": max(0, limit_per_minute - minute_count),
+            "remaining_day": max(0, limit_per_day - day_count),
+            "reset_minute": math.ceil(lease.minute_reset),
+            "reset_day": math.ceil(lease.day_reset),
+            "retry_after": max(1, math.ceil(reset_at - now)) if reason else 0
+        }
+
+    def _take_local(self, client_id: int, limit_per_minute: int, limit_per_day: int, now: float) -> Optional[Tuple[bool, dict]]:
+        """Consome da reserva local; None se for preciso renovar no Redis"""
+        with self._lock:
+            lease = self._leases.get(client_id)
+            if lease and now >= lease.minute_reset:
+                # A janela de minuto virou: a sobra só volta para o contador diário
+                self._retire(client_id, lease, include_minute=False)
+                lease = None
+            if lease and lease.tokens > 0:
+                lease.tokens -= 1
+                lease.last_used = now
+                return True, self._info(lease, limit_per_minute, limit_per_day, None, now)
+        return None
+
+    def _lease_call(self, client_id: int, limit_per_minute: int, limit_per_day: int) -> Tuple[list, list]:
+        keys = [
+            f"rate_limit:{{client:{client_id}}}:lease:minute",
+            f"rate_limit:{{client:{client_id}}}:lease:day"
+        ]
+        return keys, [limit_per_minute, limit_per_day, self.lease_size(limit_per_minute)]
+
+    def _apply_grant(self, client_id: int, limit_per_minute: int, limit_per_day: int, result: list, now: float) -> Tuple[bool, dict]:
+        """Guarda a nova reserva e consome a primeira permissão dela"""
+        grant, minute_count, day_count, minute_reset, day_reset, minute_key, day_key, server_now = result
+        # Converte os resets do relógio do Redis para o relógio local
+        skew = now - server_now
+        lease = QuotaLease(
+            tokens=grant,
+            minute_count=minute_count,
+            day_count=day_count,
+            minute_reset=minute_reset + skew,
+            day_reset=day_reset + skew,
+            minute_key=minute_key,
+            day_key=day_key,
+            last_used=now
+        )
+
+        with self._lock:
+            previous = self._leases.get(client_id)
+            if previous and previous.minute_key == lease.minute_key:
+                # Outra renovação concorrente: junta as permissões
+                lease.tokens += previous.tokens
+            if lease.tokens <= 0:
+                self._leases.pop(client_id, None)
+                reason = "minute_limit_exceeded" if minute_count >= limit_per_minute else "day_limit_exceeded"
+                return False, self._info(lease, limit_per_minute, limit_per_day, reason, now)
+            lease.tokens -= 1
+            self._leases[client_id] = lease
+            return True, self._info(lease, limit_per_minute, limit_per_day, None, now)
+
+    def check(self, client_id: int, limit_per_minute: int, limit_per_day: int) -> Tuple[bool, dict]:
+        """
+        Consome uma permissão da quota local; renova a reserva se necessário.
+        Exceções do Redis sobem para o chamador aplicar a política de fallback.
+        """
+        now = time.time()
+        local = self._take_local(client_id, limit_per_minute, limit_per_day, now)
+        if local:
+            return local
+        keys, args = self._lease_call(client_id, limit_per_minute, limit_per_day)
+        result = self._lease_script(keys=keys, args=args)
+        return self._apply_grant(client_id, limit_per_minute, limit_per_day, result, now)
+
+    async def check_async(self, client_id: int, limit_per_minute: int, limit_per_day: int) -> Tuple[bool, dict]:
+        """Mesmo que check(), renovando a reserva pelo cliente redis.asyncio"""
+        now = time.time()
+        local = self._take_local(client_id, limit_per_minute, limit_per_day, now)
+        if local:
+            return local
+        keys, args = self._lease_call(client_id, limit_per_minute, limit_per_day)
+        result = await AsyncRedis.script(RATE_LIMIT_LEASE_SCRIPT)(keys=keys, args=args)
+        return self._apply_grant(client_id, limit_per_minute, limit_per_day, result, now)
+
+    def reconcile(self, idle_seconds: float, release_all: bool = False) -> int:
+        """
+        Devolve ao Redis as sobras de reservas expiradas ou ociosas.
+        Returns: número de keys ajustadas
+        """
+        now = time.time()
+        with self._lock:
+            for client_id, lease in list(self._leases.items()):
+                if now >= lease.minute_reset:
+                    self._retire(client_id, lease, include_minute=False)
+                elif release_all or now - lease.last_used >= idle_seconds:
+                    self._retire(client_id, lease, include_minute=True)
+            if not self._refunds:
+                return 0
+            refunds, self._refunds = self._refunds, {}
+
+        try:
+            return self._refund_script(keys=list(refunds), args=list(refunds.values()))
+        except Exception as e:
+            print(f"Rate limit lease refund error: {e}")
+            with self._lock:
+                for key, amount in refunds.items():
+                    self._refunds[key] = self._refunds.get(key, 0) + amount
+            return 0
+
+
+lease_rate_limiter = LeaseRateLimiter(settings.RATE_LIMIT_LEASE_FRACTION)
+
+
+class LeaseReconciler:
+    """
+    Thread que devolve periodicamente as sobras das reservas.
+    No stop libera todas as reservas deste worker.
+    """
+
+    def __init__(self, limiter: LeaseRateLimiter, interval: float):
+        self.limiter = limiter
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rate-limit-lease-reconciler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.limiter.reconcile(self.interval, release_all=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.limiter.reconcile(self.interval)
+
+
+lease_reconciler = LeaseReconciler(
+    lease_rate_limiter,
+    interval=settings.RATE_LIMIT_LEASE_RECONCILE_SECONDS
+)
@@ -1,23 +1,84 @@
 from fastapi import Security, HTTPException, status, Request, Depends
 from fastapi.security import APIKeyHeader
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List, Tuple
 from datetime import datetime
-from app.database import get_db
+from app.database import get_async_db
 from app.models.auth import APIKey, Client, APIKeyStatus, APIKeyPermission
-from app.core.cache import Cache, RateLimiter
-import json
+from app.models.domain import Domain
+from app.core.cache import AsyncCache, AsyncRateLimiter
+from app.core.usage_counters import usage_counters
+from app.core.auth_cache import (
+    ClientSnapshot, APIKeySnapshot, AuthInvalidation, local_auth_cache
+)
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
+async def resolve_api_key(key_hash: str, db: AsyncSession) -> Tuple[ClientSnapshot, APIKeySnapshot]:
+    """
+    Resolve o estado de uma API Key + Cliente.
+    Ordem: cache L1 do worker, cache L2 no Redis e, por fim, o banco.
+    """
+    entry = local_auth_cache.get(key_hash)
+    if entry:
+        return entry
+    
+    cache_key = f"api_key:{key_hash}"
+    cached_data = await AsyncCache.get(cache_key)
+    
+    if cached_data and "api_key" in cached_data and "client" in cached_data:
+        entry = (
+            ClientSnapshot.from_dict(cached_data["client"]),
+            APIKeySnapshot.from_dict(cached_data["api_key"])
+        )
+        local_auth_cache.set(key_hash, entry)
+        return entry
+    
+    # Busca no DB
+    api_key_obj = await db.scalar(
+        select(APIKey).where(APIKey.key_hash == key_hash)
+    )
+    
+    if not api_key_obj:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="API Key inválida"
+        )
+    
+    client = await db.scalar(select(Client).where(Client.id == api_key_obj.client_id))
+    
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cliente não encontrado"
+        )
+    
+    entry = (ClientSnapshot.from_model(client), APIKeySnapshot.from_model(api_key_obj))
+    
+    # Cacheia por 5 minutos no Redis e pelo TTL do L1 neste worker
+    await AsyncCache.set(
+        cache_key,
+        {
+            'client': entry[0].to_dict(),
+            'api_key': entry[1].to_dict()
+        },
+        ttl=300,
+        tags=[f"client:{client.id}", f"api_key:{api_key_obj.id}"]
+    )
+    local_auth_cache.set(key_hash, entry)
+    
+    return entry
+
+
 async def get_current_client(
     request: Request,
     api_key: str = Security(api_key_header),
-    db: Session = Depends(get_db)
-) -> Tuple[Client, APIKey]:
+    db: AsyncSession = Depends(get_async_db)
+) -> Tuple[ClientSnapshot, APIKeySnapshot]:
     """
-    Valida API Key e retorna Client + APIKey
+    Valida API Key e retorna snapshots de Client + APIKey
     """
     
     if not api_key:
@@ -37,47 +98,8 @@ async def get_current_client(
     # 2. Hash da key
     key_hash = APIKey.hash_key(api_key)
     
-    # 3. Busca no cache primeiro
-    cache_key = f"api_key:{key_hash}"
-    cached_data = Cache.get(cache_key)
-    
-    if cached_data:
-        api_key_id = cached_data.get('api_key_id')
-        client_id = cached_data.get('client_id')
-        
-        api_key_obj = db.query(APIKey).filter(APIKey.id == api_key_id).first()
-        client = db.query(Client).filter(Client.id == client_id).first()
-    else:
-        # Busca no DB
-        api_key_obj = db.query(APIKey).filter(
-            APIKey.key_hash == key_hash
-        ).first()
-        
-        if not api_key_obj:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="API Key inválida"
-            )
-        
-        client = db.query(Client).filter(Client.id == api_key_obj.client_id).first()
-        
-        if not client:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Cliente não encontrado"
-            )
-        
-        # Cacheia por 5 minutos
-        Cache.set(
-            cache_key,
-            {
-                'api_key_id': api_key_obj.id,
-                'client_id': client.id,
-                'status': api_key_obj.status.value,
-                'permissions': api_key_obj.permissions
-            },
-            ttl=300
-        )
+    # 3. Resolve o estado da key: L1 (memória) -> L2 (Redis) -> DB
+    client, api_key_obj = await resolve_api_key(key_hash, db)
     
     # 4. Valida status
     if api_key_obj.status != APIKeyStatus.ACTIVE:
@@ -88,8 +110,14 @@ async def get_current_client(
     
     # 5. Valida expiração
     if api_key_obj.expires_at and api_key_obj.expires_at < datetime.utcnow():
-        api_key_obj.status = APIKeyStatus.EXPIRED
-        db.commit()
+        await db.execute(
+            update(APIKey)
+            .where(APIKey.id == api_key_obj.id)
+            .values(status=APIKeyStatus.EXPIRED)
+        )
+        await db.commit()
+        await AsyncCache.delete(f"api_key:{key_hash}")
+        await AuthInvalidation.api_key(key_hash)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="API Key expirada"
@@ -112,12 +140,19 @@ async def get_current_client(
             )
     
     # 8. Rate Limiting
-    allowed, rate_info = RateLimiter.check_rate_limit(
+    allowed, rate_info = await AsyncRateLimiter.check_rate_limit(
         client.id,
         client.rate_limit_per_minute,
-        client.rate_limit_per_day
+        client.rate_limit_per_day,
+        client.rate_limit_algorithm
     )
     
+    if not allowed and rate_info.get('reason') == "rate_limiter_unavailable":
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Rate limiter indisponível, tente novamente"
+        )
+    
     if not allowed:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -127,13 +162,14 @@ async def get_current_client(
                 "X-RateLimit-Limit-Day": str(client.rate_limit_per_day),
                 "X-RateLimit-Remaining-Minute": str(rate_info.get('remaining_minute', 0)),
                 "X-RateLimit-Remaining-Day": str(rate_info.get('remaining_day', 0)),
+                "X-RateLimit-Reset-Minute": str(rate_info.get('reset_minute', 0)),
+                "X-RateLimit-Reset-Day": str(rate_info.get('reset_day', 0)),
+                "Retry-After": str(rate_info.get('retry_after', 1)),
             }
         )
     
-    # 9. Atualiza last_used (de forma assíncrona/periódica para não travar)
-    api_key_obj.last_used_at = datetime.utcnow()
-    api_key_obj.total_requests += 1
-    db.commit()
+    # 9. Atualiza last_used (em memória; gravado em lote pelo flusher)
+    usage_counters.record(api_key_obj.id)
     
     # 10. Armazena no request state para uso no middleware de logging
     request.state.client_id = client.id
@@ -147,8 +183,8 @@ def require_permissions(required_permissions: List[str]):
     Dependency para verificar permissões específicas
     """
     async def permission_checker(
-        auth_data: Tuple[Client, APIKey] = Depends(get_current_client)
-    ) -> Tuple[Client, APIKey]:
+        auth_data: Tuple[ClientSnapshot, APIKeySnapshot] = Depends(get_current_client)
+    ) -> Tuple[ClientSnapshot, APIKeySnapshot]:
         client, api_key = auth_data
         
         # Admin tem acesso total
@@ -172,7 +208,7 @@ def require_permissions(required_permissions: List[str]):
     return permission_checker
 
 
-def check_domain_access(domain_id: int, api_key: APIKey) -> bool:
+def check_domain_access(domain_id: int, api_key: APIKeySnapshot) -> bool:
     """
     Verifica se a API Key tem acesso ao domínio
     """
@@ -186,8 +222,8 @@ def check_domain_access(domain_id: int, api_key: APIKey) -> bool:
 
 async def verify_domain_access(
     domain_id: int,
-    auth_data: Tuple[Client, APIKey] = Depends(get_current_client)
-) -> Tuple[Client, APIKey]:
+    auth_data: Tuple[ClientSnapshot, APIKeySnapshot] = Depends(get_current_client)
+) -> Tuple[ClientSnapshot, APIKeySnapshot]:
     """
     Dependency para verificar acesso a um domínio específico
     """
@@ -200,3 +236,29 @@ async def verify_domain_access(
         )
     
     return client, api_key
+
+
+async def ensure_domain_access(
+    domain_id: int,
+    client: ClientSnapshot,
+    api_key: APIKeySnapshot,
+    db: AsyncSession
+) -> None:
+    """
+    Garante que o domínio é do cliente e está liberado para a API Key
+    """
+    if not check_domain_access(domain_id, api_key):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado a este domínio"
+        )
+    
+    owned = await db.scalar(select(Domain.id).where(
+        Domain.id == domain_id,
+        Domain.client_id == client.id
+    ))
+    if not owned:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Domínio não encontrado"
+        )
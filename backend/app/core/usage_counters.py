@@ -0,0 +1,133 @@
+"""
+Contadores de uso das API Keys com escrita adiada (write-behind).
+
+Cada request apenas incrementa um contador em memória; um flusher em
+background grava os deltas acumulados em `api_keys` com UPDATEs em lote.
+"""
+from datetime import datetime
+from typing import Optional, Dict, Tuple
+import threading
+from sqlalchemy import update, bindparam
+from app.config import settings
+from app.database import engine
+from app.models.auth import APIKey
+
+
+class UsageCounters:
+    """
+    Acumula total_requests e last_used_at por API Key neste worker
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, list] = {}
+        self._lock = threading.Lock()
+        api_keys = APIKey.__table__
+        self._update_stmt = (
+            update(api_keys)
+            .where(api_keys.c.id == bindparam("b_id"))
+            .values(
+                total_requests=api_keys.c.total_requests + bindparam("b_delta"),
+                last_used_at=bindparam("b_last_used_at")
+            )
+        )
+
+    def record(self, api_key_id: int, used_at: Optional[datetime] = None) -> None:
+        """Registra um uso da API Key (sem tocar no banco)"""
+        used_at = used_at or datetime.utcnow()
+        with self._lock:
+            entry = self._pending.get(api_key_id)
+            if entry is None:
+                self._pending[api_key_id] = [1, used_at]
+            else:
+                entry[0] += 1
+                if used_at > entry[1]:
+                    entry[1] = used_at
+
+    def pending(self, api_key_id: int) -> Tuple[int, Optional[datetime]]:
+        """Retorna (delta, last_used_at) ainda não gravados no banco"""
+        with self._lock:
+            entry = self._pending.get(api_key_id)
+            return (entry[0], entry[1]) if entry else (0, None)
+
+    def merge(
+        self,
+        api_key_id: int,
+        total_requests: Optional[int],
+        last_used_at: Optional[datetime]
+    ) -> Tuple[int, Optional[datetime]]:
+        """Soma os deltas pendentes aos valores lidos do banco"""
+        delta, pending_last_used = self.pending(api_key_id)
+        total = (total_requests or 0) + delta
+        if pending_last_used and (not last_used_at or pending_last_used > last_used_at):
+            last_used_at = pending_last_used
+        return total, last_used_at
+
+    def flush(self) -> int:
+        """
+        Grava os deltas acumulados com um único UPDATE em lote.
+        Em caso de erro, os deltas voltam para a fila.
+        Returns: número de API Keys atualizadas
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+
+        rows = [
+            {"b_id": api_key_id, "b_delta": delta, "b_last_used_at": last_used_at}
+            for api_key_id, (delta, last_used_at) in batch.items()
+        ]
+        try:
+            with engine.begin() as conn:
+                conn.execute(self._update_stmt, rows)
+            return len(rows)
+        except Exception as e:
+            print(f"Usage counters flush error: {e}")
+            with self._lock:
+                for api_key_id, (delta, last_used_at) in batch.items():
+                    entry = self._pending.setdefault(api_key_id, [0, last_used_at])
+                    entry[0] += delta
+                    if last_used_at > entry[1]:
+                        entry[1] = last_used_at
+            return 0
+
+
+usage_counters = UsageCounters()
+
+
+class UsageCounterFlusher:
+    """
+    Thread que grava os contadores periodicamente.
+    No stop faz um último flush para não perder deltas.
+    """
+
+    def __init__(self, counters: UsageCounters, interval: float):
+        self.counters = counters
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="usage-counter-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.counters.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.counters.flush()
+
+
+usage_counter_flusher = UsageCounterFlusher(
+    usage_counters,
+    interval=settings.USAGE_COUNTERS_FLUSH_SECONDS
+)
@@ -0,0 +1,198 @@
+"""
+Pipeline assíncrono de gravação dos logs de uso.
+
+O middleware apenas enfileira o registro; uma task em background agrupa os
+registros e grava em lote (COPY no Postgres, executemany nos demais bancos)
+sem bloquear o event loop. Os rollups de uso são atualizados no mesmo lote.
+"""
+from typing import Optional, Dict, Any, List
+import asyncio
+import csv
+import io
+import random
+import time
+from sqlalchemy import insert
+from app.config import settings
+from app.database import engine
+from app.models.auth import UsageLog
+from app.core.usage_rollups import apply_rollups
+
+
+USAGE_LOG_COLUMNS = [
+    "client_id", "api_key_id", "endpoint", "method", "status_code",
+    "ip_address", "user_agent", "response_time_ms", "created_at"
+]
+
+
+class UsageLogWriter:
+    """
+    Fila limitada + writer em lote para UsageLog.
+
+    Política quando a fila enche (USAGE_LOG_OVERFLOW_POLICY):
+    - drop: descarta o registro novo
+    - sample: acima de 80% da fila, mantém 1 a cada USAGE_LOG_SAMPLE_RATE
+      respostas de sucesso (erros são sempre mantidos); cheia, descarta
+    - block: aguarda até USAGE_LOG_BLOCK_TIMEOUT_SECONDS por espaço
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        overflow_policy: str = "sample",
+        sample_rate: int = 10,
+        block_timeout: float = 0.05
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.sample_rate = max(1, sample_rate)
+        self.block_timeout = block_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "sampled_out": 0,
+            "failed": 0,
+            "batches": 0
+        }
+
+    def start(self) -> None:
+        """Cria a fila e a task do writer no event loop atual"""
+        if self._task and not self._task.done():
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._run(), name="usage-log-writer")
+
+    async def stop(self) -> None:
+        """Grava o que restou na fila e encerra o writer"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        rows = self._drain(self._queue.qsize())
+        while rows:
+            await asyncio.to_thread(self._write, rows)
+            rows = self._drain(self.batch_size)
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "queued": self.queued(), "max_size": self.max_size}
+
+    async def enqueue(self, row: Dict[str, Any]) -> bool:
+        """
+        Enfileira um registro de uso.
+        Returns: False se o registro foi descartado
+        """
+        if self._queue is None:
+            self.stats["dropped"] += 1
+            return False
+
+        if self.overflow_policy == "sample" and self._queue.qsize() >= self.max_size * 0.8:
+            is_error = (row.get("status_code") or 0) >= 400
+            if not is_error and random.randrange(self.sample_rate) != 0:
+                self.stats["sampled_out"] += 1
+                return False
+
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            if self.overflow_policy != "block":
+                self.stats["dropped"] += 1
+                return False
+            try:
+                await asyncio.wait_for(self._queue.put(row), self.block_timeout)
+            except asyncio.TimeoutError:
+                self.stats["dropped"] += 1
+                return False
+
+        self.stats["enqueued"] += 1
+        return True
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return rows
+
+    async def _run(self) -> None:
+        while True:
+            rows = []
+            try:
+                # Espera o primeiro registro e junta o lote até encher ou vencer o intervalo
+                rows.append(await self._queue.get())
+                deadline = time.monotonic() + self.flush_interval
+                while len(rows) < self.batch_size:
+                    rows.extend(self._drain(self.batch_size - len(rows)))
+                    remaining = deadline - time.monotonic()
+                    if len(rows) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        rows.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Encerrando: não perde o lote que já saiu da fila
+                if rows:
+                    self._write(rows)
+                raise
+            await asyncio.to_thread(self._write, rows)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """Grava um lote (roda em thread, fora do event loop)"""
+        try:
+            with engine.begin() as conn:
+                if conn.dialect.name == "postgresql":
+                    self._copy(conn, rows)
+                else:
+                    conn.execute(insert(UsageLog.__table__), rows)
+                # Rollups na mesma transação dos logs
+                apply_rollups(conn, rows)
+            self.stats["written"] += len(rows)
+            self.stats["batches"] += 1
+        except Exception as e:
+            print(f"Usage log write error ({len(rows)} rows): {e}")
+            self.stats["failed"] += len(rows)
+
+    @staticmethod
+    def _copy(conn, rows: List[Dict[str, Any]]) -> None:
+        """COPY ... FROM STDIN no Postgres (mais rápido que INSERT em lote)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                r"\N" if row.get(column) is None else row[column]
+                for column in USAGE_LOG_COLUMNS
+            ])
+        buffer.seek(0)
+
+        # Usa a conexão DBAPI da transação atual (commit fica com o chamador)
+        with conn.connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY usage_logs ({', '.join(USAGE_LOG_COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+
+
+usage_log_writer = UsageLogWriter(
+    max_size=settings.USAGE_LOG_QUEUE_SIZE,
+    batch_size=settings.USAGE_LOG_BATCH_SIZE,
+    flush_interval=settings.USAGE_LOG_FLUSH_SECONDS,
+    overflow_policy=settings.USAGE_LOG_OVERFLOW_POLICY,
+    sample_rate=settings.USAGE_LOG_SAMPLE_RATE,
+    block_timeout=settings.USAGE_LOG_BLOCK_TIMEOUT_SECONDS
+)
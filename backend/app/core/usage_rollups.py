@@ -0,0 +1,125 @@
+"""
+Rollups incrementais de uso (por hora e por dia).
+
+Cada lote gravado em usage_logs é agregado em memória e somado às linhas de
+usage_rollups com um upsert (ON CONFLICT DO UPDATE), no Postgres e no SQLite.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterable, Tuple
+from sqlalchemy import select, delete, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.auth import UsageLog, UsageRollup
+
+
+GRANULARITIES = ("hour", "day")
+
+RollupKey = Tuple[str, datetime, int, int, str]
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    """Início do bucket (hora ou dia) que contém `value`"""
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Agrega registros de uso em deltas de rollup (hora e dia)
+    """
+    totals: Dict[RollupKey, List[int]] = {}
+    for row in rows:
+        created_at = row["created_at"]
+        is_error = 1 if (row.get("status_code") or 0) >= 400 else 0
+        response_time = row.get("response_time_ms") or 0
+        for granularity in GRANULARITIES:
+            key = (
+                granularity,
+                bucket_start(created_at, granularity),
+                row["client_id"],
+                row.get("api_key_id") or 0,
+                row["endpoint"]
+            )
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [1, is_error, response_time]
+            else:
+                total[0] += 1
+                total[1] += is_error
+                total[2] += response_time
+
+    return [
+        {
+            "granularity": granularity,
+            "bucket_start": start,
+            "client_id": client_id,
+            "api_key_id": api_key_id,
+            "endpoint": endpoint,
+            "request_count": count,
+            "error_count": errors,
+            "total_response_time_ms": response_time
+        }
+        for (granularity, start, client_id, api_key_id, endpoint), (count, errors, response_time) in totals.items()
+    ]
+
+
+def _upsert_statement(dialect_name: str):
+    table = UsageRollup.__table__
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=["granularity", "bucket_start", "client_id", "api_key_id", "endpoint"],
+        set_={
+            "request_count": table.c.request_count + stmt.excluded.request_count,
+            "error_count": table.c.error_count + stmt.excluded.error_count,
+            "total_response_time_ms": table.c.total_response_time_ms + stmt.excluded.total_response_time_ms
+        }
+    )
+
+
+def apply_rollups(conn: Connection, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Soma um lote de registros de uso aos rollups.
+    Returns: número de buckets afetados
+    """
+    deltas = aggregate(rows)
+    if deltas:
+        conn.execute(_upsert_statement(conn.dialect.name), deltas)
+    return len(deltas)
+
+
+def rebuild_rollups(conn: Connection, start: datetime, end: datetime, chunk_size: int = 10000) -> int:
+    """
+    Recalcula os rollups de [start, end) a partir de usage_logs (reparo/backfill).
+    O intervalo é alinhado a dias inteiros para não deixar buckets parciais.
+
+    Roda serializado com o UsageLogWriter, que grava logs e incrementos na
+    mesma transação: o lock de usage_rollups espera os lotes que já somaram
+    seus incrementos (os logs deles entram na contagem) e segura os
+    próximos até o commit (os incrementos deles entram depois da contagem).
+    Nenhum lote é contado duas vezes nem perdido; a gravação de uso fica
+    parada enquanto o rebuild roda. No SQLite a escrita já é serial.
+    """
+    start = bucket_start(start, "day")
+    end = bucket_start(end, "day") + (timedelta(days=1) if end != bucket_start(end, "day") else timedelta())
+
+    if conn.dialect.name == "postgresql":
+        # Conflita com os INSERT/UPDATE do writer (e com outro rebuild), não com leituras
+        conn.execute(text(f"LOCK TABLE {UsageRollup.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+
+    conn.execute(delete(UsageRollup).where(
+        UsageRollup.bucket_start >= start,
+        UsageRollup.bucket_start < end
+    ))
+
+    logs = conn.execution_options(yield_per=chunk_size).execute(
+        select(
+            UsageLog.client_id, UsageLog.api_key_id, UsageLog.endpoint,
+            UsageLog.status_code, UsageLog.response_time_ms, UsageLog.created_at
+        ).where(UsageLog.created_at >= start, UsageLog.created_at < end)
+    )
+    buckets = 0
+    for partition in logs.mappings().partitions():
+        buckets += apply_rollups(conn, partition)
+    return buckets
@@ -1,6 +1,9 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from typing import AsyncIterator
 from app.config import settings
 
 # Engine do SQLAlchemy
@@ -27,6 +30,33 @@ engine = create_engine(
 # SessionLocal para criar sessões de banco
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_database_url(url: str) -> str:
+    """
+    Converte a URL síncrona para o driver assíncrono equivalente
+    (asyncpg para Postgres, aiosqlite para SQLite)
+    """
+    parsed = make_url(url)
+    drivers = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    backend = parsed.get_backend_name()
+    if backend in drivers:
+        parsed = parsed.set(drivername=drivers[backend])
+    return parsed.render_as_string(hide_password=False)
+
+
+# Engine assíncrono (usado pelos endpoints async def)
+async_engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    **engine_args
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base para os models
 Base = declarative_base()
 
@@ -42,6 +72,14 @@ def get_db() -> Session:
         db.close()
 
 
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency para obter sessão assíncrona do banco de dados
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """
     Inicializa o banco de dados criando todas as tabelas
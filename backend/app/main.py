@@ -5,9 +5,14 @@ from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 import time
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, async_engine, Base
 from app.api.v1 import router as api_v1_router
 from app.middleware.logging import log_api_usage
+from app.core.cache import AsyncRedis
+from app.core.auth_cache import auth_invalidation_listener
+from app.core.usage_counters import usage_counter_flusher
+from app.core.rate_limit_lease import lease_reconciler
+from app.core.usage_log_writer import usage_log_writer
 from app.models import auth, domain  # Import para criar tabelas
 
 @asynccontextmanager
@@ -26,9 +31,20 @@ async def lifespan(app: FastAPI):
 
     Base.metadata.create_all(bind=engine)
     print("✅ Database tables created")
+    await AsyncRedis.connect()
+    auth_invalidation_listener.start()
+    usage_counter_flusher.start()
+    lease_reconciler.start()
+    usage_log_writer.start()
     yield
     # Shutdown
     print("🔴 Shutting down...")
+    await usage_log_writer.stop()
+    await async_engine.dispose()
+    await AsyncRedis.close()
+    auth_invalidation_listener.stop()
+    usage_counter_flusher.stop()
+    lease_reconciler.stop()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -73,4 +89,8 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": time.time()}
+    return {
+        "status": "healthy",
+        "timestamp": time.time(),
+        "usage_log": usage_log_writer.get_stats()
+    }
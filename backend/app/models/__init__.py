@@ -1,10 +1,15 @@
-from app.models.auth import Client, APIKey, UsageLog, APIKeyStatus, APIKeyPermission
-from app.models.domain import Domain, Keyword, Ranking, Backlink, Page
+from app.models.auth import Client, APIKey, UsageLog, UsageRollup, APIKeyStatus, APIKeyPermission
+from app.models.domain import Domain, Keyword, Ranking, Backlink, Page, SearchPerformance
+from app.models.ranking_history import RankingDimension, RankingPoint, RankingSummary
+from app.models.analytics import DomainAnalyticsSnapshot, KeywordEnrichment
+from app.models.job import Job, JobStatus
+from app.models.upload import UploadSession, ImportCheckpoint
 
 __all__ = [
     "Client",
     "APIKey",
     "UsageLog",
+    "UsageRollup",
     "APIKeyStatus",
     "APIKeyPermission",
     "Domain",
@@ -12,4 +17,14 @@ __all__ = [
     "Ranking",
     "Backlink",
     "Page",
+    "SearchPerformance",
+    "RankingDimension",
+    "RankingPoint",
+    "RankingSummary",
+    "DomainAnalyticsSnapshot",
+    "KeywordEnrichment",
+    "Job",
+    "JobStatus",
+    "UploadSession",
+    "ImportCheckpoint",
 ]
@@ -0,0 +1,64 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, JSON, Index, UniqueConstraint
+from datetime import datetime
+from app.database import Base
+
+
+class DomainAnalyticsSnapshot(Base):
+    """
+    Analytics do domínio já calculado (uma linha por domínio).
+    Atualizado de forma incremental pelos imports e checagens de ranking;
+    o endpoint só lê esta linha.
+    """
+    __tablename__ = "domain_analytics_snapshots"
+
+    domain_id = Column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), primary_key=True)
+
+    total_keywords = Column(Integer, default=0, nullable=False)
+    ranked_keywords = Column(Integer, default=0, nullable=False)  # observações com posição > 0
+    avg_position = Column(Float, default=0.0, nullable=False)
+    total_backlinks = Column(Integer, default=0, nullable=False)  # só ativos
+
+    organic_traffic_trend = Column(JSON)  # [{date, traffic, keywords}] por dia
+    top_keywords = Column(JSON)
+    recent_ranking_changes = Column(JSON)
+    backlinks_growth = Column(JSON)  # {"AAAA-MM": novos backlinks}
+
+    # Staleness: updated_at = última atualização incremental,
+    # computed_at = último recálculo completo; is_stale = uma atualização falhou
+    is_stale = Column(Boolean, default=False, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    computed_at = Column(DateTime)
+
+
+class KeywordEnrichment(Base):
+    """
+    Keywords do SemRush cruzadas com o desempenho real do GSC
+    (recalculado por domínio em services/enrichment.py)
+    """
+    __tablename__ = "keyword_enrichments"
+
+    id = Column(Integer, primary_key=True)
+    domain_id = Column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=False)
+    keyword = Column(String(500), nullable=False)
+
+    # SemRush
+    search_volume = Column(Integer, default=0, nullable=False)
+    keyword_difficulty = Column(Float, default=0.0, nullable=False)
+    cpc = Column(Float, default=0.0, nullable=False)
+
+    # GSC (janela de ENRICHMENT_GSC_DAYS dias)
+    real_impressions = Column(Integer)
+    real_clicks = Column(Integer)
+    real_ctr = Column(Float)
+    real_position = Column(Float)
+
+    volume_vs_impressions_ratio = Column(Float)
+    data_freshness = Column(String(20), nullable=False)  # semrush, gsc, enriched
+    computed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Recálculo faz upsert por keyword (o id da linha não muda entre recálculos)
+        UniqueConstraint("domain_id", "keyword", name="uq_keyword_enrichments_domain_keyword"),
+        # Paginação por cursor na ordenação padrão (volume desc, id)
+        Index("ix_keyword_enrichments_domain_volume", "domain_id", "search_volume", "id"),
+    )
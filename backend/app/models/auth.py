@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Enum, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, JSON, Enum, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import secrets
@@ -47,6 +47,7 @@ class Client(Base):
     max_api_keys = Column(Integer, default=5)
     rate_limit_per_minute = Column(Integer, default=60)
     rate_limit_per_day = Column(Integer, default=10000)
+    rate_limit_algorithm = Column(String(30), nullable=True)  # None = default da configuração
     
     # Metadados
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -142,3 +143,35 @@ class UsageLog(Base):
     
     # Relacionamentos
     client = relationship("Client", back_populates="usage_logs")
+    
+    __table_args__ = (
+        # Paginação por cursor: WHERE client_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_usage_logs_client_created_id", "client_id", "created_at", "id"),
+    )
+
+
+class UsageRollup(Base):
+    """
+    Agregados de uso por hora/dia (cliente, API key e endpoint).
+    Alimentado pelo writer de logs de uso; evita varrer usage_logs.
+    """
+    __tablename__ = "usage_rollups"
+    __table_args__ = (
+        UniqueConstraint(
+            "granularity", "bucket_start", "client_id", "api_key_id", "endpoint",
+            name="uq_usage_rollups_bucket"
+        ),
+        Index("ix_usage_rollups_client_bucket", "client_id", "granularity", "bucket_start"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(10), nullable=False)  # hour, day
+    bucket_start = Column(DateTime, nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    api_key_id = Column(Integer, nullable=False, default=0)  # 0 = sem API key
+    endpoint = Column(String(255), nullable=False)
+    
+    # Agregados
+    request_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    total_response_time_ms = Column(BigInteger, nullable=False, default=0)
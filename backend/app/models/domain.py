@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Text, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -31,6 +31,12 @@ class Domain(Base):
     rankings = relationship("Ranking", back_populates="domain", cascade="all, delete-orphan")
     backlinks = relationship("Backlink", back_populates="domain", cascade="all, delete-orphan")
     pages = relationship("Page", back_populates="domain", cascade="all, delete-orphan")
+    search_performance = relationship("SearchPerformance", back_populates="domain", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Listagem por cliente com paginação por cursor (id)
+        Index("ix_domains_client_id_id", "client_id", "id"),
+    )
 
 
 class Keyword(Base):
@@ -49,6 +55,7 @@ class Keyword(Base):
     cpc = Column(Float, default=0.0)
     competition = Column(String(50))
     trend_data = Column(JSON)  # Dados de tendência mensal
+    fingerprint = Column(String(32))  # md5 das métricas (pula upserts sem mudança)
     
     # Source
     source = Column(String(50), default="manual")  # semrush, gsc, manual, etc
@@ -60,6 +67,11 @@ class Keyword(Base):
     # Relacionamentos
     domain = relationship("Domain", back_populates="keywords")
     rankings = relationship("Ranking", back_populates="keyword_obj", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Alvo do upsert em lote (ON CONFLICT (domain_id, keyword))
+        UniqueConstraint("domain_id", "keyword", name="uq_keywords_domain_keyword"),
+    )
 
 
 class Ranking(Base):
@@ -96,6 +108,14 @@ class Ranking(Base):
     # Relacionamentos
     domain = relationship("Domain", back_populates="rankings")
     keyword_obj = relationship("Keyword", back_populates="rankings")
+    
+    __table_args__ = (
+        # Últimas observações por keyword (window em ranking_changes)
+        Index(
+            "ix_rankings_domain_keyword_checked",
+            "domain_id", "keyword", "search_engine", "location", "device", "checked_at"
+        ),
+    )
 
 
 class Backlink(Base):
@@ -110,6 +130,7 @@ class Backlink(Base):
     # Link info
     source_url = Column(Text, nullable=False)
     target_url = Column(Text, nullable=False)
+    url_hash = Column(String(32))  # md5 das URLs normalizadas (chave de deduplicação)
     referring_domain = Column(String(255), index=True)
     
     # Métricas
@@ -133,6 +154,11 @@ class Backlink(Base):
     
     # Relacionamentos
     domain = relationship("Domain", back_populates="backlinks")
+    
+    __table_args__ = (
+        # Alvo do upsert em lote (ON CONFLICT (domain_id, url_hash))
+        UniqueConstraint("domain_id", "url_hash", name="uq_backlinks_domain_url_hash"),
+    )
 
 
 class Page(Base):
@@ -153,6 +179,8 @@ class Page(Base):
     # Content
     word_count = Column(Integer, default=0)
     content_hash = Column(String(64))  # Para detectar mudanças
+    etag = Column(String(255))  # Validadores HTTP para o recrawl condicional
+    last_modified = Column(String(100))
     
     # Technical SEO
     canonical_url = Column(Text)
@@ -177,9 +205,48 @@ class Page(Base):
     images_count = Column(Integer, default=0)
     images_without_alt = Column(Integer, default=0)
     
+    # Análise on-page (app.services.onpage)
+    issues = Column(JSON)
+    score = Column(Integer, index=True)  # 0-100
+    
     # Timestamps
     first_crawled_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     last_crawled_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamentos
     domain = relationship("Domain", back_populates="pages")
+
+
+class SearchPerformance(Base):
+    """
+    Desempenho real das buscas (Google Search Console): uma linha por
+    query e dia
+    """
+    __tablename__ = "search_performance"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    domain_id = Column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), nullable=False)
+    
+    # Query info
+    query = Column(String(500), nullable=False)
+    date = Column(DateTime, nullable=False)
+    
+    # Métricas
+    clicks = Column(Integer, default=0)
+    impressions = Column(Integer, default=0)
+    ctr = Column(Float, default=0.0)
+    position = Column(Float, default=0.0)  # posição média do dia
+    
+    # Source
+    source = Column(String(50), default="gsc")
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relacionamentos
+    domain = relationship("Domain", back_populates="search_performance")
+    
+    __table_args__ = (
+        # Alvo do upsert (ON CONFLICT) e leitura por janela de datas
+        UniqueConstraint("domain_id", "date", "query", name="uq_search_performance_domain_date_query"),
+    )
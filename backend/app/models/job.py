@@ -0,0 +1,66 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Enum, Text, Index
+from datetime import datetime
+from typing import Optional
+import enum
+from app.database import Base
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+ACTIVE_JOB_STATUSES = (JobStatus.QUEUED, JobStatus.RUNNING)
+
+
+class Job(Base):
+    """
+    Tarefa pesada (import, crawl, recálculo) executada pelo worker do Celery
+    fora da requisição (services/jobs.py)
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_client_status", "client_id", "status"),
+        Index("ix_jobs_client_created", "client_id", "created_at"),
+    )
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    domain_id = Column(Integer, ForeignKey("domains.id", ondelete="CASCADE"))
+
+    job_type = Column(String(50), nullable=False)
+    params = Column(JSON)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)  # execuções iniciadas (reentregas após queda do worker)
+
+    # Progresso informado pelo handler (total pode ser desconhecido)
+    progress_current = Column(Integer, default=0, nullable=False)
+    progress_total = Column(Integer)
+    progress_message = Column(String(255))
+
+    result = Column(JSON)
+    error = Column(Text)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    @property
+    def progress_percent(self) -> Optional[float]:
+        if not self.progress_total:
+            return None
+        return round(min(100.0, 100.0 * self.progress_current / self.progress_total), 1)
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Estimativa linear pelo ritmo desde o início (só em execução)"""
+        if self.status != JobStatus.RUNNING or not self.started_at or not self.progress_total or not self.progress_current:
+            return None
+        elapsed = (datetime.utcnow() - self.started_at).total_seconds()
+        remaining = max(0, self.progress_total - self.progress_current)
+        return round(elapsed * remaining / self.progress_current, 1)
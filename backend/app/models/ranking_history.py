@@ -0,0 +1,81 @@
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, String, Float, DateTime, Text, UniqueConstraint, Index
+from app.database import Base
+
+
+class RankingDimension(Base):
+    """
+    Dicionário das dimensões dos rankings (search engine, location, device,
+    source, url): cada texto é gravado uma vez e referenciado por id. Os ids
+    vêm de uma sequência só para todos os tipos (as URLs a fazem crescer
+    rápido), então toda coluna que guarda um id de dimensão é Integer
+    """
+    __tablename__ = "ranking_dimensions"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)
+    value = Column(Text, nullable=False)
+    value_hash = Column(String(32), nullable=False)  # md5(value), URLs não cabem em índice
+
+    __table_args__ = (
+        UniqueConstraint("kind", "value_hash", name="uq_ranking_dimensions_kind_hash"),
+    )
+
+
+class RankingPoint(Base):
+    """
+    Histórico de posições (série temporal, um ponto por keyword/dia/dimensões).
+
+    Postgres: tabela particionada por mês (RANGE em checked_at).
+    SQLite: serve de modelo para as tabelas mensais ranking_points_AAAA_MM;
+    os dados ficam só nas tabelas mensais.
+    Sem FKs, como é usual em tabelas de série temporal.
+    """
+    __tablename__ = "ranking_points"
+
+    # Chave primária = caminho de acesso (domain_id, keyword_id, checked_at)
+    domain_id = Column(Integer, primary_key=True)
+    keyword_id = Column(Integer, primary_key=True)
+    checked_at = Column(DateTime, primary_key=True)
+    engine_id = Column(Integer, primary_key=True)
+    location_id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, primary_key=True)
+
+    source_id = Column(Integer)
+    url_id = Column(Integer)
+    position = Column(SmallInteger, nullable=False)
+    estimated_traffic = Column(Float, default=0.0)
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (checked_at)"}
+
+
+class RankingSummary(Base):
+    """
+    Pontos antigos compactados por semana e por mês
+    """
+    __tablename__ = "ranking_summaries"
+
+    id = Column(Integer, primary_key=True)
+    domain_id = Column(Integer, nullable=False)
+    keyword_id = Column(Integer, nullable=False)
+    granularity = Column(String(10), nullable=False)  # week, month
+    bucket_start = Column(DateTime, nullable=False)
+    engine_id = Column(Integer, nullable=False)
+    location_id = Column(Integer, nullable=False)
+    device_id = Column(Integer, nullable=False)
+
+    samples = Column(Integer, default=0, nullable=False)
+    position_sum = Column(BigInteger, default=0, nullable=False)
+    best_position = Column(SmallInteger)
+    worst_position = Column(SmallInteger)
+    last_position = Column(SmallInteger)
+    last_checked_at = Column(DateTime)
+    traffic_sum = Column(Float, default=0.0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "domain_id", "keyword_id", "granularity", "bucket_start",
+            "engine_id", "location_id", "device_id",
+            name="uq_ranking_summaries_bucket"
+        ),
+        Index("ix_ranking_summaries_domain_bucket", "domain_id", "granularity", "bucket_start"),
+    )
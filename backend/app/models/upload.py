@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, JSON
+from datetime import datetime
+from app.database import Base
+
+
+class UploadSession(Base):
+    """
+    Upload em partes (retomável): as partes são anexadas ao arquivo em
+    UPLOAD_DIR; o tamanho do arquivo em disco é o offset para continuar
+    """
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True)
+    filename = Column(String(255))
+    path = Column(String(500), nullable=False)
+    total_size = Column(BigInteger)  # tamanho anunciado pelo cliente (opcional)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ImportCheckpoint(Base):
+    """
+    Ponto de retomada de um import em andamento, gravado na mesma transação de
+    cada bloco. A chave é o conteúdo do arquivo (SHA-256), não o caminho: o
+    mesmo arquivo importado de novo no domínio, por qualquer upload, continua
+    do offset sem duplicar linhas. Removido quando o import termina; os de
+    imports abandonados vencem com as sessões de upload (UPLOAD_SESSION_TTL_HOURS).
+    """
+    __tablename__ = "import_checkpoints"
+
+    file_hash = Column(String(64), primary_key=True)  # sha256 do arquivo
+    domain_id = Column(Integer, ForeignKey("domains.id", ondelete="CASCADE"), primary_key=True)
+    import_type = Column(String(20), primary_key=True)
+
+    byte_offset = Column(BigInteger, nullable=False)  # fim do último bloco gravado (bytes no CSV, linhas no XLSX)
+    rows_read = Column(BigInteger, nullable=False)
+    report = Column(JSON)  # contadores, erros e avisos do ImportReport
+    ranking_days = Column(JSON)  # dias com rankings gravados (fechamento do import)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
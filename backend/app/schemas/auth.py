@@ -1,8 +1,10 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
-from typing import List, Optional
+from typing import List, Optional, Literal
 from datetime import datetime
 from app.models.auth import APIKeyStatus
 
+RateLimitAlgorithm = Literal["sliding_window_counter", "sliding_window_log", "token_bucket", "local_lease"]
+
 
 class ClientCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
@@ -11,6 +13,7 @@ class ClientCreate(BaseModel):
     max_api_keys: int = Field(default=5, ge=1, le=50)
     rate_limit_per_minute: int = Field(default=60, ge=1)
     rate_limit_per_day: int = Field(default=10000, ge=1)
+    rate_limit_algorithm: Optional[RateLimitAlgorithm] = None
 
 
 class ClientUpdate(BaseModel):
@@ -20,6 +23,7 @@ class ClientUpdate(BaseModel):
     max_api_keys: Optional[int] = Field(None, ge=1, le=50)
     rate_limit_per_minute: Optional[int] = Field(None, ge=1)
     rate_limit_per_day: Optional[int] = Field(None, ge=1)
+    rate_limit_algorithm: Optional[RateLimitAlgorithm] = None
 
 
 class ClientResponse(BaseModel):
@@ -31,6 +35,7 @@ class ClientResponse(BaseModel):
     max_api_keys: int
     rate_limit_per_minute: int
     rate_limit_per_day: int
+    rate_limit_algorithm: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -107,3 +112,12 @@ class ClientInfoResponse(BaseModel):
     client: ClientResponse
     api_key_info: dict
     usage_summary: dict
+
+
+class UsageSummaryItem(BaseModel):
+    bucket_start: datetime
+    endpoint: Optional[str] = None
+    api_key_id: Optional[int] = None
+    requests: int
+    errors: int
+    avg_response_time_ms: float
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, HttpUrl, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from app.models.job import JobStatus
 
 
 # ============= DOMAIN =============
@@ -49,6 +50,24 @@ class KeywordBulkCreate(BaseModel):
     keywords: List[KeywordCreate]
 
 
+class KeywordUpsertBatch(BaseModel):
+    batch: int
+    rows: int
+    inserted: int
+    updated: int
+    unchanged: int
+
+
+class KeywordBulkResult(BaseModel):
+    domain_id: int
+    total: int
+    inserted: int
+    updated: int
+    unchanged: int
+    batches: List[KeywordUpsertBatch]
+    duration_seconds: float
+
+
 class KeywordResponse(BaseModel):
     id: int
     keyword: str
@@ -101,6 +120,23 @@ class RankingResponse(BaseModel):
         from_attributes = True
 
 
+class RankingHistoryPoint(BaseModel):
+    keyword_id: int
+    granularity: str  # raw, week, month
+    checked_at: datetime  # instante do ponto ou início do bucket
+    search_engine: Optional[str] = None
+    location: Optional[str] = None
+    device: Optional[str] = None
+    source: Optional[str] = None
+    url: Optional[str] = None
+    position: float  # média no bucket
+    best_position: Optional[int] = None
+    worst_position: Optional[int] = None
+    last_position: Optional[int] = None
+    samples: int = 1
+    estimated_traffic: float = 0.0
+
+
 class RankingChange(BaseModel):
     keyword: str
     current_position: int
@@ -109,6 +145,12 @@ class RankingChange(BaseModel):
     change_percent: Optional[float] = None
     alert_type: str  # gain, loss, stable
     url: Optional[str] = None
+    keyword_id: Optional[int] = None
+    search_engine: Optional[str] = None
+    location: Optional[str] = None
+    device: Optional[str] = None
+    checked_at: Optional[datetime] = None
+    previous_checked_at: Optional[datetime] = None
 
 
 # ============= BACKLINK =============
@@ -179,8 +221,23 @@ class ImportResult(BaseModel):
     total_imported: int
     source: str
     import_type: str  # keywords, rankings, backlinks
+    filename: Optional[str] = None  # import em lote: arquivo deste resultado
     errors: Optional[List[str]] = None
     warnings: Optional[List[str]] = None
+    total_rows: int = 0
+    total_failed: int = 0
+    duration_seconds: float = 0.0
+    rows_per_second: float = 0.0
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    filename: Optional[str] = None
+    offset: int  # bytes já recebidos: a próxima parte começa aqui
+    total_size: Optional[int] = None
+    complete: Optional[bool] = None  # None se o tamanho total não foi informado
+    created_at: datetime
+    updated_at: datetime
 
 
 # ============= ENRICHED DATA =============
@@ -199,6 +256,33 @@ class EnrichedKeyword(BaseModel):
     # Combined insights
     volume_vs_impressions_ratio: Optional[float] = None
     data_freshness: str  # semrush, gsc, enriched
+    computed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class SearchPerformanceCreate(BaseModel):
+    query: str = Field(..., min_length=1, max_length=500)
+    date: datetime
+    clicks: int = Field(default=0, ge=0)
+    impressions: int = Field(default=0, ge=0)
+    ctr: Optional[float] = Field(default=None, ge=0.0, le=1.0)  # calculado se omitido
+    position: float = Field(default=0.0, ge=0.0)
+
+
+class SearchPerformanceBulkCreate(BaseModel):
+    rows: List[SearchPerformanceCreate]
+
+
+class EnrichmentResult(BaseModel):
+    domain_id: int
+    total: int
+    enriched: int  # nas duas fontes
+    semrush_only: int
+    gsc_only: int
+    days: int
+    duration_seconds: float
 
 
 # ============= ANALYTICS =============
@@ -212,3 +296,32 @@ class DomainAnalytics(BaseModel):
     top_keywords: List[KeywordWithRanking]
     recent_ranking_changes: List[RankingChange]
     backlinks_growth: Dict[str, int]
+    ranked_keywords: int = 0
+    # Staleness do snapshot
+    updated_at: Optional[datetime] = None  # última atualização incremental
+    computed_at: Optional[datetime] = None  # último recálculo completo
+    is_stale: bool = False
+
+
+# ============= JOBS =============
+
+class JobResponse(BaseModel):
+    id: str
+    job_type: str
+    domain_id: Optional[int] = None
+    status: JobStatus
+    cancel_requested: bool
+    attempts: int = 0
+    progress_current: int
+    progress_total: Optional[int] = None
+    progress_percent: Optional[float] = None
+    progress_message: Optional[str] = None
+    eta_seconds: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
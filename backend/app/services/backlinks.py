@@ -0,0 +1,191 @@
+"""
+Ingestão de backlinks com deduplicação.
+
+Cada backlink é identificado pelo md5 das URLs de origem e destino
+normalizadas (url_hash), único por domínio. Reimports viram um
+INSERT ... ON CONFLICT (domain_id, url_hash) DO UPDATE em lote: links novos
+entram e os existentes só têm last_seen, is_active e métricas atualizados.
+"""
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+import hashlib
+from sqlalchemy import select, update, delete, case, func, bindparam
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.domain import Backlink
+from app.services import domain_analytics
+from app.services.urls import normalize_url
+
+
+def backlink_hash(source_url: str, target_url: str) -> str:
+    """md5 de origem + destino normalizados (o domain_id faz parte da chave única)"""
+    key = f"{normalize_url(source_url)}\n{normalize_url(target_url)}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _month(value: Optional[datetime], default: datetime) -> str:
+    return (value or default).strftime("%Y-%m")
+
+
+def _earliest(a: Optional[datetime], b: Optional[datetime]) -> Optional[datetime]:
+    return min(a, b) if a is not None and b is not None else a if b is None else b
+
+
+def _latest(a: Optional[datetime], b: Optional[datetime]) -> Optional[datetime]:
+    return max(a, b) if a is not None and b is not None else a if b is None else b
+
+
+def _upsert_statement(dialect_name: str):
+    table = Backlink.__table__
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(table)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=["domain_id", "url_hash"],
+        set_={
+            "authority_score": excluded.authority_score,
+            "anchor_text": func.coalesce(excluded.anchor_text, table.c.anchor_text),
+            "link_type": excluded.link_type,
+            "is_active": excluded.is_active,
+            # first_seen só recua e last_seen só avança
+            "first_seen": case(
+                (table.c.first_seen.is_(None) | (excluded.first_seen < table.c.first_seen), excluded.first_seen),
+                else_=table.c.first_seen
+            ),
+            "last_seen": case(
+                (table.c.last_seen.is_(None) | (excluded.last_seen > table.c.last_seen), excluded.last_seen),
+                else_=table.c.last_seen
+            ),
+            "updated_at": excluded.updated_at,
+        }
+    )
+
+
+def upsert_backlink_batch(
+    conn: Connection,
+    domain_id: int,
+    rows: List[Dict[str, Any]],
+    source: str = "semrush"
+) -> Dict[str, int]:
+    """
+    Upsert de um lote de backlinks de um domínio (também atualiza os
+    contadores do snapshot de analytics, na mesma transação).
+    Links repetidos no lote são unidos: menor first_seen, maior last_seen e
+    os demais campos da última ocorrência.
+    Returns: contagens {rows, inserted, updated}
+    """
+    now = datetime.utcnow()
+    latest: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        url_hash = backlink_hash(row["source_url"], row["target_url"])
+        record = {
+            "domain_id": domain_id,
+            "url_hash": url_hash,
+            "source_url": row["source_url"],
+            "target_url": row["target_url"],
+            "referring_domain": row.get("referring_domain"),
+            "authority_score": row.get("authority_score") or 0,
+            "anchor_text": row.get("anchor_text"),
+            "link_type": row.get("link_type") or "dofollow",
+            "is_active": bool(row.get("is_active", True)),
+            "first_seen": row.get("first_seen"),
+            "last_seen": row.get("last_seen"),
+            "source": source,
+            "created_at": now,
+            "updated_at": now,
+        }
+        previous = latest.get(url_hash)
+        if previous:
+            record["first_seen"] = _earliest(previous["first_seen"], record["first_seen"])
+            record["last_seen"] = _latest(previous["last_seen"], record["last_seen"])
+        latest[url_hash] = record
+
+    if not latest:
+        return {"rows": len(rows), "inserted": 0, "updated": 0}
+
+    existing = {
+        row.url_hash: row for row in conn.execute(
+            select(Backlink.url_hash, Backlink.is_active, Backlink.first_seen, Backlink.created_at).where(
+                Backlink.domain_id == domain_id,
+                Backlink.url_hash.in_(list(latest))
+            )
+        )
+    }
+
+    # Variação de backlinks ativos por mês de first_seen (snapshot de analytics)
+    growth: Dict[str, int] = {}
+    for url_hash, record in latest.items():
+        old = existing.get(url_hash)
+        first_seen = record["first_seen"]
+        created_at = now
+        if old is not None:
+            if old.is_active:
+                month = _month(old.first_seen, old.created_at)
+                growth[month] = growth.get(month, 0) - 1
+            first_seen = _earliest(old.first_seen, first_seen)
+            created_at = old.created_at
+        if record["is_active"]:
+            month = _month(first_seen, created_at)
+            growth[month] = growth.get(month, 0) + 1
+
+    conn.execute(_upsert_statement(conn.dialect.name), list(latest.values()))
+    domain_analytics.add_backlinks(conn, domain_id, growth)
+
+    updated = sum(1 for url_hash in latest if url_hash in existing)
+    return {"rows": len(rows), "inserted": len(latest) - updated, "updated": updated}
+
+
+def backfill_backlink_hashes(engine: Engine, chunk_size: int = 5000) -> Dict[str, Any]:
+    """
+    Preenche url_hash dos backlinks gravados antes da deduplicação.
+    Duplicatas (mesmo hash no domínio) são removidas, ficando a linha mais
+    antiga; os snapshots de analytics desses domínios ficam marcados como
+    desatualizados. Um bloco por transação.
+    """
+    hashed = removed = 0
+    affected: Set[int] = set()
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(Backlink.id, Backlink.domain_id, Backlink.source_url, Backlink.target_url)
+                .where(Backlink.url_hash.is_(None))
+                .order_by(Backlink.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+
+            keyed: Dict[tuple, int] = {}
+            duplicates: List[int] = []
+            for id_, domain_id, source_url, target_url in rows:
+                key = (domain_id, backlink_hash(source_url, target_url))
+                if key in keyed:
+                    duplicates.append(id_)
+                else:
+                    keyed[key] = id_
+
+            # Hashes que já existem (imports novos ou blocos anteriores)
+            for domain_id in {key[0] for key in keyed}:
+                taken = conn.scalars(select(Backlink.url_hash).where(
+                    Backlink.domain_id == domain_id,
+                    Backlink.url_hash.in_([url_hash for d, url_hash in keyed if d == domain_id])
+                )).all()
+                for url_hash in taken:
+                    duplicates.append(keyed.pop((domain_id, url_hash)))
+
+            if duplicates:
+                removed_ids = set(duplicates)
+                affected.update(domain_id for id_, domain_id, _, _ in rows if id_ in removed_ids)
+                conn.execute(delete(Backlink).where(Backlink.id.in_(duplicates)))
+            if keyed:
+                table = Backlink.__table__
+                conn.execute(
+                    update(table).where(table.c.id == bindparam("b_id")).values(url_hash=bindparam("b_hash")),
+                    [{"b_id": id_, "b_hash": url_hash} for (_, url_hash), id_ in keyed.items()]
+                )
+            hashed += len(keyed)
+            removed += len(duplicates)
+
+    for domain_id in affected:
+        domain_analytics.mark_stale(engine, domain_id)
+    return {"hashed": hashed, "duplicates_removed": removed, "domains_affected": len(affected)}
@@ -0,0 +1,291 @@
+"""
+Crawler assíncrono de um site (httpx.AsyncClient).
+
+- CRAWLER_MAX_CONCURRENT workers consomem o frontier (limite global de
+  requisições simultâneas)
+- cortesia por host: requisições ao mesmo host saem com pelo menos
+  CRAWLER_DELAY_SECONDS de intervalo (ou o Crawl-delay do robots.txt, se maior)
+- o frontier deduplica pela URL normalizada e respeita o robots.txt
+- o HTML é processado em um pool (threads ou processos), fora do event loop
+- as páginas são entregues em lotes para on_pages (gravação em lote)
+- recrawl incremental: com as páginas já conhecidas (known), envia
+  If-None-Match/If-Modified-Since; um 304, ou um body com o mesmo
+  content_hash, não é processado e a URL vai em lote para on_unchanged
+"""
+from concurrent.futures import Executor
+from typing import Dict, Any, List, Optional, Set, Callable, Awaitable
+from urllib.parse import urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+import asyncio
+import hashlib
+import time
+import httpx
+from app.config import settings
+from app.core.pools import SharedPool
+from app.services.urls import normalize_url
+from app.services.onpage.extract import parse_page, site_host
+
+
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+MAX_REPORTED_ERRORS = 100
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+# Pool compartilhado de parsing (CRAWLER_PARSE_PROCESSES escolhe processos)
+parse_pool = SharedPool(
+    "crawler",
+    workers=lambda: settings.CRAWLER_PARSE_WORKERS,
+    processes=lambda: settings.CRAWLER_PARSE_PROCESSES
+)
+
+
+class Crawler:
+    """
+    Crawl de um site a partir de start_url, limitado a max_pages URLs
+    (mesmo host, com ou sem www.)
+    """
+
+    def __init__(
+        self,
+        start_url: str,
+        max_pages: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        delay: Optional[float] = None,
+        user_agent: Optional[str] = None,
+        timeout: Optional[float] = None,
+        on_pages: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+        on_unchanged: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+        known: Optional[Dict[str, Dict[str, Any]]] = None,
+        on_progress: Optional[Callable[["Crawler"], None]] = None,
+        batch_size: int = 100,
+        respect_robots: bool = True,
+        executor: Optional[Executor] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        if "://" not in start_url:
+            start_url = f"https://{start_url}"
+        self.start_url = normalize_url(start_url)
+        self.host = site_host(urlsplit(self.start_url).netloc)
+        self.max_pages = max_pages or settings.CRAWLER_MAX_PAGES
+        self.concurrency = concurrency or settings.CRAWLER_MAX_CONCURRENT
+        self.delay = settings.CRAWLER_DELAY_SECONDS if delay is None else delay
+        self.user_agent = user_agent or settings.CRAWLER_USER_AGENT
+        self.timeout = timeout or settings.CRAWLER_TIMEOUT_SECONDS
+        self.on_pages = on_pages
+        self.on_unchanged = on_unchanged
+        # url -> etag, last_modified, content_hash e page_size_kb do último crawl
+        self.known = known or {}
+        # Chamado (em thread) no máximo a cada PROGRESS_INTERVAL_SECONDS; pode chamar stop()
+        self.on_progress = on_progress
+        self.stopped = False
+        self.processed = 0
+        self._progress_at = 0.0
+        self.batch_size = batch_size
+        self.respect_robots = respect_robots
+        self.executor = executor
+        self.transport = transport
+
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self.seen: Set[str] = set()
+        self.blocked: Set[str] = set()
+        self.robots: Optional[RobotFileParser] = None
+        self.host_locks: Dict[str, asyncio.Lock] = {}
+        self.next_fetch: Dict[str, float] = {}
+        self.buffer: List[Dict[str, Any]] = []
+        self.unchanged: List[str] = []
+        self.errors: List[str] = []
+        self.stats = {
+            "queued": 0, "fetched": 0, "pages": 0, "skipped": 0, "failed": 0,
+            "not_modified": 0, "unchanged": 0, "bytes_saved": 0,
+        }
+
+    # ============= FRONTIER =============
+
+    def in_scope(self, url: str) -> bool:
+        parts = urlsplit(url)
+        return parts.scheme in ("http", "https") and site_host(parts.netloc) == self.host
+
+    def enqueue(self, url: str) -> bool:
+        """Adiciona ao frontier se for nova, do site e permitida pelo robots.txt"""
+        url = normalize_url(url)
+        if self.stopped or url in self.seen or url in self.blocked or len(self.seen) >= self.max_pages or not self.in_scope(url):
+            return False
+        if self.robots is not None and not self.robots.can_fetch(self.user_agent, url):
+            self.blocked.add(url)
+            self.stats["skipped"] += 1
+            return False
+        self.seen.add(url)
+        self.queue.put_nowait(url)
+        self.stats["queued"] += 1
+        return True
+
+    async def _load_robots(self, client: httpx.AsyncClient) -> None:
+        parts = urlsplit(self.start_url)
+        try:
+            response = await client.get(urlunsplit((parts.scheme, parts.netloc, "/robots.txt", "", "")))
+        except httpx.HTTPError:
+            return
+        if response.status_code != 200:
+            return
+        self.robots = RobotFileParser()
+        self.robots.parse(response.text.splitlines())
+        crawl_delay = self.robots.crawl_delay(self.user_agent)
+        if crawl_delay:
+            self.delay = max(self.delay, float(crawl_delay))
+
+    # ============= FETCH =============
+
+    async def _wait_turn(self, host: str) -> None:
+        """Espaça as requisições ao mesmo host em self.delay segundos"""
+        loop = asyncio.get_running_loop()
+        async with self.host_locks.setdefault(host, asyncio.Lock()):
+            wait = self.next_fetch.get(host, 0.0) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.next_fetch[host] = loop.time() + self.delay
+
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        previous = self.known.get(url) or {}
+        headers = {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+        return headers
+
+    async def _crawl(self, client: httpx.AsyncClient, url: str) -> None:
+        await self._wait_turn(urlsplit(url).netloc)
+        started_at = time.perf_counter()
+        async with client.stream("GET", url, headers=self._conditional_headers(url)) as response:
+            if response.status_code == 304:
+                self.stats["not_modified"] += 1
+                self.stats["bytes_saved"] += ((self.known.get(url) or {}).get("page_size_kb") or 0) * 1024
+                await self._mark_unchanged(url)
+                return
+            content_type = response.headers.get("content-type", "").lower()
+            final_url = normalize_url(str(response.url))
+            if "html" not in content_type or not self.in_scope(final_url):
+                self.stats["skipped"] += 1
+                return
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) > MAX_PAGE_BYTES:
+                    break
+        self.stats["fetched"] += 1
+        if final_url != url:
+            # Redirect: a página fica registrada na URL final (uma vez só)
+            if final_url in self.seen:
+                return
+            self.seen.add(final_url)
+
+        content_hash = hashlib.sha256(body).hexdigest()
+        previous = self.known.get(final_url)
+        if previous and previous.get("content_hash") == content_hash:
+            # Mesmo conteúdo: sem parsing nem regravação da página
+            self.stats["unchanged"] += 1
+            await self._mark_unchanged(final_url)
+            return
+
+        page, links = await asyncio.get_running_loop().run_in_executor(
+            self.executor or parse_pool,
+            parse_page,
+            final_url,
+            response.status_code,
+            bytes(body),
+            response.charset_encoding,
+            int((time.perf_counter() - started_at) * 1000),
+            response.headers.get("x-robots-tag"),
+            content_hash
+        )
+        page["etag"] = response.headers.get("etag")
+        page["last_modified"] = response.headers.get("last-modified")
+        for link in links:
+            self.enqueue(link)
+
+        self.buffer.append(page)
+        self.stats["pages"] += 1
+        if len(self.buffer) >= self.batch_size:
+            await self._flush()
+
+    async def _mark_unchanged(self, url: str) -> None:
+        self.unchanged.append(url)
+        if len(self.unchanged) >= self.batch_size:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        pages, self.buffer = self.buffer, []
+        if pages and self.on_pages:
+            await self.on_pages(pages)
+        unchanged, self.unchanged = self.unchanged, []
+        if unchanged and self.on_unchanged:
+            await self.on_unchanged(unchanged)
+
+    async def _report_progress(self) -> None:
+        now = time.monotonic()
+        if not self.on_progress or now - self._progress_at < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._progress_at = now
+        try:
+            await asyncio.to_thread(self.on_progress, self)
+        except Exception as e:
+            print(f"Crawler progress error: {e}")
+
+    def stop(self) -> None:
+        """Interrompe o crawl: as URLs restantes do frontier são descartadas"""
+        self.stopped = True
+
+    async def _worker(self, client: httpx.AsyncClient) -> None:
+        while True:
+            url = await self.queue.get()
+            crawled = not self.stopped
+            try:
+                if crawled:
+                    await self._crawl(client, url)
+            except Exception as e:
+                # Erro de rede (ou de gravação do lote) não derruba o worker
+                self.stats["failed"] += 1
+                if not isinstance(e, httpx.HTTPError):
+                    print(f"Crawler error ({url}): {e}")
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append(f"{url}: {e.__class__.__name__} {e}")
+            finally:
+                self.processed += crawled
+                self.queue.task_done()
+            if crawled:
+                await self._report_progress()
+
+    # ============= EXECUÇÃO =============
+
+    async def run(self) -> Dict[str, Any]:
+        """Executa o crawl até esvaziar o frontier; Returns: estatísticas"""
+        started_at = time.perf_counter()
+        async with httpx.AsyncClient(
+            headers={"User-Agent": self.user_agent},
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.concurrency),
+            transport=self.transport
+        ) as client:
+            if self.respect_robots:
+                await self._load_robots(client)
+            self.enqueue(self.start_url)
+            # Recrawl: as páginas conhecidas entram no frontier mesmo que
+            # as páginas que apontam para elas não mudem (304 não traz links)
+            for url in self.known:
+                self.enqueue(url)
+
+            workers = [asyncio.create_task(self._worker(client)) for _ in range(self.concurrency)]
+            try:
+                await self.queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        await self._flush()
+
+        return {
+            **self.stats,
+            "start_url": self.start_url,
+            "duration_seconds": round(time.perf_counter() - started_at, 3),
+            "errors": self.errors or None,
+        }
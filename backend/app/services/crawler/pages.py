@@ -0,0 +1,116 @@
+"""
+Gravação das páginas do crawler e crawl completo de um domínio
+"""
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+from sqlalchemy import select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database import engine
+from app.models.domain import Domain, Page
+from app.services.crawler.engine import Crawler
+
+
+PAGE_FIELDS = (
+    "title", "meta_description", "h1", "word_count", "content_hash", "canonical_url",
+    "robots_meta", "has_schema_markup", "schema_types", "load_time_ms", "page_size_kb",
+    "mobile_friendly", "status_code", "is_indexable", "internal_links_count",
+    "external_links_count", "images_count", "images_without_alt", "etag", "last_modified",
+    "issues", "score",
+)
+
+
+def upsert_pages(conn: Connection, domain_id: int, pages: List[Dict[str, Any]]) -> int:
+    """
+    Upsert em lote por url (INSERT ... ON CONFLICT (url) DO UPDATE);
+    first_crawled_at só é gravado na primeira vez. A url é única na tabela:
+    página já gravada por outro domínio não é alterada nem muda de domínio.
+    """
+    if not pages:
+        return 0
+    now = datetime.utcnow()
+    rows = {
+        page["url"]: {
+            "domain_id": domain_id,
+            "url": page["url"],
+            **{field: page.get(field) for field in PAGE_FIELDS},
+            "first_crawled_at": now,
+            "last_crawled_at": now,
+        }
+        for page in pages
+    }
+    insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(Page.__table__)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["url"],
+            set_={column: stmt.excluded[column] for column in PAGE_FIELDS + ("last_crawled_at",)},
+            where=Page.__table__.c.domain_id == stmt.excluded.domain_id
+        ),
+        list(rows.values())
+    )
+    return len(rows)
+
+
+def touch_pages(conn: Connection, domain_id: int, urls: List[str]) -> int:
+    """Páginas sem mudança: só last_crawled_at, em um UPDATE por lote"""
+    if not urls:
+        return 0
+    return conn.execute(
+        update(Page)
+        .where(Page.domain_id == domain_id, Page.url.in_(urls))
+        .values(last_crawled_at=datetime.utcnow())
+    ).rowcount
+
+
+def load_known_pages(conn: Connection, domain_id: int) -> Dict[str, Dict[str, Any]]:
+    """Validadores e hash do último crawl, por url (para o recrawl incremental)"""
+    result = conn.execute(
+        select(Page.url, Page.etag, Page.last_modified, Page.content_hash, Page.page_size_kb)
+        .where(Page.domain_id == domain_id)
+    )
+    return {row.url: row._asdict() for row in result}
+
+
+async def crawl_domain(domain_id: int, max_pages: Optional[int] = None, incremental: bool = True,
+                       **options) -> Dict[str, Any]:
+    """
+    Crawl do site do domínio: páginas gravadas em lotes durante o crawl e
+    Domain.last_crawled_at atualizado no final.
+    incremental: requisições condicionais e comparação de content_hash com
+    as páginas já gravadas (False = baixa e regrava tudo)
+    options: repassadas ao Crawler (concurrency, delay, transport...)
+    """
+    def load() -> Tuple[Optional[str], Dict[str, Dict[str, Any]]]:
+        with engine.connect() as conn:
+            url = conn.scalar(select(Domain.url).where(Domain.id == domain_id))
+            return url, load_known_pages(conn, domain_id) if url is not None and incremental else {}
+
+    def save(pages: List[Dict[str, Any]]) -> int:
+        with engine.begin() as conn:
+            return upsert_pages(conn, domain_id, pages)
+
+    def touch(urls: List[str]) -> int:
+        with engine.begin() as conn:
+            return touch_pages(conn, domain_id, urls)
+
+    def finish() -> None:
+        with engine.begin() as conn:
+            conn.execute(update(Domain).where(Domain.id == domain_id).values(last_crawled_at=datetime.utcnow()))
+
+    url, known = await asyncio.to_thread(load)
+    if url is None:
+        raise ValueError(f"Domínio {domain_id} não encontrado")
+
+    async def on_pages(pages: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(save, pages)
+
+    async def on_unchanged(urls: List[str]) -> None:
+        await asyncio.to_thread(touch, urls)
+
+    stats = await Crawler(
+        url, max_pages=max_pages, on_pages=on_pages, on_unchanged=on_unchanged, known=known, **options
+    ).run()
+    await asyncio.to_thread(finish)
+    return {"domain_id": domain_id, **stats}
@@ -0,0 +1,259 @@
+"""
+Snapshot de analytics por domínio (domain_analytics_snapshots).
+
+Imports e checagens de ranking atualizam o snapshot na mesma transação em que
+gravam os dados: os contadores de keywords e backlinks somam o que entrou e a
+parte de rankings (posição média, top keywords, mudanças e tendência de
+tráfego) é recalculada, com a tendência refeita só nos dias afetados.
+O endpoint só lê a linha; recompute() refaz tudo a partir das tabelas.
+"""
+from datetime import datetime, date, time, timedelta
+from typing import Dict, Any, List, Iterable, Optional
+import pandas as pd
+from sqlalchemy import select, update, func
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
+from app.config import settings
+from app.models.analytics import DomainAnalyticsSnapshot
+from app.models.domain import Domain, Keyword, Backlink
+from app.services.ranking_store import ranking_store
+from app.services.ranking_changes import load_latest, compute_changes, change_records
+
+
+SNAPSHOT = DomainAnalyticsSnapshot.__table__
+
+
+def _iso(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def _month_expr(dialect_name: str, column):
+    """'AAAA-MM' da coluna, no banco"""
+    if dialect_name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def _ensure(conn: Connection, domain_id: int) -> None:
+    """Cria a linha vazia do domínio se ainda não existir"""
+    insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+    conn.execute(
+        insert(SNAPSHOT).values(
+            domain_id=domain_id,
+            organic_traffic_trend=[],
+            top_keywords=[],
+            recent_ranking_changes=[],
+            backlinks_growth={},
+            updated_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=["domain_id"])
+    )
+
+
+def _lock(conn: Connection, domain_id: int) -> Dict[str, Any]:
+    """Linha do domínio travada até o fim da transação (merge dos campos JSON)"""
+    _ensure(conn, domain_id)
+    return conn.execute(
+        select(SNAPSHOT).where(SNAPSHOT.c.domain_id == domain_id).with_for_update()
+    ).mappings().one()
+
+
+def load_snapshot(conn: Connection, domain_id: int) -> Optional[Dict[str, Any]]:
+    row = conn.execute(select(SNAPSHOT).where(SNAPSHOT.c.domain_id == domain_id)).mappings().first()
+    return dict(row) if row else None
+
+
+# ============= ATUALIZAÇÃO INCREMENTAL =============
+
+def add_keywords(conn: Connection, domain_id: int, inserted: int) -> None:
+    """Soma keywords novas (chamar na transação do upsert)"""
+    if inserted <= 0:
+        return
+    _ensure(conn, domain_id)
+    conn.execute(
+        update(SNAPSHOT)
+        .where(SNAPSHOT.c.domain_id == domain_id)
+        .values(total_keywords=SNAPSHOT.c.total_keywords + inserted, updated_at=datetime.utcnow())
+    )
+
+
+def add_backlinks(conn: Connection, domain_id: int, growth: Dict[str, int]) -> None:
+    """
+    Aplica a variação de backlinks ativos por mês de first_seen
+    ({"AAAA-MM": +novos/-desativados}) no total e em backlinks_growth
+    (chamar na transação do upsert)
+    """
+    growth = {month: count for month, count in growth.items() if count}
+    if not growth:
+        return
+
+    snapshot = _lock(conn, domain_id)
+    merged = dict(snapshot["backlinks_growth"] or {})
+    for month, count in growth.items():
+        merged[month] = merged.get(month, 0) + count
+    conn.execute(
+        update(SNAPSHOT)
+        .where(SNAPSHOT.c.domain_id == domain_id)
+        .values(
+            total_backlinks=SNAPSHOT.c.total_backlinks + sum(growth.values()),
+            backlinks_growth={month: merged[month] for month in sorted(merged) if merged[month]},
+            updated_at=datetime.utcnow()
+        )
+    )
+
+
+def _top_keywords(conn: Connection, ranked: pd.DataFrame, limit: int) -> List[Dict[str, Any]]:
+    """Melhores posições atuais (uma linha por keyword) com as métricas da keyword"""
+    best = (
+        ranked[ranked["keyword_id"].notna()]
+        .sort_values(["position", "keyword"], kind="stable")
+        .drop_duplicates("keyword_id")
+        .head(limit)
+    )
+    if best.empty:
+        return []
+    keywords = {
+        row["id"]: row for row in conn.execute(
+            select(Keyword.__table__).where(Keyword.id.in_([int(v) for v in best["keyword_id"]]))
+        ).mappings()
+    }
+
+    result = []
+    for row in best.itertuples(index=False):
+        keyword = keywords.get(int(row.keyword_id))
+        if keyword is None:
+            continue
+        current = int(row.position)
+        previous = None if pd.isna(row.prev_position) else int(row.prev_position)
+        result.append({
+            "id": keyword["id"],
+            "keyword": keyword["keyword"],
+            "search_volume": keyword["search_volume"] or 0,
+            "keyword_difficulty": keyword["keyword_difficulty"] or 0.0,
+            "cpc": keyword["cpc"] or 0.0,
+            "competition": keyword["competition"],
+            "trend_data": keyword["trend_data"],
+            "source": keyword["source"] or "manual",
+            "created_at": _iso(keyword["created_at"]),
+            "last_updated": _iso(keyword["last_updated"] or keyword["created_at"]),
+            "current_position": current,
+            "previous_position": previous,
+            "position_change": previous - current if previous else None,
+            "ranking_url": row.url,
+        })
+    return result
+
+
+def _traffic_trend(conn: Connection, domain_id: int, current: List[Dict[str, Any]],
+                   days: Optional[Iterable[date]], now: datetime) -> List[Dict[str, Any]]:
+    """
+    Tendência diária dos últimos ANALYTICS_TRAFFIC_TREND_DAYS dias.
+    days=None refaz a janela inteira; senão só o intervalo dos dias afetados.
+    """
+    window_start = datetime.combine(
+        now.date() - timedelta(days=settings.ANALYTICS_TRAFFIC_TREND_DAYS - 1), time.min
+    )
+    if days is None:
+        trend: Dict[str, Dict[str, Any]] = {}
+        start, end = window_start, datetime.combine(now.date() + timedelta(days=1), time.min)
+    else:
+        trend = {item["date"]: item for item in current}
+        days = sorted(days)
+        start = max(window_start, datetime.combine(days[0], time.min)) if days else None
+        end = datetime.combine(days[-1] + timedelta(days=1), time.min) if days else None
+
+    if start is not None and start < end:
+        first, last = start.date().isoformat(), end.date().isoformat()
+        trend = {day: item for day, item in trend.items() if not first <= day < last}
+        for day, totals in ranking_store.daily_traffic(conn, domain_id, start, end).items():
+            trend[day] = {"date": day, "traffic": round(totals["traffic"], 2), "keywords": totals["keywords"]}
+
+    cutoff = window_start.date().isoformat()
+    return [trend[day] for day in sorted(trend) if day >= cutoff]
+
+
+def refresh_rankings(conn: Connection, domain_id: int, days: Optional[Iterable[date]] = None) -> None:
+    """
+    Recalcula a parte de rankings do snapshot (e o total de keywords, que os
+    imports de rankings também criam).
+    days: dias com pontos novos (None = janela inteira, vazio = não mexe na tendência)
+    """
+    now = datetime.utcnow()
+    limit = settings.ANALYTICS_TOP_ITEMS
+    snapshot = _lock(conn, domain_id)
+
+    latest = load_latest(conn, domain_id, only_pairs=False)
+    ranked = latest[latest["position"] > 0] if not latest.empty else latest
+
+    changes: List[Dict[str, Any]] = []
+    pairs = latest[latest["prev_position"].notna()] if not latest.empty else latest
+    if not pairs.empty:
+        moved = compute_changes(pairs)
+        moved = moved[moved["alert_type"] != "stable"]
+        changes = [
+            {key: _iso(value) for key, value in record.items()}
+            for record in change_records(moved, limit)
+        ]
+
+    conn.execute(
+        update(SNAPSHOT)
+        .where(SNAPSHOT.c.domain_id == domain_id)
+        .values(
+            total_keywords=conn.scalar(
+                select(func.count()).select_from(Keyword).where(Keyword.domain_id == domain_id)
+            ),
+            ranked_keywords=len(ranked),
+            avg_position=round(float(ranked["position"].mean()), 2) if len(ranked) else 0.0,
+            top_keywords=_top_keywords(conn, ranked, limit) if len(ranked) else [],
+            recent_ranking_changes=changes,
+            organic_traffic_trend=_traffic_trend(
+                conn, domain_id, snapshot["organic_traffic_trend"] or [], days, now
+            ),
+            updated_at=now
+        )
+    )
+
+
+# ============= RECÁLCULO COMPLETO =============
+
+def recompute(conn: Connection, domain_id: int) -> None:
+    """Refaz o snapshot do domínio a partir das tabelas (reparo)"""
+    active = (Backlink.domain_id == domain_id, Backlink.is_active.is_(True))
+    month = _month_expr(conn.dialect.name, func.coalesce(Backlink.first_seen, Backlink.created_at))
+    growth = dict(conn.execute(
+        select(month, func.count()).where(*active).group_by(month).order_by(month)
+    ).all())
+
+    _ensure(conn, domain_id)
+    conn.execute(
+        update(SNAPSHOT)
+        .where(SNAPSHOT.c.domain_id == domain_id)
+        .values(total_backlinks=sum(growth.values()), backlinks_growth=growth)
+    )
+    refresh_rankings(conn, domain_id)
+    conn.execute(
+        update(SNAPSHOT)
+        .where(SNAPSHOT.c.domain_id == domain_id)
+        .values(is_stale=False, computed_at=datetime.utcnow())
+    )
+
+
+def recompute_all(engine: Engine) -> int:
+    """Recalcula os snapshots de todos os domínios, um por transação"""
+    with engine.connect() as conn:
+        domain_ids = conn.scalars(select(Domain.id).order_by(Domain.id)).all()
+    for domain_id in domain_ids:
+        with engine.begin() as conn:
+            recompute(conn, domain_id)
+    return len(domain_ids)
+
+
+def mark_stale(engine: Engine, domain_id: int) -> None:
+    """Marca o snapshot como desatualizado (uma atualização incremental falhou)"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                update(SNAPSHOT).where(SNAPSHOT.c.domain_id == domain_id).values(is_stale=True)
+            )
+    except SQLAlchemyError as e:
+        print(f"Analytics snapshot error (domain {domain_id}): {e}")
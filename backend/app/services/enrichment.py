@@ -0,0 +1,220 @@
+"""
+Enriquecimento de keywords: métricas do SemRush + desempenho real do GSC.
+
+As duas fontes do domínio são lidas como DataFrames (o GSC já agregado por
+query no banco), as keywords são normalizadas e unidas com um merge (hash
+join) do pandas; as métricas derivadas são calculadas com NumPy, sem loop por
+linha. O resultado é gravado em keyword_enrichments com upsert por
+(domain_id, keyword), de onde a API pagina: o id de uma keyword não muda entre
+recálculos, então os cursores continuam válidos.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, func
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects import postgresql, sqlite
+from app.config import settings
+from app.database import engine
+from app.models.domain import Keyword, SearchPerformance
+from app.models.analytics import KeywordEnrichment
+
+
+ENRICHED_COLUMNS = (
+    "keyword", "search_volume", "keyword_difficulty", "cpc",
+    "real_impressions", "real_clicks", "real_ctr", "real_position",
+    "volume_vs_impressions_ratio", "data_freshness",
+)
+
+
+def normalize_keywords(values: pd.Series) -> pd.Series:
+    """Minúsculas, sem espaços nas pontas e com espaços internos colapsados"""
+    return values.str.lower().str.strip().str.replace(r"\s+", " ", regex=True)
+
+
+# ============= LEITURA =============
+
+def load_semrush(conn: Connection, domain_id: int) -> pd.DataFrame:
+    result = conn.execute(
+        select(Keyword.keyword, Keyword.search_volume, Keyword.keyword_difficulty, Keyword.cpc)
+        .where(Keyword.domain_id == domain_id)
+    )
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+def load_gsc(conn: Connection, domain_id: int, start: datetime) -> pd.DataFrame:
+    """Desempenho por query desde start (posição ponderada por impressões)"""
+    result = conn.execute(
+        select(
+            SearchPerformance.query,
+            func.sum(SearchPerformance.clicks).label("clicks"),
+            func.sum(SearchPerformance.impressions).label("impressions"),
+            func.sum(SearchPerformance.position * SearchPerformance.impressions).label("position_weight"),
+        )
+        .where(SearchPerformance.domain_id == domain_id, SearchPerformance.date >= start)
+        .group_by(SearchPerformance.query)
+    )
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+# ============= CRUZAMENTO =============
+
+def enrich(semrush: pd.DataFrame, gsc: pd.DataFrame, days: int) -> pd.DataFrame:
+    """
+    Une as duas fontes pela keyword normalizada (outer join).
+    volume_vs_impressions_ratio = impressões do GSC projetadas para 30 dias
+    / volume mensal do SemRush (só com volume > 0).
+    """
+    semrush = (
+        semrush.assign(norm=normalize_keywords(semrush["keyword"].astype(str)))
+        # Variações de caixa/espaço: fica a de maior volume
+        .sort_values("search_volume", ascending=False, kind="stable")
+        .drop_duplicates("norm")
+    )
+    gsc = (
+        gsc.assign(norm=normalize_keywords(gsc["query"].astype(str)))
+        .groupby("norm", sort=False)
+        .agg(
+            query=("query", "first"),
+            clicks=("clicks", "sum"),
+            impressions=("impressions", "sum"),
+            position_weight=("position_weight", "sum"),
+        )
+        .reset_index()
+    )
+    merged = semrush.merge(gsc, on="norm", how="outer", indicator=True, sort=False)
+
+    in_gsc = merged["_merge"].to_numpy() != "left_only"
+    impressions = merged["impressions"].to_numpy(dtype=float)
+    clicks = merged["clicks"].to_numpy(dtype=float)
+    volume = merged["search_volume"].fillna(0).to_numpy(dtype=float)
+
+    shown = in_gsc & (impressions > 0)
+    ctr = np.full(len(merged), np.nan)
+    np.divide(clicks, impressions, out=ctr, where=shown)
+    position = np.full(len(merged), np.nan)
+    np.divide(merged["position_weight"].to_numpy(dtype=float), impressions, out=position, where=shown)
+    ratio = np.full(len(merged), np.nan)
+    np.divide(impressions * (30.0 / days), volume, out=ratio, where=in_gsc & (volume > 0))
+
+    return pd.DataFrame({
+        "keyword": merged["keyword"].fillna(merged["query"]).astype(str).str.slice(0, 500),
+        "search_volume": volume.astype(np.int64),
+        "keyword_difficulty": merged["keyword_difficulty"].fillna(0.0).astype(float),
+        "cpc": merged["cpc"].fillna(0.0).astype(float),
+        "real_impressions": merged["impressions"].astype("Int64"),
+        "real_clicks": merged["clicks"].astype("Int64"),
+        "real_ctr": np.round(ctr, 4),
+        "real_position": np.round(position, 2),
+        "volume_vs_impressions_ratio": np.round(ratio, 4),
+        "data_freshness": np.select(
+            [merged["_merge"].to_numpy() == "both", ~in_gsc], ["enriched", "semrush"], default="gsc"
+        ),
+    })
+
+
+def _records(df: pd.DataFrame, domain_id: int, computed_at: datetime) -> List[Dict[str, Any]]:
+    """DataFrame -> dicts para o INSERT (NaN/NA -> None)"""
+    values = {
+        column: df[column].astype(object).where(df[column].notna(), None).tolist()
+        for column in ENRICHED_COLUMNS
+    }
+    values["domain_id"] = [domain_id] * len(df)
+    values["computed_at"] = [computed_at] * len(df)
+    return [dict(zip(values, row)) for row in zip(*values.values())]
+
+
+def source_size(conn: Connection, domain_id: int, days: Optional[int] = None) -> int:
+    """Keywords do SemRush + queries do GSC na janela: tamanho do recálculo"""
+    start = datetime.utcnow() - timedelta(days=days or settings.ENRICHMENT_GSC_DAYS)
+    keywords = conn.scalar(select(func.count()).select_from(Keyword).where(Keyword.domain_id == domain_id))
+    queries = conn.scalar(
+        select(func.count(func.distinct(SearchPerformance.query)))
+        .where(SearchPerformance.domain_id == domain_id, SearchPerformance.date >= start)
+    )
+    return (keywords or 0) + (queries or 0)
+
+
+def refresh_enrichment(domain_id: int, days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Recalcula o enriquecimento do domínio (uma transação): upsert por keyword
+    e remoção das keywords que saíram das duas fontes.
+    Roda de forma síncrona (chamar fora do event loop).
+    """
+    days = days or settings.ENRICHMENT_GSC_DAYS
+    started_at = time.perf_counter()
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        df = enrich(load_semrush(conn, domain_id), load_gsc(conn, domain_id, now - timedelta(days=days)), days)
+        # Keywords distintas podem coincidir depois do corte em 500 caracteres
+        df = df.drop_duplicates("keyword")
+        if not df.empty:
+            insert_ = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+            stmt = insert_(KeywordEnrichment.__table__)
+            conn.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["domain_id", "keyword"],
+                    set_={column: stmt.excluded[column] for column in ENRICHED_COLUMNS[1:] + ("computed_at",)}
+                ),
+                _records(df, domain_id, now)
+            )
+        # O que não foi regravado agora saiu do SemRush e do GSC
+        conn.execute(
+            delete(KeywordEnrichment)
+            .where(KeywordEnrichment.domain_id == domain_id, KeywordEnrichment.computed_at < now)
+        )
+
+    freshness = df["data_freshness"].value_counts()
+    return {
+        "domain_id": domain_id,
+        "total": len(df),
+        "enriched": int(freshness.get("enriched", 0)),
+        "semrush_only": int(freshness.get("semrush", 0)),
+        "gsc_only": int(freshness.get("gsc", 0)),
+        "days": days,
+        "duration_seconds": round(time.perf_counter() - started_at, 3),
+    }
+
+
+# ============= GSC =============
+
+def upsert_search_performance(conn: Connection, domain_id: int, rows: List[Dict[str, Any]],
+                              source: str = "gsc") -> int:
+    """
+    Grava o desempenho diário por query (reenvio do mesmo dia sobrescreve).
+    CTR é calculado quando não vem.
+    """
+    now = datetime.utcnow()
+    latest: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        day = row["date"].replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        impressions = row.get("impressions") or 0
+        clicks = row.get("clicks") or 0
+        ctr = row.get("ctr")
+        latest[(row["query"], day)] = {
+            "domain_id": domain_id,
+            "query": row["query"],
+            "date": day,
+            "clicks": clicks,
+            "impressions": impressions,
+            "ctr": ctr if ctr is not None else (round(clicks / impressions, 4) if impressions else 0.0),
+            "position": row.get("position") or 0.0,
+            "source": source,
+            "created_at": now,
+        }
+    if not latest:
+        return 0
+
+    insert_ = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert_(SearchPerformance.__table__)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["domain_id", "date", "query"],
+            set_={column: stmt.excluded[column] for column in ("clicks", "impressions", "ctr", "position", "source")}
+        ),
+        list(latest.values())
+    )
+    return len(latest)
@@ -0,0 +1,167 @@
+"""
+Export em massa dos dados de um domínio (keywords, rankings e backlinks) em
+NDJSON ou CSV.
+
+As linhas saem de um cursor do lado do servidor (stream_results, lotes de
+EXPORT_BATCH_ROWS) só com as colunas pedidas, sem ORM nem Pydantic, e cada
+lote é codificado e enviado antes de o próximo ser lido: a memória não
+depende do tamanho do export e os primeiros bytes saem na hora. O gzip, se
+pedido, é aplicado no mesmo fluxo. A última linha é um trailer com o total
+de linhas; export sem trailer foi interrompido no meio.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import JSON, DateTime, Table, select
+from app.config import settings
+from app.database import engine
+from app.models.domain import Keyword, Ranking, Backlink
+
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+@dataclass(frozen=True)
+class ExportDataset:
+    table: Table
+    columns: Tuple[str, ...]  # exportáveis, na ordem padrão
+    time_column: str  # filtro since/until
+
+
+DATASETS: Dict[str, ExportDataset] = {
+    "keywords": ExportDataset(
+        Keyword.__table__,
+        ("id", "keyword", "search_volume", "keyword_difficulty", "cpc", "competition", "trend_data",
+         "source", "created_at", "last_updated"),
+        "last_updated",
+    ),
+    "rankings": ExportDataset(
+        Ranking.__table__,
+        ("id", "keyword_id", "keyword", "position", "previous_position", "url", "estimated_traffic",
+         "visibility_score", "search_engine", "location", "device", "source", "checked_at"),
+        "checked_at",
+    ),
+    "backlinks": ExportDataset(
+        Backlink.__table__,
+        ("id", "source_url", "target_url", "referring_domain", "authority_score", "anchor_text", "link_type",
+         "is_active", "first_seen", "last_seen", "source", "created_at", "updated_at"),
+        "last_seen",
+    ),
+}
+
+
+def export_columns(dataset: str, requested: Optional[str] = None) -> List[str]:
+    """
+    'keyword,position' -> colunas do export (padrão: todas as exportáveis).
+    Levanta ValueError com as colunas válidas se alguma não existir.
+    """
+    available = DATASETS[dataset].columns
+    if not requested:
+        return list(available)
+    columns = list(dict.fromkeys(name.strip() for name in requested.split(",") if name.strip()))
+    unknown = [name for name in columns if name not in available]
+    if unknown or not columns:
+        raise ValueError(
+            f"Colunas inválidas: {', '.join(unknown) or '(nenhuma)'}. Disponíveis: {', '.join(available)}"
+        )
+    return columns
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_converter(table: Table, name: str) -> Optional[Callable[[Any], Any]]:
+    """Colunas JSON e datas viram o mesmo texto do NDJSON"""
+    column_type = table.c[name].type
+    if isinstance(column_type, JSON):
+        return lambda value: None if value is None else json.dumps(value, ensure_ascii=False)
+    if isinstance(column_type, DateTime):
+        return lambda value: None if value is None else value.isoformat()
+    return None
+
+
+def _ndjson_encoder(table: Table, columns: Sequence[str]) -> Callable[[Sequence[Any]], bytes]:
+    dumps = json.JSONEncoder(default=_json_default, ensure_ascii=False, separators=(",", ":")).encode
+
+    def encode(rows: Sequence[Any]) -> bytes:
+        return "".join(dumps(dict(zip(columns, row))) + "\n" for row in rows).encode()
+    return encode
+
+
+def _csv_encoder(table: Table, columns: Sequence[str]) -> Callable[[Sequence[Any]], bytes]:
+    converters = [(index, _csv_converter(table, name)) for index, name in enumerate(columns)]
+    converters = [(index, convert) for index, convert in converters if convert]
+
+    def encode(rows: Sequence[Any]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if converters:
+            rows = [list(row) for row in rows]
+            for row in rows:
+                for index, convert in converters:
+                    row[index] = convert(row[index])
+        writer.writerows(rows)
+        return buffer.getvalue().encode()
+    return encode
+
+
+def export_rows(
+    dataset: str,
+    domain_id: int,
+    columns: Sequence[str],
+    export_format: str = "ndjson",
+    compress: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    trailer: bool = True
+) -> Iterator[bytes]:
+    """
+    Gera o export em blocos de bytes (um por lote do cursor), em ordem de id.
+    Trailer: {"_trailer": {"row_count": N}} no NDJSON, '# row_count=N' no CSV.
+    Gerador síncrono: cada lote é lido do banco quando o anterior foi enviado.
+    """
+    spec = DATASETS[dataset]
+    table = spec.table
+    query = select(*(table.c[name] for name in columns)).where(table.c.domain_id == domain_id)
+    if since is not None:
+        query = query.where(table.c[spec.time_column] >= since)
+    if until is not None:
+        query = query.where(table.c[spec.time_column] < until)
+    query = query.order_by(table.c.id)
+
+    encode = (_ndjson_encoder if export_format == "ndjson" else _csv_encoder)(table, columns)
+    # wbits=31: formato gzip (cabeçalho + CRC), não zlib puro
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def output(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    if export_format == "csv":
+        yield output((",".join(columns) + "\n").encode())
+
+    row_count = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=settings.EXPORT_BATCH_ROWS).execute(query)
+        for rows in result.partitions():
+            row_count += len(rows)
+            data = output(encode(rows))
+            if data:
+                yield data
+
+    tail = b""
+    if trailer:
+        if export_format == "csv":
+            tail = f"# row_count={row_count}\n".encode()
+        else:
+            tail = (json.dumps({"_trailer": {"row_count": row_count}}) + "\n").encode()
+    if compressor:
+        yield compressor.compress(tail) + compressor.flush()
+    elif tail:
+        yield tail
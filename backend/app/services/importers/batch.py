@@ -0,0 +1,128 @@
+"""
+Import em lote de vários arquivos do SemRush (ex.: um export por domínio).
+
+A leitura e a validação dos arquivos (parse_chunks, CPU) rodam em um pool de
+processos de IMPORT_PARSE_WORKERS, um arquivo por processo; os blocos já
+validados voltam por uma fila limitada para um único writer, no processo que
+chamou, que grava cada bloco com o checkpoint do arquivo (FileImport). Cada
+arquivo termina com o seu ImportResult.
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+import multiprocessing
+import os
+import queue
+import threading
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings
+from app.core.pools import SharedPool
+from app.schemas.seo import ImportResult
+from app.services.importers.semrush_importer import FileImport, ImportAborted, parse_chunks
+
+
+def parse_workers() -> int:
+    return settings.IMPORT_PARSE_WORKERS or os.cpu_count() or 1
+
+
+# Pool de processos compartilhado do parsing
+parse_pool = SharedPool("import", workers=parse_workers)
+
+
+def parse_file(index: int, path: str, import_type: str, chunk_rows: int, start: int, first_row: int,
+               results: Any, stop: Any) -> None:
+    """
+    Roda no pool: manda os blocos do arquivo para o writer pela fila, seguidos
+    de ("done", None) ou ("error", mensagem); para se stop for sinalizado
+    """
+    try:
+        for parsed in parse_chunks(path, import_type, chunk_rows, start, first_row):
+            if stop.is_set():
+                return
+            results.put((index, "chunk", parsed))
+    except ImportAborted as e:
+        results.put((index, "error", str(e)))
+    except Exception as e:
+        results.put((index, "error", f"Erro processando o arquivo: {e}"))
+    else:
+        results.put((index, "done", None))
+
+
+def import_semrush_batch(
+    files: Sequence[Tuple[str, int]],
+    import_type: str,
+    chunk_rows: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int, int], None]] = None
+) -> List[ImportResult]:
+    """
+    Importa vários arquivos (caminho, domain_id) em paralelo.
+    Falha em um arquivo (leitura ou gravação) não interrompe os outros.
+    on_progress(arquivos concluídos, total de arquivos, linhas lidas): chamado
+    após cada bloco gravado; uma exceção dele interrompe o lote (os arquivos
+    que não terminaram continuam do checkpoint em um novo import).
+    Returns: um ImportResult por arquivo, na ordem de files
+    Roda de forma síncrona (chamar fora do event loop).
+    """
+    imports = [FileImport(path, domain_id, import_type) for path, domain_id in files]
+    chunk_rows = chunk_rows or settings.IMPORT_CHUNK_ROWS
+    # Fila curta: a memória fica em poucos blocos por processo, não nos arquivos inteiros
+    maxsize = 2 * parse_workers()
+    manager = None
+    if parse_pool.uses_processes:
+        manager = multiprocessing.Manager()
+        results: Any = manager.Queue(maxsize)
+        stop: Any = manager.Event()
+    else:
+        results = queue.Queue(maxsize)
+        stop = threading.Event()
+
+    futures: List[Future] = [
+        parse_pool.submit(parse_file, index, file_import.path, import_type, chunk_rows,
+                    file_import.start, file_import.first_row, results, stop)
+        for index, file_import in enumerate(imports)
+    ]
+    running = set(range(len(imports)))  # arquivos ainda sendo lidos
+    failed = set()  # gravação falhou: os blocos restantes são descartados
+    rows_read = 0
+    try:
+        while running:
+            try:
+                index, kind, payload = results.get(timeout=1)
+            except queue.Empty:
+                # Processo do pool que morreu não manda o fim do arquivo
+                for index in list(running):
+                    if futures[index].done() and futures[index].exception() is not None:
+                        imports[index].report.abort(f"Erro processando o arquivo: {futures[index].exception()}")
+                        running.discard(index)
+                continue
+
+            file_import = imports[index]
+            if kind == "done":
+                running.discard(index)
+            elif kind == "error":
+                file_import.report.abort(payload)
+                running.discard(index)
+            elif index not in failed:
+                try:
+                    file_import.write(payload)
+                except SQLAlchemyError as e:
+                    file_import.db_error(e)
+                    failed.add(index)
+                rows_read += payload.total_rows
+                if on_progress:
+                    on_progress(len(imports) - len(running), len(imports), rows_read)
+    finally:
+        if running:
+            # Interrompido: os arquivos na fila do pool não começam e os em
+            # leitura param no próximo bloco (esvazia a fila para destravá-los)
+            stop.set()
+            for future in futures:
+                future.cancel()
+            while not all(future.done() for future in futures):
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        if manager is not None:
+            manager.shutdown()
+
+    return [file_import.finish() for file_import in imports]
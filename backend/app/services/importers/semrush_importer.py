@@ -0,0 +1,701 @@
+"""
+Importador de CSVs exportados do SemRush (keywords, rankings e backlinks).
+
+O arquivo é lido pelo pandas em blocos de IMPORT_CHUNK_ROWS linhas. Cada bloco
+é validado de forma vetorizada (operações por coluna, sem loop por linha) e
+gravado com um INSERT em lote na sua própria transação, então a memória usada
+depende do tamanho do bloco e não do tamanho do arquivo.
+
+Planilhas .xlsx (exportação pelo Excel) entram pelo mesmo caminho: o openpyxl
+em modo read-only percorre as linhas sem carregar a planilha inteira, e cada
+bloco de linhas vira um DataFrame de texto igual ao do CSV.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Set, Tuple, Callable, Iterator
+import hashlib
+import io
+import itertools
+import os
+import re
+import time
+import zipfile
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from sqlalchemy import insert, select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings
+from app.database import engine
+from app.models.domain import Keyword, Ranking, Backlink
+from app.models.upload import ImportCheckpoint
+from app.schemas.seo import ImportResult
+from app.services.keywords import upsert_keyword_batch, ensure_keyword_ids
+from app.services.backlinks import upsert_backlink_batch
+from app.services.ranking_store import ranking_store
+from app.services.ranking_changes import update_previous_positions
+from app.services import domain_analytics
+
+
+IMPORT_TYPES = ("keywords", "rankings", "backlinks")
+
+# Cabeçalhos do SemRush (após normalize_header) -> campo interno
+COLUMN_ALIASES: Dict[str, Dict[str, str]] = {
+    "keywords": {
+        "keyword": "keyword",
+        "search volume": "search_volume",
+        "volume": "search_volume",
+        "keyword difficulty": "keyword_difficulty",
+        "keyword difficulty index": "keyword_difficulty",
+        "kd": "keyword_difficulty",
+        "cpc": "cpc",
+        "competition": "competition",
+        "competitive density": "competition",
+        "trends": "trend",
+        "trend": "trend",
+    },
+    "rankings": {
+        "keyword": "keyword",
+        "position": "position",
+        "previous position": "previous_position",
+        "url": "url",
+        "traffic": "estimated_traffic",
+        "search engine": "search_engine",
+        "database": "location",
+        "location": "location",
+        "device": "device",
+        "timestamp": "checked_at",
+        "date": "checked_at",
+    },
+    "backlinks": {
+        "source url": "source_url",
+        "target url": "target_url",
+        "anchor": "anchor_text",
+        "page ascore": "authority_score",
+        "page authority score": "authority_score",
+        "nofollow": "nofollow",
+        "first seen": "first_seen",
+        "last seen": "last_seen",
+        "lost link": "lost_link",
+    },
+}
+
+REQUIRED_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "keywords": ("keyword",),
+    "rankings": ("keyword", "position"),
+    "backlinks": ("source_url", "target_url"),
+}
+
+TABLES = {
+    "keywords": Keyword.__table__,
+    "rankings": Ranking.__table__,
+    "backlinks": Backlink.__table__,
+}
+
+
+def normalize_header(header: str) -> str:
+    """'Keyword Difficulty (%)' -> 'keyword difficulty'"""
+    header = re.sub(r"\(.*?\)|%", "", str(header))
+    return re.sub(r"\s+", " ", header).strip().lower()
+
+
+def detect_delimiter(path: str) -> str:
+    """O SemRush exporta com ',' ou ';' dependendo da configuração regional"""
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        header = f.readline()
+    return max((",", ";", "\t"), key=header.count)
+
+
+def is_xlsx(path: str) -> bool:
+    """Planilhas do Excel são ZIP; o CSV nunca começa com a assinatura do ZIP"""
+    with open(path, "rb") as f:
+        return f.read(4) == b"PK\x03\x04"
+
+
+def read_chunks(path: str, chunk_rows: int, start: int = 0) -> Iterator[Tuple[pd.DataFrame, int, int]]:
+    """
+    Leitor incremental do arquivo (CSV ou XLSX, todas as colunas como texto).
+    Cada bloco vem com a posição do seu fim e o tamanho do arquivo, nas
+    unidades do formato (bytes no CSV, linhas na planilha); a leitura pode
+    recomeçar de qualquer uma dessas posições (start).
+    """
+    if is_xlsx(path):
+        return read_xlsx_chunks(path, chunk_rows, start)
+    return read_csv_chunks(path, chunk_rows, start)
+
+
+def read_csv_chunks(path: str, chunk_rows: int, start_offset: int = 0) -> Iterator[Tuple[pd.DataFrame, int, int]]:
+    """
+    Os blocos sempre terminam no fim de um registro (aspas balanceadas), então
+    o offset em bytes do fim de cada um é um ponto de retomada válido.
+    """
+    sep = detect_delimiter(path)
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        if not header.strip():
+            raise pd.errors.EmptyDataError("Arquivo vazio")
+        if start_offset:
+            f.seek(start_offset)
+        while True:
+            block = b"".join(itertools.islice(f, chunk_rows))
+            if not block:
+                return
+            # Quebra de linha dentro de aspas: completa o registro
+            while block.count(b'"') % 2:
+                line = f.readline()
+                if not line:
+                    break
+                block += line
+            chunk = pd.read_csv(
+                io.BytesIO(header + block),
+                sep=sep,
+                dtype=str,
+                keep_default_na=False,
+                encoding="utf-8-sig"
+            )
+            yield chunk, f.tell(), size
+
+
+def _cell_text(value: Any) -> str:
+    """Valor tipado da célula -> texto no formato que o CSV traria"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def read_xlsx_chunks(path: str, chunk_rows: int, start_row: int = 0) -> Iterator[Tuple[pd.DataFrame, int, int]]:
+    """
+    Primeira planilha do arquivo, pelo iterador read-only/values-only do
+    openpyxl (a memória fica no bloco atual, não na planilha inteira).
+    A posição é o número de linhas de dados já lidas.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None or all(cell is None for cell in header):
+            raise pd.errors.EmptyDataError("Planilha vazia")
+        # Células vazias no fim do cabeçalho são só formatação; no meio, viram "Unnamed: N" como no pandas
+        width = max(i for i, cell in enumerate(header) if cell is not None) + 1
+        columns = [_cell_text(cell).strip() or f"Unnamed: {i}" for i, cell in enumerate(header[:width])]
+        size = max(0, (sheet.max_row or 0) - 1)
+
+        position = start_row
+        rows = itertools.islice(rows, start_row, None)
+        while True:
+            block = list(itertools.islice(rows, chunk_rows))
+            if not block:
+                return
+            position += len(block)
+            records = [
+                [_cell_text(cell) for cell in row[:width]] + [""] * (width - len(row))
+                for row in block
+                # Linhas vazias (formatação sobrando no fim da planilha) ficam de fora, como no CSV
+                if any(cell is not None for cell in row)
+            ]
+            yield pd.DataFrame(records, columns=columns, dtype=object), position, max(size, position)
+    finally:
+        workbook.close()
+
+
+def map_columns(columns, import_type: str) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Mapeia os cabeçalhos do arquivo para os campos internos.
+    Returns: (mapeamento, colunas ignoradas)
+    """
+    aliases = COLUMN_ALIASES[import_type]
+    mapping: Dict[str, str] = {}
+    ignored = []
+    for column in columns:
+        target = aliases.get(normalize_header(column))
+        if target and target not in mapping.values():
+            mapping[column] = target
+        else:
+            ignored.append(str(column))
+    return mapping, ignored
+
+
+# ============= VALIDAÇÃO VETORIZADA =============
+
+def _text(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[column].str.strip()
+
+
+def _number(df: pd.DataFrame, column: str, thousands: bool = False) -> Tuple[pd.Series, pd.Series]:
+    """Converte uma coluna para número; devolve (valores, máscara de inválidos)"""
+    raw = _text(df, column)
+    if thousands:
+        raw = raw.str.replace(",", "", regex=False)
+    values = pd.to_numeric(raw, errors="coerce")
+    return values, values.isna() & raw.ne("")
+
+
+def _datetime(df: pd.DataFrame, column: str) -> Tuple[pd.Series, pd.Series]:
+    """Datas em epoch (segundos) ou texto; devolve (valores em UTC sem tz, inválidos)"""
+    raw = _text(df, column)
+    epoch = pd.to_numeric(raw, errors="coerce")
+    values = pd.to_datetime(epoch, unit="s", errors="coerce")
+    text = raw.where(epoch.isna() & raw.ne(""))
+    if text.notna().any():
+        parsed = pd.to_datetime(text, errors="coerce", utc=True, format="mixed")
+        values = values.fillna(parsed.dt.tz_convert(None))
+    return values, values.isna() & raw.ne("")
+
+
+def _flag(df: pd.DataFrame, column: str) -> pd.Series:
+    return _text(df, column).str.lower().isin(("true", "1", "yes", "sim"))
+
+
+def _reasons(index: pd.Index, checks: List[Tuple[pd.Series, str]]) -> pd.Series:
+    """Primeiro motivo de rejeição de cada linha (None se a linha é válida)"""
+    reasons = pd.Series(None, index=index, dtype=object)
+    for mask, message in checks:
+        reasons = reasons.mask(reasons.isna() & mask, message)
+    return reasons
+
+
+def _parse_trend(value: str) -> Optional[Dict[str, Any]]:
+    """'0.54,0.66,1.00' -> {'monthly': [0.54, 0.66, 1.0]}"""
+    if not value:
+        return None
+    try:
+        return {"monthly": [float(v) for v in value.split(",") if v.strip()]}
+    except ValueError:
+        return None
+
+
+def prepare_keywords(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    keyword = _text(df, "keyword")
+    volume, bad_volume = _number(df, "search_volume", thousands=True)
+    difficulty, bad_difficulty = _number(df, "keyword_difficulty")
+    cpc, bad_cpc = _number(df, "cpc")
+    competition = _text(df, "competition").str.slice(0, 50)
+
+    reasons = _reasons(df.index, [
+        (keyword.eq(""), "keyword vazia"),
+        (keyword.str.len() > 500, "keyword com mais de 500 caracteres"),
+        (bad_volume | (volume < 0), "search volume inválido"),
+        (bad_difficulty | (difficulty < 0) | (difficulty > 100), "keyword difficulty fora de 0-100"),
+        (bad_cpc | (cpc < 0), "CPC inválido"),
+    ])
+    rows = pd.DataFrame({
+        "keyword": keyword,
+        "search_volume": volume.fillna(0).round().astype("int64"),
+        "keyword_difficulty": difficulty.fillna(0.0),
+        "cpc": cpc.fillna(0.0),
+        "competition": competition.where(competition.ne("")),
+        "trend_data": _text(df, "trend").map(_parse_trend),
+    })
+    return rows, reasons
+
+
+def prepare_rankings(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    keyword = _text(df, "keyword")
+    position, _ = _number(df, "position", thousands=True)
+    previous, bad_previous = _number(df, "previous_position", thousands=True)
+    traffic, bad_traffic = _number(df, "estimated_traffic", thousands=True)
+    checked_at, bad_checked_at = _datetime(df, "checked_at")
+    url = _text(df, "url")
+    search_engine = _text(df, "search_engine").str.lower()
+    location = _text(df, "location")
+    device = _text(df, "device").str.lower()
+
+    reasons = _reasons(df.index, [
+        (keyword.eq(""), "keyword vazia"),
+        (keyword.str.len() > 500, "keyword com mais de 500 caracteres"),
+        (position.isna() | (position < 0), "position inválida"),
+        (bad_previous | (previous < 0), "previous position inválida"),
+        (bad_traffic, "traffic inválido"),
+        (bad_checked_at, "data inválida"),
+    ])
+    rows = pd.DataFrame({
+        "keyword": keyword,
+        "position": position.fillna(0).round().astype("int64"),
+        "previous_position": previous.fillna(0).round().astype("int64"),
+        "url": url.where(url.ne("")),
+        "estimated_traffic": traffic.fillna(0.0),
+        "search_engine": search_engine.where(search_engine.ne(""), "google").str.slice(0, 50),
+        "location": location.where(location.ne(""), "global").str.slice(0, 100),
+        "device": device.where(device.ne(""), "desktop").str.slice(0, 20),
+        "checked_at": checked_at.fillna(pd.Timestamp.utcnow().tz_localize(None)),
+    })
+    return rows, reasons
+
+
+def prepare_backlinks(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    source_url = _text(df, "source_url")
+    target_url = _text(df, "target_url")
+    authority, bad_authority = _number(df, "authority_score")
+    first_seen, bad_first_seen = _datetime(df, "first_seen")
+    last_seen, bad_last_seen = _datetime(df, "last_seen")
+    anchor = _text(df, "anchor_text")
+    referring_domain = source_url.str.extract(
+        r"^https?://(?:www\.)?([^/:?#]+)", flags=re.IGNORECASE
+    )[0].str.lower()
+
+    reasons = _reasons(df.index, [
+        (~source_url.str.match(r"^https?://", case=False), "source url inválida"),
+        (~target_url.str.match(r"^https?://", case=False), "target url inválida"),
+        (bad_authority | (authority < 0) | (authority > 100), "authority score fora de 0-100"),
+        (bad_first_seen | bad_last_seen, "data inválida"),
+    ])
+    rows = pd.DataFrame({
+        "source_url": source_url,
+        "target_url": target_url,
+        "referring_domain": referring_domain.str.slice(0, 255),
+        "authority_score": authority.fillna(0).round().astype("int64"),
+        "anchor_text": anchor.where(anchor.ne("")),
+        "link_type": np.where(_flag(df, "nofollow"), "nofollow", "dofollow"),
+        "is_active": ~_flag(df, "lost_link"),
+        "first_seen": first_seen,
+        "last_seen": last_seen,
+    })
+    return rows, reasons
+
+
+PREPARERS = {
+    "keywords": prepare_keywords,
+    "rankings": prepare_rankings,
+    "backlinks": prepare_backlinks,
+}
+
+
+# ============= GRAVAÇÃO EM LOTE =============
+
+def to_records(rows: pd.DataFrame) -> List[Dict[str, Any]]:
+    """DataFrame -> lista de dicts com tipos Python (NaN/NaT viram None)"""
+    columns = {
+        name: series.astype(object).where(series.notna(), None)
+        for name, series in rows.items()
+    }
+    return pd.DataFrame(columns, index=rows.index).to_dict("records")
+
+
+def write_chunk(conn: Connection, import_type: str, domain_id: int, rows: pd.DataFrame, source: str = "semrush") -> int:
+    """
+    Grava um bloco validado com um único INSERT executemany
+    (o SQLAlchemy agrupa as linhas em INSERTs de múltiplos VALUES);
+    keywords e backlinks usam upserts com deduplicação (por keyword e por
+    url_hash) e rankings também alimentam o histórico (ranking_store).
+    Os contadores do snapshot de analytics são atualizados na mesma transação.
+    Returns: número de linhas gravadas
+    """
+    if rows.empty:
+        return 0
+    if import_type == "keywords":
+        # Reimports atualizam as keywords existentes em vez de duplicar
+        counts = upsert_keyword_batch(conn, domain_id, to_records(rows), source)
+        domain_analytics.add_keywords(conn, domain_id, counts["inserted"])
+        return len(rows)
+    if import_type == "backlinks":
+        # Reimports atualizam last_seen/is_active dos links já gravados
+        upsert_backlink_batch(conn, domain_id, to_records(rows), source)
+        return len(rows)
+    rows = rows.assign(domain_id=domain_id, source=source)
+    if import_type == "rankings":
+        # Keywords novas entram no cadastro do domínio (dicionário do histórico)
+        ids = ensure_keyword_ids(conn, domain_id, rows["keyword"].tolist(), source)
+        rows["keyword_id"] = rows["keyword"].map(ids).astype(object)
+    records = to_records(rows)
+    conn.execute(insert(TABLES[import_type]), records)
+    if import_type == "rankings":
+        ranking_store.write_points(conn, domain_id, records)
+    return len(records)
+
+
+# ============= RELATÓRIO =============
+
+@dataclass
+class ImportReport:
+    """
+    Acumula contagens e erros de um import; vira o ImportResult no final
+    """
+    import_type: str
+    source: str = "semrush"
+    max_errors: int = 100
+    total_rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    reported: int = 0
+    aborted: bool = False
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def add_row_errors(self, reasons: pd.Series, line_offset: int = 2) -> None:
+        """Registra linhas rejeitadas (índice do DataFrame -> linha do arquivo)"""
+        self.failed += len(reasons)
+        room = max(0, self.max_errors - self.reported)
+        for index, reason in reasons.iloc[:room].items():
+            self.errors.append(f"Linha {index + line_offset}: {reason}")
+            self.reported += 1
+
+    def abort(self, message: str) -> None:
+        self.aborted = True
+        self.errors.append(message)
+
+    def state(self) -> Dict[str, Any]:
+        """Contadores, erros e tempo decorrido (para o checkpoint)"""
+        return {
+            "total_rows": self.total_rows,
+            "imported": self.imported,
+            "failed": self.failed,
+            "reported": self.reported,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "elapsed": time.perf_counter() - self.started_at,
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """Continua um import retomado de onde o checkpoint parou"""
+        for name in ("total_rows", "imported", "failed", "reported", "errors", "warnings"):
+            setattr(self, name, state[name])
+        self.started_at = time.perf_counter() - state["elapsed"]
+
+    def to_result(self) -> ImportResult:
+        duration = time.perf_counter() - self.started_at
+        warnings = list(self.warnings)
+        if self.failed > self.reported:
+            warnings.append(f"{self.failed - self.reported} erros de linha omitidos")
+        return ImportResult(
+            success=not self.aborted and (self.imported > 0 or self.total_rows == 0),
+            total_imported=self.imported,
+            source=self.source,
+            import_type=self.import_type,
+            errors=self.errors or None,
+            warnings=warnings or None,
+            total_rows=self.total_rows,
+            total_failed=self.failed,
+            duration_seconds=round(duration, 3),
+            rows_per_second=round(self.imported / duration, 1) if duration > 0 else 0.0
+        )
+
+
+# ============= CHECKPOINTS =============
+
+def file_digest(path: str) -> str:
+    """SHA-256 do arquivo (identidade do checkpoint, independente do caminho)"""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _checkpoint_key(file_hash: str, domain_id: int, import_type: str):
+    return (
+        (ImportCheckpoint.file_hash == file_hash)
+        & (ImportCheckpoint.domain_id == domain_id)
+        & (ImportCheckpoint.import_type == import_type)
+    )
+
+
+def load_checkpoint(file_hash: str, domain_id: int, import_type: str) -> Optional[Any]:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(ImportCheckpoint).where(_checkpoint_key(file_hash, domain_id, import_type))
+        ).first()
+
+
+def save_checkpoint(conn: Connection, file_hash: str, domain_id: int, import_type: str, offset: int,
+                    report: ImportReport, ranking_days: Set[date]) -> None:
+    """Gravado na transação do bloco: o bloco e o checkpoint entram juntos"""
+    key = ("file_hash", "domain_id", "import_type")
+    values = {
+        "file_hash": file_hash,
+        "domain_id": domain_id,
+        "import_type": import_type,
+        "byte_offset": offset,
+        "rows_read": report.total_rows,
+        "report": report.state(),
+        "ranking_days": sorted(day.isoformat() for day in ranking_days),
+        "updated_at": datetime.utcnow(),
+    }
+    insert_ = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert_(ImportCheckpoint.__table__).values(**values)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={column: stmt.excluded[column] for column in values if column not in key}
+    ))
+
+
+def clear_checkpoint(file_hash: str, domain_id: int, import_type: str) -> None:
+    try:
+        with engine.begin() as conn:
+            conn.execute(delete(ImportCheckpoint).where(_checkpoint_key(file_hash, domain_id, import_type)))
+    except SQLAlchemyError as e:
+        print(f"Import checkpoint cleanup error ({file_hash}): {e}")
+
+
+# ============= PARSING E WRITER =============
+
+class ImportAborted(Exception):
+    """Arquivo que não pode ser importado (a mensagem vai para o ImportResult)"""
+
+
+@dataclass
+class ParsedChunk:
+    """Bloco lido e validado, pronto para o writer (atravessa o pool de processos)"""
+    rows: pd.DataFrame  # linhas válidas, já no formato das tabelas
+    errors: pd.Series  # motivo de rejeição das linhas inválidas (índice = linha do arquivo)
+    total_rows: int
+    position: int  # fim do bloco no arquivo (ponto de retomada)
+    size: int
+    ignored: List[str] = field(default_factory=list)  # colunas ignoradas (só no primeiro bloco)
+
+
+def parse_chunks(path: str, import_type: str, chunk_rows: int, start: int = 0,
+                 first_row: int = 0) -> Iterator[ParsedChunk]:
+    """
+    Leitura, mapeamento de colunas e validação do arquivo, bloco a bloco (a
+    parte pesada em CPU, sem acesso ao banco).
+    start/first_row: posição e número de linhas já lidas (retomada).
+    Levanta ImportAborted se o arquivo não puder ser lido.
+    """
+    prepare = PREPARERS[import_type]
+    mapping: Optional[Dict[str, str]] = None
+    row = first_row
+    try:
+        for chunk, position, size in read_chunks(path, chunk_rows, start):
+            ignored: List[str] = []
+            if mapping is None:
+                mapping, ignored = map_columns(chunk.columns, import_type)
+                missing = [c for c in REQUIRED_COLUMNS[import_type] if c not in mapping.values()]
+                if missing:
+                    raise ImportAborted(f"Colunas obrigatórias ausentes: {', '.join(missing)}")
+
+            chunk = chunk[list(mapping)].rename(columns=mapping)
+            # Numeração das linhas (mensagens de erro) continua entre blocos
+            chunk.index += row
+            row += len(chunk)
+
+            rows, reasons = prepare(chunk)
+            invalid = reasons.notna()
+            yield ParsedChunk(rows[~invalid], reasons[invalid], len(chunk), position, size, ignored)
+    except pd.errors.EmptyDataError:
+        raise ImportAborted("Arquivo vazio")
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise ImportAborted(f"Erro lendo o CSV: {e}")
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise ImportAborted(f"Erro lendo a planilha: {e}")
+
+
+class FileImport:
+    """
+    Lado do writer de um arquivo: grava os blocos validados (cada um com o
+    checkpoint, na mesma transação), acumula o relatório e fecha o import.
+    Começa do checkpoint do conteúdo do arquivo no domínio, se houver
+    (start/first_row).
+    """
+
+    def __init__(self, path: str, domain_id: int, import_type: str):
+        if import_type not in IMPORT_TYPES:
+            raise ValueError(f"Tipo de import inválido: {import_type}")
+        self.path = path
+        self.domain_id = domain_id
+        self.import_type = import_type
+        self.report = ImportReport(import_type, max_errors=settings.IMPORT_MAX_REPORTED_ERRORS)
+        self.ranking_days: Set[date] = set()
+        self.start = 0
+        self.resumed = False
+        self.db_failed = False
+
+        self.file_hash = file_digest(path)
+        checkpoint = load_checkpoint(self.file_hash, domain_id, import_type)
+        if checkpoint is not None:
+            self.report.restore(checkpoint.report)
+            self.ranking_days = {date.fromisoformat(day) for day in checkpoint.ranking_days or []}
+            self.start = checkpoint.byte_offset
+            self.resumed = True
+
+    @property
+    def first_row(self) -> int:
+        return self.report.total_rows
+
+    def write(self, parsed: ParsedChunk) -> None:
+        """Levanta SQLAlchemyError se a gravação falhar (o bloco não entra)"""
+        report = self.report
+        if parsed.ignored and not self.resumed:
+            report.warnings.append(f"Colunas ignoradas: {', '.join(parsed.ignored)}")
+        report.total_rows += parsed.total_rows
+        if len(parsed.errors):
+            report.add_row_errors(parsed.errors)
+
+        with engine.begin() as conn:
+            report.imported += write_chunk(conn, self.import_type, self.domain_id, parsed.rows)
+            if self.import_type == "rankings":
+                self.ranking_days.update(parsed.rows["checked_at"].dt.date.unique())
+            save_checkpoint(conn, self.file_hash, self.domain_id, self.import_type, parsed.position,
+                            report, self.ranking_days)
+
+    def db_error(self, error: SQLAlchemyError) -> None:
+        print(f"SemRush import error (domain {self.domain_id}, {self.import_type}): {error}")
+        self.db_failed = True
+        self.report.abort(f"Erro gravando no banco após {self.report.imported} linhas")
+        domain_analytics.mark_stale(engine, self.domain_id)
+
+    def finish(self) -> ImportResult:
+        """
+        Fechamento dos rankings (posições anteriores e snapshot) e remoção do
+        checkpoint. Import interrompido (erro de gravação ou de leitura) mantém
+        o checkpoint: os blocos já gravados ficam no banco e um novo import do
+        arquivo continua depois deles, sem duplicar linhas.
+        """
+        if self.import_type == "rankings" and self.report.imported and not self.db_failed:
+            try:
+                with engine.begin() as conn:
+                    update_previous_positions(conn, self.domain_id)
+                    domain_analytics.refresh_rankings(conn, self.domain_id, self.ranking_days)
+            except SQLAlchemyError as e:
+                self.db_error(e)
+        if not self.report.aborted:
+            clear_checkpoint(self.file_hash, self.domain_id, self.import_type)
+        return self.report.to_result()
+
+
+def import_semrush_csv(
+    path: str,
+    domain_id: int,
+    import_type: str,
+    chunk_rows: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int, int], None]] = None
+) -> ImportResult:
+    """
+    Importa um CSV (ou .xlsx) do SemRush para o domínio, bloco a bloco.
+    Cada bloco é gravado em uma transação, junto com o checkpoint do arquivo
+    (offset em bytes e contadores, pela chave SHA-256 do conteúdo); se o
+    import for interrompido, importar o mesmo arquivo de novo no domínio
+    (mesmo conteúdo, de qualquer caminho) continua do último bloco gravado,
+    sem duplicar linhas, e o ImportResult final cobre o arquivo inteiro.
+    Se um bloco falhar, o import para e o resultado informa quantas linhas já
+    foram gravadas (e o snapshot de analytics fica marcado como desatualizado).
+    on_progress(posição, tamanho, linhas lidas): chamado após cada bloco
+    gravado, com posição e tamanho em bytes (CSV) ou linhas (XLSX); uma
+    exceção dele interrompe o import.
+    Roda de forma síncrona (chamar fora do event loop).
+    """
+    file_import = FileImport(path, domain_id, import_type)
+    chunks = parse_chunks(path, import_type, chunk_rows or settings.IMPORT_CHUNK_ROWS,
+                          file_import.start, file_import.first_row)
+    try:
+        for parsed in chunks:
+            file_import.write(parsed)
+            if on_progress:
+                on_progress(parsed.position, parsed.size, file_import.report.total_rows)
+    except ImportAborted as e:
+        file_import.report.abort(str(e))
+    except SQLAlchemyError as e:
+        file_import.db_error(e)
+    return file_import.finish()
@@ -0,0 +1,396 @@
+"""
+Jobs em background: imports, crawls e recálculos saem da requisição e rodam
+no worker do Celery (app/tasks.py).
+
+- submit_job grava o job (queued) e o envia ao broker; a API devolve o id
+  na hora e o cliente acompanha por GET /jobs/{id}
+- no worker, run_job só passa o job para running se o cliente tiver menos de
+  JOBS_MAX_RUNNING_PER_CLIENT jobs em execução (senão a task volta para a
+  fila depois de JOBS_RETRY_SECONDS)
+- o handler informa o progresso pelo JobContext; cada gravação (no máximo uma
+  por JOBS_PROGRESS_INTERVAL_SECONDS) lê o pedido de cancelamento, que
+  interrompe o handler com JobCancelled
+- enquanto o handler roda, uma thread de heartbeat grava updated_at a cada
+  JOBS_PROGRESS_INTERVAL_SECONDS: handlers de um passo só (recálculos) não
+  parecem órfãos em execuções longas
+- a task só é confirmada ao broker no fim (acks_late): se o worker morrer, a
+  task é reentregue e o job em running sem heartbeat há JOBS_STALE_SECONDS é
+  reassumido (o import continua do checkpoint), até JOBS_MAX_ATTEMPTS vezes
+- handlers que usam um pool de processos (parallel=True) vão para a fila
+  JOBS_PARALLEL_QUEUE: no worker prefork (processos daemon) o pool seria de
+  threads, sem paralelismo de CPU; essa fila é consumida por um worker
+  --pool=threads (app/tasks.py)
+
+Handlers novos entram no registro com @job_handler(tipo).
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable
+from uuid import uuid4
+import asyncio
+import threading
+import time
+from sqlalchemy import select, insert, update, func, or_, and_
+from app.config import settings
+from app.database import engine
+from app.models.auth import Client
+from app.models.job import Job, JobStatus, ACTIVE_JOB_STATUSES
+from app.services import domain_analytics
+from app.services.crawler.pages import crawl_domain
+from app.services.enrichment import refresh_enrichment
+from app.services.importers.batch import import_semrush_batch
+from app.services.importers.semrush_importer import import_semrush_csv
+from app.services.onpage.batch import analyze_domain_pages
+from app.services.uploads import release_import_file
+
+
+class JobCancelled(Exception):
+    """Cancelamento pedido pelo cliente (interrompe o handler)"""
+
+
+class JobLimitExceeded(Exception):
+    """Cliente já tem JOBS_MAX_QUEUED_PER_CLIENT jobs ativos"""
+
+
+class JobContext:
+    """Progresso e cancelamento do job em execução (usado pelo handler)"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.cancel_requested = False
+        self._last_write = 0.0
+
+    def progress(self, current: int, total: Optional[int] = None, message: Optional[str] = None,
+                 force: bool = False) -> None:
+        """
+        Grava o progresso (descartado se a última gravação foi há menos de
+        JOBS_PROGRESS_INTERVAL_SECONDS, salvo force=True).
+        Levanta JobCancelled se o cancelamento foi pedido.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_write < settings.JOBS_PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+
+        values: Dict[str, Any] = {"progress_current": current, "updated_at": datetime.utcnow()}
+        if total is not None:
+            values["progress_total"] = total
+        if message is not None:
+            values["progress_message"] = message[:255]
+        with engine.begin() as conn:
+            conn.execute(update(Job).where(Job.id == self.job_id).values(**values))
+            self.cancel_requested = bool(conn.scalar(select(Job.cancel_requested).where(Job.id == self.job_id)))
+        if self.cancel_requested:
+            raise JobCancelled()
+
+
+@dataclass(frozen=True)
+class JobHandler:
+    run: Callable[..., Dict[str, Any]]  # (ctx, domain_id, **params) -> resultado (JSON)
+    cleanup: Optional[Callable[..., None]] = None  # (**params), sempre ao final do job
+    parallel: bool = False  # usa pool de processos: vai para a fila JOBS_PARALLEL_QUEUE
+
+
+HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(job_type: str, cleanup: Optional[Callable[..., None]] = None, parallel: bool = False):
+    """Registra a função como handler do tipo de job"""
+    def register(run: Callable[..., Dict[str, Any]]):
+        HANDLERS[job_type] = JobHandler(run, cleanup, parallel)
+        return run
+    return register
+
+
+# ============= API =============
+
+def submit_job(client_id: int, job_type: str, domain_id: Optional[int] = None,
+               params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Grava o job e envia para o broker.
+    Levanta JobLimitExceeded se o cliente já estiver no limite de jobs ativos.
+    Returns: id do job
+    """
+    if job_type not in HANDLERS:
+        raise ValueError(f"Tipo de job inválido: {job_type}")
+
+    job_id = uuid4().hex
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        # Serializa as submissões do cliente (Postgres; no SQLite a escrita já é serial)
+        conn.execute(select(Client.id).where(Client.id == client_id).with_for_update())
+        active = conn.scalar(
+            select(func.count()).select_from(Job)
+            .where(Job.client_id == client_id, Job.status.in_(ACTIVE_JOB_STATUSES))
+        )
+        if active >= settings.JOBS_MAX_QUEUED_PER_CLIENT:
+            raise JobLimitExceeded(
+                f"Limite de {settings.JOBS_MAX_QUEUED_PER_CLIENT} jobs ativos por cliente atingido"
+            )
+        conn.execute(insert(Job).values(
+            id=job_id, client_id=client_id, domain_id=domain_id, job_type=job_type,
+            params=params or {}, status=JobStatus.QUEUED, cancel_requested=False,
+            attempts=0, progress_current=0, created_at=now, updated_at=now
+        ))
+
+    try:
+        dispatch(job_id, job_type)
+    except Exception as e:
+        print(f"Job dispatch error ({job_id}): {e}")
+        _finish(job_id, JobStatus.FAILED, error="Broker indisponível")
+        _cleanup(job_type, params)
+        raise
+    return job_id
+
+
+def dispatch(job_id: str, job_type: str) -> None:
+    """Envia o job para o worker (no modo eager do Celery executa aqui mesmo)"""
+    from app.tasks import run_job_task
+    queue = settings.JOBS_PARALLEL_QUEUE if HANDLERS[job_type].parallel else None
+    run_job_task.apply_async((job_id,), queue=queue)
+
+
+def cancel_job(job_id: str, client_id: int) -> bool:
+    """
+    Job na fila é cancelado na hora; em execução, o handler para na próxima
+    gravação de progresso.
+    Returns: False se o job não existe (ou é de outro cliente)
+    """
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        job = conn.execute(
+            select(Job.job_type, Job.params, Job.status).where(Job.id == job_id, Job.client_id == client_id)
+        ).first()
+        if job is None:
+            return False
+        cancelled = conn.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JobStatus.QUEUED)
+            .values(status=JobStatus.CANCELLED, cancel_requested=True, finished_at=now, updated_at=now)
+        ).rowcount
+        conn.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JobStatus.RUNNING)
+            .values(cancel_requested=True, updated_at=now)
+        )
+    if cancelled:
+        _cleanup(job.job_type, job.params)
+    return True
+
+
+# ============= WORKER =============
+
+def claim_job(job_id: str) -> Optional[bool]:
+    """
+    queued -> running, se o cliente estiver abaixo de JOBS_MAX_RUNNING_PER_CLIENT.
+    Um job em running sem heartbeat há JOBS_STALE_SECONDS (worker morreu) é
+    reassumido; depois de JOBS_MAX_ATTEMPTS execuções, fica como failed.
+    Returns: True se assumiu o job, False se o cliente está no limite (ou o
+    job está em execução em outro worker), None se o job não está mais
+    pendente (cancelado, já executado ou sem tentativas)
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=settings.JOBS_STALE_SECONDS)
+    with engine.begin() as conn:
+        job = conn.execute(
+            select(Job.client_id, Job.job_type, Job.params, Job.status, Job.attempts, Job.updated_at)
+            .where(Job.id == job_id)
+        ).first()
+        if job is None or job.status not in ACTIVE_JOB_STATUSES:
+            return None
+        if job.status == JobStatus.RUNNING and job.updated_at >= stale_before:
+            return False
+
+        exhausted = job.attempts >= settings.JOBS_MAX_ATTEMPTS
+        if exhausted:
+            conn.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(status=JobStatus.FAILED, error=f"Job interrompido {job.attempts} vezes",
+                        finished_at=now, updated_at=now)
+            )
+        else:
+            conn.execute(select(Client.id).where(Client.id == job.client_id).with_for_update())
+            # Órfãos (sem heartbeat há JOBS_STALE_SECONDS) não ocupam vaga
+            running = (
+                select(func.count()).select_from(Job)
+                .where(Job.client_id == job.client_id, Job.status == JobStatus.RUNNING,
+                       Job.updated_at >= stale_before, Job.id != job_id)
+                .scalar_subquery()
+            )
+            claimed = conn.execute(
+                update(Job)
+                .where(
+                    Job.id == job_id,
+                    or_(Job.status == JobStatus.QUEUED,
+                        and_(Job.status == JobStatus.RUNNING, Job.updated_at < stale_before)),
+                    running < settings.JOBS_MAX_RUNNING_PER_CLIENT
+                )
+                .values(status=JobStatus.RUNNING, attempts=Job.attempts + 1,
+                        started_at=func.coalesce(Job.started_at, now), updated_at=now)
+            ).rowcount
+
+    if exhausted:
+        _cleanup(job.job_type, job.params)
+        return None
+    return bool(claimed)
+
+
+def run_job(job_id: str) -> str:
+    """
+    Executa o job (chamado pela task do Celery).
+    Returns: succeeded, failed, cancelled, deferred (cliente no limite) ou skipped
+    """
+    claimed = claim_job(job_id)
+    if claimed is None:
+        return "skipped"
+    if not claimed:
+        return "deferred"
+
+    with engine.connect() as conn:
+        job = conn.execute(select(Job.job_type, Job.domain_id, Job.params).where(Job.id == job_id)).one()
+    params = job.params or {}
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, stop), name=f"job-heartbeat-{job_id}", daemon=True)
+    heartbeat.start()
+    try:
+        result = HANDLERS[job.job_type].run(JobContext(job_id), job.domain_id, **params)
+    except JobCancelled:
+        _finish(job_id, JobStatus.CANCELLED)
+        return "cancelled"
+    except Exception as e:
+        print(f"Job error ({job_id}, {job.job_type}): {e}")
+        _finish(job_id, JobStatus.FAILED, error=f"{e.__class__.__name__}: {e}")
+        return "failed"
+    finally:
+        stop.set()
+        heartbeat.join()
+        _cleanup(job.job_type, params)
+
+    _finish(job_id, JobStatus.SUCCEEDED, result=result)
+    return "succeeded"
+
+
+def _heartbeat(job_id: str, stop: threading.Event) -> None:
+    """
+    Mantém o job vivo para o claim_job (updated_at) até stop; só toca o job
+    enquanto está em running
+    """
+    while not stop.wait(max(settings.JOBS_PROGRESS_INTERVAL_SECONDS, 1.0)):
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JobStatus.RUNNING)
+                    .values(updated_at=datetime.utcnow())
+                )
+        except Exception as e:
+            print(f"Job heartbeat error ({job_id}): {e}")
+
+
+def _finish(job_id: str, status: JobStatus, result: Optional[Dict[str, Any]] = None,
+            error: Optional[str] = None) -> None:
+    now = datetime.utcnow()
+    values: Dict[str, Any] = {"status": status, "result": result, "error": error, "finished_at": now, "updated_at": now}
+    if status == JobStatus.SUCCEEDED:
+        values["progress_current"] = func.coalesce(Job.progress_total, Job.progress_current)
+    with engine.begin() as conn:
+        conn.execute(update(Job).where(Job.id == job_id).values(**values))
+
+
+def _cleanup(job_type: str, params: Optional[Dict[str, Any]]) -> None:
+    handler = HANDLERS.get(job_type)
+    if handler is None or handler.cleanup is None:
+        return
+    try:
+        handler.cleanup(**(params or {}))
+    except Exception as e:
+        print(f"Job cleanup error ({job_type}): {e}")
+
+
+# ============= HANDLERS =============
+
+def _remove_import_upload(path: str, upload_id: Optional[str] = None, **params) -> None:
+    # O checkpoint fica (é removido pelo import que termina) e a sessão de
+    # upload em partes também, para repetir o import com o mesmo upload_id
+    release_import_file(path, upload_id, done=False)
+
+
+@job_handler("semrush_import", cleanup=_remove_import_upload)
+def semrush_import_job(ctx: JobContext, domain_id: int, path: str, import_type: str,
+                       upload_id: Optional[str] = None) -> Dict[str, Any]:
+    def on_progress(read: int, size: int, rows: int) -> None:
+        ctx.progress(read, size, f"{rows} linhas lidas")
+
+    try:
+        result = import_semrush_csv(path, domain_id, import_type, on_progress=on_progress)
+    except JobCancelled:
+        # Os blocos já gravados ficam; o snapshot não recebeu o fechamento do import
+        domain_analytics.mark_stale(engine, domain_id)
+        raise
+    release_import_file(path, upload_id, done=result.success)
+    return result.model_dump()
+
+
+def _remove_batch_uploads(files: List[Dict[str, Any]], **params) -> None:
+    for file in files:
+        _remove_import_upload(file["path"])
+
+
+@job_handler("semrush_import_batch", cleanup=_remove_batch_uploads, parallel=True)
+def semrush_import_batch_job(ctx: JobContext, domain_id: Optional[int], files: List[Dict[str, Any]],
+                             import_type: str) -> Dict[str, Any]:
+    def on_progress(done: int, total: int, rows: int) -> None:
+        ctx.progress(done, total, f"{rows} linhas lidas")
+
+    try:
+        results = import_semrush_batch([(file["path"], file["domain_id"]) for file in files], import_type,
+                                       on_progress=on_progress)
+    except JobCancelled:
+        for target in {file["domain_id"] for file in files}:
+            domain_analytics.mark_stale(engine, target)
+        raise
+    for result, file in zip(results, files):
+        result.filename = file["filename"]
+    return {"results": [result.model_dump() for result in results]}
+
+
+@job_handler("crawl")
+def crawl_job(ctx: JobContext, domain_id: int, max_pages: Optional[int] = None,
+              full: bool = False) -> Dict[str, Any]:
+    processed = 0
+
+    def on_progress(crawler) -> None:
+        nonlocal processed
+        processed = crawler.processed
+        try:
+            ctx.progress(processed, crawler.stats["queued"], f"{crawler.stats['pages']} páginas processadas")
+        except JobCancelled:
+            crawler.stop()
+
+    stats = asyncio.run(crawl_domain(domain_id, max_pages, incremental=not full, on_progress=on_progress))
+    # Páginas já gravadas ficam; um cancelamento durante o crawl termina aqui
+    ctx.progress(processed if ctx.cancel_requested else stats["queued"], stats["queued"],
+                 f"{stats['pages']} páginas processadas", force=True)
+    return stats
+
+
+@job_handler("onpage_analyze", parallel=True)
+def onpage_analyze_job(ctx: JobContext, domain_id: int, pending_only: bool = False) -> Dict[str, Any]:
+    return analyze_domain_pages(domain_id, on_progress=lambda done, total: ctx.progress(done, total),
+                                pending_only=pending_only)
+
+
+@job_handler("analytics_recompute")
+def analytics_recompute_job(ctx: JobContext, domain_id: int) -> Dict[str, Any]:
+    started_at = time.perf_counter()
+    ctx.progress(0, 1, force=True)
+    with engine.begin() as conn:
+        domain_analytics.recompute(conn, domain_id)
+    return {"domain_id": domain_id, "duration_seconds": round(time.perf_counter() - started_at, 3)}
+
+
+@job_handler("enrichment_refresh")
+def enrichment_refresh_job(ctx: JobContext, domain_id: int, days: Optional[int] = None) -> Dict[str, Any]:
+    ctx.progress(0, 1, force=True)
+    return refresh_enrichment(domain_id, days)
@@ -0,0 +1,158 @@
+"""
+Upsert em lote de keywords.
+
+Cada linha recebe um fingerprint das métricas. Linhas cujo fingerprint já está
+gravado são puladas; as demais vão em um INSERT ... ON CONFLICT (domain_id,
+keyword) DO UPDATE, no Postgres e no SQLite.
+"""
+from datetime import datetime
+from typing import Dict, Any, List, Iterable, Optional
+import hashlib
+import json
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects import postgresql, sqlite
+from app.config import settings
+from app.database import engine
+from app.models.domain import Keyword
+
+
+KEYWORD_METRICS = ("search_volume", "keyword_difficulty", "cpc", "competition", "trend_data")
+
+
+def keyword_fingerprint(row: Dict[str, Any]) -> str:
+    """md5 das métricas da keyword (mesmos valores -> mesmo fingerprint)"""
+    trend_data = row.get("trend_data")
+    payload = repr((
+        row.get("search_volume"),
+        row.get("keyword_difficulty"),
+        row.get("cpc"),
+        row.get("competition"),
+        # json só quando há tendência (evita serializar à toa em lotes grandes)
+        json.dumps(trend_data, sort_keys=True) if trend_data is not None else None
+    ))
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def _insert(dialect_name: str):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return insert(Keyword.__table__)
+
+
+def _upsert_statement(dialect_name: str):
+    table = Keyword.__table__
+    stmt = _insert(dialect_name)
+    updated = KEYWORD_METRICS + ("fingerprint", "source", "last_updated")
+    return stmt.on_conflict_do_update(
+        index_elements=["domain_id", "keyword"],
+        set_={column: stmt.excluded[column] for column in updated},
+        # Corrida com outro upsert: não regrava se já chegou ao mesmo estado
+        where=table.c.fingerprint.is_distinct_from(stmt.excluded.fingerprint)
+    )
+
+
+def ensure_keyword_ids(
+    conn: Connection,
+    domain_id: int,
+    keywords: Iterable[str],
+    source: str = "manual"
+) -> Dict[str, int]:
+    """
+    ids das keywords do domínio, criando (sem métricas) as que ainda não existem
+    """
+    names = list(dict.fromkeys(keywords))
+    if not names:
+        return {}
+
+    def lookup(values: List[str]) -> Dict[str, int]:
+        return dict(conn.execute(
+            select(Keyword.keyword, Keyword.id).where(
+                Keyword.domain_id == domain_id,
+                Keyword.keyword.in_(values)
+            )
+        ).all())
+
+    ids = lookup(names)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        conn.execute(
+            _insert(conn.dialect.name).on_conflict_do_nothing(index_elements=["domain_id", "keyword"]),
+            [{"domain_id": domain_id, "keyword": name, "source": source} for name in missing]
+        )
+        ids.update(lookup(missing))
+    return ids
+
+
+def upsert_keyword_batch(
+    conn: Connection,
+    domain_id: int,
+    rows: List[Dict[str, Any]],
+    source: str = "manual"
+) -> Dict[str, int]:
+    """
+    Upsert de um lote de keywords de um domínio.
+    Keywords repetidas no lote: vale a última ocorrência.
+    Returns: contagens {rows, inserted, updated, unchanged}
+    """
+    now = datetime.utcnow()
+    latest: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        record = {
+            "keyword": row["keyword"],
+            "search_volume": row.get("search_volume") or 0,
+            "keyword_difficulty": float(row.get("keyword_difficulty") or 0.0),
+            "cpc": float(row.get("cpc") or 0.0),
+            "competition": row.get("competition"),
+            "trend_data": row.get("trend_data"),
+        }
+        record["fingerprint"] = keyword_fingerprint(record)
+        latest[record["keyword"]] = record
+
+    existing = dict(conn.execute(
+        select(Keyword.keyword, Keyword.fingerprint).where(
+            Keyword.domain_id == domain_id,
+            Keyword.keyword.in_(list(latest))
+        )
+    ).all()) if latest else {}
+
+    counts = {"rows": len(rows), "inserted": 0, "updated": 0, "unchanged": 0}
+    changed = []
+    for keyword, record in latest.items():
+        if keyword not in existing:
+            counts["inserted"] += 1
+        elif existing[keyword] == record["fingerprint"]:
+            counts["unchanged"] += 1
+            continue
+        else:
+            counts["updated"] += 1
+        changed.append({**record, "domain_id": domain_id, "source": source, "last_updated": now})
+
+    if changed:
+        conn.execute(_upsert_statement(conn.dialect.name), changed)
+    return counts
+
+
+def bulk_upsert_keywords(
+    domain_id: int,
+    rows: Iterable[Dict[str, Any]],
+    source: str = "manual",
+    batch_size: Optional[int] = None
+) -> List[Dict[str, int]]:
+    """
+    Upsert de keywords em lotes de KEYWORD_UPSERT_BATCH_SIZE, um por transação
+    (que também soma as keywords novas no snapshot de analytics).
+    Roda de forma síncrona (chamar fora do event loop).
+    Returns: contagens por lote
+    """
+    # Import local: domain_analytics -> ranking_store -> keywords
+    from app.services.domain_analytics import add_keywords
+
+    batch_size = batch_size or settings.KEYWORD_UPSERT_BATCH_SIZE
+    rows = list(rows)
+    batches = []
+    for number, start in enumerate(range(0, len(rows), batch_size), start=1):
+        with engine.begin() as conn:
+            counts = upsert_keyword_batch(conn, domain_id, rows[start:start + batch_size], source)
+            add_keywords(conn, domain_id, counts["inserted"])
+        batches.append({"batch": number, **counts})
+    return batches
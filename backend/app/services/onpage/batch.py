@@ -0,0 +1,128 @@
+"""
+Análise on-page em lote das páginas já gravadas.
+
+As páginas do domínio são lidas em blocos (keyset por id) e analisadas em um
+pool de processos; a gravação de issues/score fica em um único writer
+(executemany, uma transação curta por bloco). Domínios de um bloco só são
+analisados no próprio thread, sem o custo do pool.
+"""
+from collections import Counter, deque
+from typing import Dict, Any, List, Optional, Sequence, Iterator, Callable
+import os
+import time
+from sqlalchemy import select, update, bindparam, func
+from app.config import settings
+from app.core.pools import SharedPool
+from app.database import engine
+from app.models.domain import Page
+from app.services.crawler.pages import PAGE_FIELDS
+from app.services.onpage.rules import Rule, analyze
+
+
+# Campos lidos para as regras (validadores HTTP e resultado anterior ficam de fora)
+ANALYZED_COLUMNS = [
+    Page.__table__.c[name]
+    for name in ("id", "url") + PAGE_FIELDS
+    if name not in ("content_hash", "etag", "last_modified", "issues", "score")
+]
+
+def analysis_workers() -> int:
+    return settings.ONPAGE_ANALYSIS_WORKERS or os.cpu_count() or 1
+
+
+# Pool de processos compartilhado da análise em lote
+analysis_pool = SharedPool("onpage", workers=analysis_workers)
+
+
+def analyze_chunk(pages: List[Dict[str, Any]], rules: Optional[Sequence[Rule]] = None) -> List[Dict[str, Any]]:
+    """Roda nos processos do pool; Returns: parâmetros do UPDATE"""
+    results = []
+    for page in pages:
+        issues, score = analyze(page, rules)
+        results.append({"page_id": page["id"], "b_issues": issues, "b_score": score})
+    return results
+
+
+def _domain_pages(domain_id: int, pending_only: bool):
+    condition = Page.domain_id == domain_id
+    return condition & Page.score.is_(None) if pending_only else condition
+
+
+def _chunks(domain_id: int, chunk_size: int, pending_only: bool = False) -> Iterator[List[Dict[str, Any]]]:
+    last_id = 0
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(*ANALYZED_COLUMNS)
+                .where(_domain_pages(domain_id, pending_only), Page.id > last_id)
+                .order_by(Page.id)
+                .limit(chunk_size)
+            ).mappings().all()
+        if not rows:
+            return
+        last_id = rows[-1]["id"]
+        yield [dict(row) for row in rows]
+
+
+def analyze_domain_pages(domain_id: int, rules: Optional[Sequence[Rule]] = None,
+                         chunk_size: int = 1000,
+                         on_progress: Optional[Callable[[int, int], None]] = None,
+                         pending_only: bool = False) -> Dict[str, Any]:
+    """
+    Recalcula issues e score de todas as páginas do domínio (pending_only:
+    só das ainda sem análise, ex.: novas ou alteradas no último crawl).
+    rules: conjunto próprio de regras (padrão: RULES); precisam ser
+    serializáveis (funções de nível de módulo) para ir ao pool.
+    on_progress(páginas gravadas, total): chamado após cada bloco gravado;
+    uma exceção dele interrompe a análise (os blocos gravados ficam).
+    Roda de forma síncrona (chamar fora do event loop).
+    """
+    started_at = time.perf_counter()
+    stmt = (
+        update(Page.__table__)
+        .where(Page.__table__.c.id == bindparam("page_id"))
+        .values(issues=bindparam("b_issues"), score=bindparam("b_score"))
+    )
+    totals = {"pages": 0, "score_sum": 0}
+    issue_counts: Counter = Counter()
+    workers = 1
+
+    def write(results: List[Dict[str, Any]]) -> None:
+        with engine.begin() as conn:
+            conn.execute(stmt, results)
+        totals["pages"] += len(results)
+        totals["score_sum"] += sum(result["b_score"] for result in results)
+        issue_counts.update(issue["code"] for result in results for issue in result["b_issues"])
+        if on_progress:
+            on_progress(totals["pages"], total)
+
+    total = 0
+    if on_progress:
+        with engine.connect() as conn:
+            total = conn.scalar(select(func.count()).select_from(Page).where(_domain_pages(domain_id, pending_only)))
+
+    chunks = _chunks(domain_id, chunk_size, pending_only)
+    first = next(chunks, [])
+    if len(first) < chunk_size:
+        if first:
+            write(analyze_chunk(first, rules))
+    else:
+        workers = analysis_workers()
+        pool = analysis_pool
+        # Até 2 blocos por processo em andamento; o writer grava na ordem de envio
+        pending = deque([pool.submit(analyze_chunk, first, rules)])
+        for chunk in chunks:
+            pending.append(pool.submit(analyze_chunk, chunk, rules))
+            if len(pending) > 2 * workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+
+    return {
+        "domain_id": domain_id,
+        "pages": totals["pages"],
+        "avg_score": round(totals["score_sum"] / totals["pages"], 1) if totals["pages"] else None,
+        "issues": dict(issue_counts.most_common()),
+        "workers": workers,
+        "duration_seconds": round(time.perf_counter() - started_at, 3),
+    }
@@ -0,0 +1,204 @@
+"""
+Extração dos campos de Page e análise on-page em uma passada.
+
+O HTML é lido com o parser por eventos do lxml (HTMLPullParser): cada
+elemento é tratado nos eventos start/end e descartado em seguida, sem montar
+a árvore inteira. Os issues e o score saem das regras de
+app.services.onpage.rules aplicadas aos campos extraídos.
+
+parse_page é uma função pura e de nível de módulo: o crawler a executa em um
+pool de threads ou de processos, fora do event loop.
+"""
+from typing import Dict, Any, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlsplit
+import hashlib
+import json
+import math
+from lxml import etree
+from app.services.urls import normalize_url
+from app.services.onpage.rules import analyze
+
+
+SKIPPED_SCHEMES = ("mailto:", "javascript:", "tel:", "data:", "#")
+# Texto dessas tags não conta como conteúdo
+NON_CONTENT_TAGS = {"script", "style", "noscript", "template"}
+FEED_CHUNK_BYTES = 64 * 1024
+
+
+def site_host(netloc: str) -> str:
+    """Host para comparação de escopo (minúsculas, sem www.)"""
+    netloc = netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+
+def _words(text: Optional[str]) -> int:
+    return len(text.split()) if text else 0
+
+
+class _PageExtractor:
+    """Estado da passada única sobre os eventos do parser"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.host = site_host(urlsplit(url).netloc)
+        self.title: Optional[str] = None
+        self.h1: Optional[str] = None
+        self.meta: Dict[str, str] = {}
+        self.canonical: Optional[str] = None
+        self.schema_types: Set[str] = set()
+        self.word_count = 0
+        self.images = 0
+        self.images_without_alt = 0
+        self.internal: List[str] = []
+        self.external = 0
+        self.in_body = False
+        self.non_content_depth = 0
+        self.h1_depth = 0
+
+    def start(self, elem) -> None:
+        tag = elem.tag
+        if tag in NON_CONTENT_TAGS:
+            self.non_content_depth += 1
+        elif tag == "body":
+            self.in_body = True
+        elif tag == "meta":
+            name = (elem.get("name") or "").strip().lower()
+            if name and name not in self.meta:
+                self.meta[name] = (elem.get("content") or "").strip()
+        elif tag == "link":
+            if self.canonical is None and "canonical" in (elem.get("rel") or "").lower().split():
+                self.canonical = (elem.get("href") or "").strip() or None
+        elif tag == "img":
+            self.images += 1
+            if not (elem.get("alt") or "").strip():
+                self.images_without_alt += 1
+        elif tag == "a":
+            self.link(elem.get("href"))
+        elif tag == "h1":
+            self.h1_depth += 1
+
+        itemtype = elem.get("itemtype")
+        if itemtype:
+            for value in itemtype.split():
+                self.schema_types.add(value.rstrip("/").rsplit("/", 1)[-1])
+
+    def end(self, elem) -> None:
+        tag = elem.tag
+        if tag in NON_CONTENT_TAGS:
+            self.non_content_depth -= 1
+            if tag == "script" and (elem.get("type") or "").strip().lower() == "application/ld+json":
+                self.json_ld(elem.text)
+        elif self.in_body and not self.non_content_depth:
+            # Os tails dos filhos só ficam completos no end do pai
+            self.word_count += _words(elem.text) + sum(_words(child.tail) for child in elem)
+
+        if tag == "title" and self.title is None:
+            self.title = "".join(elem.itertext()).strip()[:500] or None
+        elif tag == "h1":
+            self.h1_depth -= 1
+            if self.h1 is None:
+                self.h1 = "".join(elem.itertext()).strip() or None
+
+        # Dentro do h1 os filhos ficam até o texto completo ser lido
+        if not self.h1_depth:
+            elem.clear(keep_tail=True)
+
+    def link(self, href: Optional[str]) -> None:
+        href = (href or "").strip()
+        if not href or href.lower().startswith(SKIPPED_SCHEMES):
+            return
+        link = urljoin(self.url, href)
+        parts = urlsplit(link)
+        if parts.scheme not in ("http", "https"):
+            return
+        if site_host(parts.netloc) == self.host:
+            self.internal.append(link)
+        else:
+            self.external += 1
+
+    def json_ld(self, text: Optional[str]) -> None:
+        """@type do JSON-LD (inclusive dentro de @graph)"""
+        def collect(node: Any) -> None:
+            if isinstance(node, list):
+                for item in node:
+                    collect(item)
+            elif isinstance(node, dict):
+                value = node.get("@type")
+                for type_ in value if isinstance(value, list) else [value]:
+                    if isinstance(type_, str):
+                        self.schema_types.add(type_)
+                collect(node.get("@graph"))
+
+        try:
+            collect(json.loads(text or ""))
+        except ValueError:
+            pass
+
+
+def parse_page(
+    url: str,
+    status_code: int,
+    body: bytes,
+    encoding: Optional[str] = None,
+    load_time_ms: Optional[int] = None,
+    x_robots_tag: Optional[str] = None,
+    content_hash: Optional[str] = None
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    content_hash: sha256 do body, quando já calculado pelo crawler
+    Returns: (campos de Page com issues e score, links internos absolutos para o frontier)
+    """
+    page: Dict[str, Any] = {
+        "url": url,
+        "status_code": status_code,
+        "load_time_ms": load_time_ms,
+        "page_size_kb": math.ceil(len(body) / 1024),
+        "content_hash": content_hash or hashlib.sha256(body).hexdigest(),
+        "is_indexable": 200 <= status_code < 300,
+        "word_count": 0,
+        "has_schema_markup": False,
+        "internal_links_count": 0,
+        "external_links_count": 0,
+        "images_count": 0,
+        "images_without_alt": 0,
+    }
+    extractor = _PageExtractor(url)
+    try:
+        parser = etree.HTMLPullParser(
+            events=("start", "end"), encoding=encoding, remove_comments=True, remove_pis=True
+        )
+        for offset in range(0, len(body), FEED_CHUNK_BYTES):
+            parser.feed(body[offset:offset + FEED_CHUNK_BYTES])
+            for event, elem in parser.read_events():
+                getattr(extractor, event)(elem)
+        parser.close()
+        for event, elem in parser.read_events():
+            getattr(extractor, event)(elem)
+    except (etree.LxmlError, ValueError, LookupError):
+        page["is_indexable"] = False
+        page["issues"], page["score"] = analyze(page)
+        return page, []
+
+    robots = extractor.meta.get("robots") or None
+    schema_types = sorted(extractor.schema_types)
+    page.update({
+        "title": extractor.title,
+        "meta_description": extractor.meta.get("description") or None,
+        "h1": extractor.h1,
+        "word_count": extractor.word_count,
+        "canonical_url": urljoin(url, extractor.canonical) if extractor.canonical else None,
+        "robots_meta": robots[:100] if robots else None,
+        "has_schema_markup": bool(schema_types),
+        "schema_types": schema_types or None,
+        "mobile_friendly": "viewport" in extractor.meta,
+        "images_count": extractor.images,
+        "images_without_alt": extractor.images_without_alt,
+        "internal_links_count": len(extractor.internal),
+        "external_links_count": extractor.external,
+    })
+
+    noindex = "noindex" in (robots or "").lower() or "noindex" in (x_robots_tag or "").lower()
+    canonical_elsewhere = page["canonical_url"] and normalize_url(page["canonical_url"]) != normalize_url(url)
+    page["is_indexable"] = page["is_indexable"] and not noindex and not canonical_elsewhere
+    page["issues"], page["score"] = analyze(page)
+    return page, extractor.internal
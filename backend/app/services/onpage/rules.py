@@ -0,0 +1,144 @@
+"""
+Regras da análise on-page.
+
+Cada regra recebe os campos de Page de uma página (dict) e devolve a mensagem
+do problema, ou None. As regras usam só campos gravados em Page, então a
+mesma análise roda no crawl e sobre páginas já gravadas.
+
+Regras novas entram no registro com o decorator @rule; um conjunto próprio
+pode ser passado para analyze(page, rules). Para a análise em lote (pool de
+processos) as funções precisam ser de nível de módulo.
+"""
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Callable, Sequence, Tuple
+from app.config import settings
+
+
+Check = Callable[[Dict[str, Any]], Optional[str]]
+
+
+@dataclass(frozen=True)
+class Rule:
+    code: str
+    severity: str  # critical, warning, notice
+    weight: int  # pontos descontados do score (0-100)
+    check: Check
+
+
+RULES: List[Rule] = []
+
+
+def rule(code: str, severity: str, weight: int) -> Callable[[Check], Check]:
+    """Registra a função como regra padrão"""
+    def register(check: Check) -> Check:
+        RULES.append(Rule(code, severity, weight, check))
+        return check
+    return register
+
+
+def analyze(page: Dict[str, Any], rules: Optional[Sequence[Rule]] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Returns: (issues, score); score = 100 - pesos das regras violadas (mínimo 0)
+    """
+    issues = []
+    penalty = 0
+    for item in RULES if rules is None else rules:
+        message = item.check(page)
+        if message:
+            issues.append({"code": item.code, "severity": item.severity, "message": message})
+            penalty += item.weight
+    return issues, max(0, 100 - penalty)
+
+
+# ============= REGRAS PADRÃO =============
+
+@rule("http_error", "critical", 30)
+def http_error(page: Dict[str, Any]) -> Optional[str]:
+    status_code = page.get("status_code")
+    if status_code and status_code >= 400:
+        return f"Página respondeu HTTP {status_code}"
+    return None
+
+
+@rule("not_indexable", "critical", 20)
+def not_indexable(page: Dict[str, Any]) -> Optional[str]:
+    if page.get("is_indexable") is False:
+        return "Página não indexável (noindex, erro ou canonical para outra URL)"
+    return None
+
+
+@rule("missing_title", "critical", 15)
+def missing_title(page: Dict[str, Any]) -> Optional[str]:
+    return None if page.get("title") else "Página sem <title>"
+
+
+@rule("title_length", "notice", 3)
+def title_length(page: Dict[str, Any]) -> Optional[str]:
+    title = page.get("title")
+    if title and not 10 <= len(title) <= 60:
+        return f"Title com {len(title)} caracteres (recomendado: 10-60)"
+    return None
+
+
+@rule("missing_meta_description", "warning", 8)
+def missing_meta_description(page: Dict[str, Any]) -> Optional[str]:
+    return None if page.get("meta_description") else "Página sem meta description"
+
+
+@rule("meta_description_length", "notice", 2)
+def meta_description_length(page: Dict[str, Any]) -> Optional[str]:
+    description = page.get("meta_description")
+    if description and not 50 <= len(description) <= 160:
+        return f"Meta description com {len(description)} caracteres (recomendado: 50-160)"
+    return None
+
+
+@rule("missing_h1", "warning", 8)
+def missing_h1(page: Dict[str, Any]) -> Optional[str]:
+    return None if page.get("h1") else "Página sem <h1>"
+
+
+@rule("missing_canonical", "notice", 3)
+def missing_canonical(page: Dict[str, Any]) -> Optional[str]:
+    return None if page.get("canonical_url") else "Página sem link canonical"
+
+
+@rule("thin_content", "warning", 8)
+def thin_content(page: Dict[str, Any]) -> Optional[str]:
+    words = page.get("word_count") or 0
+    if words < settings.ONPAGE_THIN_CONTENT_WORDS:
+        return f"Conteúdo fino: {words} palavras (mínimo: {settings.ONPAGE_THIN_CONTENT_WORDS})"
+    return None
+
+
+@rule("images_without_alt", "warning", 5)
+def images_without_alt(page: Dict[str, Any]) -> Optional[str]:
+    missing = page.get("images_without_alt") or 0
+    if missing:
+        return f"{missing} de {page.get('images_count') or missing} imagens sem alt"
+    return None
+
+
+@rule("not_mobile_friendly", "warning", 8)
+def not_mobile_friendly(page: Dict[str, Any]) -> Optional[str]:
+    if page.get("mobile_friendly") is False:
+        return "Página sem meta viewport"
+    return None
+
+
+@rule("missing_schema_markup", "notice", 2)
+def missing_schema_markup(page: Dict[str, Any]) -> Optional[str]:
+    return None if page.get("has_schema_markup") else "Página sem dados estruturados"
+
+
+@rule("slow_page", "warning", 5)
+def slow_page(page: Dict[str, Any]) -> Optional[str]:
+    load_time = page.get("load_time_ms")
+    if load_time and load_time > settings.ONPAGE_SLOW_PAGE_MS:
+        return f"Carregamento em {load_time} ms (limite: {settings.ONPAGE_SLOW_PAGE_MS} ms)"
+    return None
+
+
+@rule("no_internal_links", "notice", 3)
+def no_internal_links(page: Dict[str, Any]) -> Optional[str]:
+    return None if page.get("internal_links_count") else "Página sem links internos"
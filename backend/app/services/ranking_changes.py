@@ -0,0 +1,167 @@
+"""
+Detecção de mudanças de ranking em lote.
+
+Uma única consulta com window functions traz, por keyword (e search engine,
+location, device), a observação mais recente e a anterior; as variações e os
+alertas são calculados com NumPy para todas as keywords de uma vez.
+Posição 0 significa fora do ranking.
+"""
+from datetime import datetime
+from typing import Optional, List, Sequence
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, update, func
+from sqlalchemy.engine import Connection
+from app.models.domain import Ranking
+
+
+ALERT_TYPES = ("gain", "loss", "stable")
+
+PARTITION = (Ranking.keyword, Ranking.search_engine, Ranking.location, Ranking.device)
+
+
+def _latest_pairs(domain_id: int, since: Optional[datetime] = None):
+    """
+    Subquery estreita (id + posição/data anteriores via lead); rn = 1 é a
+    observação mais recente de cada keyword. As demais colunas vêm de um join
+    pelo id, o que deixa a window function bem mais leve.
+    """
+    window = {
+        "partition_by": PARTITION,
+        "order_by": (Ranking.checked_at.desc(), Ranking.id.desc())
+    }
+    query = select(
+        Ranking.id,
+        func.row_number().over(**window).label("rn"),
+        func.lead(Ranking.position).over(**window).label("prev_position"),
+        func.lead(Ranking.checked_at, type_=Ranking.checked_at.type).over(**window).label("prev_checked_at"),
+    ).where(Ranking.domain_id == domain_id)
+    if since:
+        query = query.where(Ranking.checked_at >= since)
+    return query.subquery()
+
+
+def load_latest(
+    conn: Connection,
+    domain_id: int,
+    since: Optional[datetime] = None,
+    only_pairs: bool = True
+) -> pd.DataFrame:
+    """
+    Última observação de cada keyword com a anterior.
+    only_pairs: deixa de fora as keywords com uma só observação
+    (com False, prev_position vem nulo para elas)
+    """
+    pairs = _latest_pairs(domain_id, since)
+    query = (
+        select(
+            Ranking.id,
+            Ranking.keyword_id,
+            Ranking.keyword,
+            Ranking.search_engine,
+            Ranking.location,
+            Ranking.device,
+            Ranking.url,
+            Ranking.position,
+            Ranking.checked_at,
+            pairs.c.prev_position,
+            pairs.c.prev_checked_at,
+        )
+        .join(pairs, pairs.c.id == Ranking.id)
+        .where(pairs.c.rn == 1)
+    )
+    if only_pairs:
+        query = query.where(pairs.c.prev_position.isnot(None))
+    result = conn.execute(query)
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+def compute_changes(df: pd.DataFrame, threshold: int = 1) -> pd.DataFrame:
+    """
+    Calcula change (positivo = subiu), change_percent e alert_type.
+    Entrar no ranking (0 -> N) é gain e sair (N -> 0) é loss, com change 0.
+    """
+    current = df["position"].to_numpy(dtype=np.int64)
+    previous = df["prev_position"].to_numpy(dtype=np.int64)
+    ranked = (current > 0) & (previous > 0)
+
+    change = np.where(ranked, previous - current, 0)
+    percent = np.full(len(df), np.nan)
+    np.divide(change * 100.0, previous, out=percent, where=ranked)
+
+    gain = (ranked & (change >= threshold)) | ((previous == 0) & (current > 0))
+    loss = (ranked & (change <= -threshold)) | ((current == 0) & (previous > 0))
+
+    return df.assign(
+        current_position=current,
+        previous_position=previous,
+        change=change,
+        change_percent=np.round(percent, 2),
+        alert_type=np.select([gain, loss], ["gain", "loss"], default="stable")
+    )
+
+
+def ranking_changes(
+    conn: Connection,
+    domain_id: int,
+    threshold: int = 1,
+    alert_types: Optional[Sequence[str]] = None,
+    max_position: Optional[int] = None,
+    since: Optional[datetime] = None,
+    limit: int = 1000
+) -> List[dict]:
+    """
+    Mudanças de todas as keywords do domínio, maiores variações primeiro
+    """
+    df = load_latest(conn, domain_id, since)
+    if df.empty:
+        return []
+    df = compute_changes(df, threshold)
+
+    if alert_types:
+        df = df[df["alert_type"].isin(alert_types)]
+    if max_position:
+        # Só keywords que estão (ou estavam) no top N
+        top = ((df["current_position"] > 0) & (df["current_position"] <= max_position)) | \
+              ((df["previous_position"] > 0) & (df["previous_position"] <= max_position))
+        df = df[top]
+
+    return change_records(df, limit)
+
+
+def change_records(df: pd.DataFrame, limit: int) -> List[dict]:
+    """Linhas de compute_changes -> dicts (RankingChange), maiores variações primeiro"""
+    order = np.argsort(-np.abs(df["change"].to_numpy()), kind="stable")[:limit]
+    df = df.iloc[order]
+
+    columns = [
+        "keyword", "keyword_id", "current_position", "previous_position", "change",
+        "change_percent", "alert_type", "url", "search_engine", "location", "device"
+    ]
+    values = {column: df[column].tolist() for column in columns}
+    values["checked_at"] = df["checked_at"].tolist()
+    values["previous_checked_at"] = df["prev_checked_at"].tolist()
+    # NaN -> None (keywords sem keyword_id, variação percentual indefinida)
+    for column in ("keyword_id", "change_percent"):
+        values[column] = [None if v != v else v for v in values[column]]
+    return [dict(zip(values, row)) for row in zip(*values.values())]
+
+
+def update_previous_positions(conn: Connection, domain_id: int) -> int:
+    """
+    Grava em lote (um UPDATE ... FROM) a posição anterior na observação mais
+    recente de cada keyword; só altera linhas cujo valor mudou.
+    Returns: linhas atualizadas
+    """
+    pairs = _latest_pairs(domain_id)
+    result = conn.execute(
+        update(Ranking)
+        .where(
+            Ranking.id == pairs.c.id,
+            pairs.c.rn == 1,
+            pairs.c.prev_position.isnot(None),
+            Ranking.previous_position.is_distinct_from(pairs.c.prev_position)
+        )
+        .values(previous_position=pairs.c.prev_position)
+    )
+    return result.rowcount
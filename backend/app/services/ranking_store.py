@@ -0,0 +1,516 @@
+"""
+Armazenamento do histórico de rankings (série temporal).
+
+Os pontos ficam em ranking_points, particionada por mês: partições nativas
+(RANGE em checked_at) no Postgres e tabelas mensais ranking_points_AAAA_MM no
+SQLite. Os textos repetidos em todo ponto (search engine, location, device,
+source e url) são codificados em ids de ranking_dimensions. Meses antigos são
+compactados em resumos semanais e mensais (ranking_summaries) e a partição
+inteira é descartada.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple
+import hashlib
+import re
+import threading
+from sqlalchemy import MetaData, Table, select, delete, text, case, func
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.domain import Ranking
+from app.models.ranking_history import RankingDimension, RankingPoint, RankingSummary
+from app.services.keywords import ensure_keyword_ids
+
+
+# Campo do ponto -> coluna com o id no dicionário
+DIMENSIONS = {
+    "search_engine": "engine_id",
+    "location": "location_id",
+    "device": "device_id",
+    "source": "source_id",
+    "url": "url_id",
+}
+# Dimensões que fazem parte da chave não podem ficar vazias
+DEFAULT_DIMENSIONS = {"search_engine": "google", "location": "global", "device": "desktop"}
+
+GRANULARITIES = ("raw", "week", "month")
+SUMMARY_GRANULARITIES = ("week", "month")
+POINT_KEY = ("domain_id", "keyword_id", "checked_at", "engine_id", "location_id", "device_id")
+SUMMARY_KEY = ("domain_id", "keyword_id", "granularity", "bucket_start", "engine_id", "location_id", "device_id")
+SUMMARY_VALUES = (
+    "samples", "position_sum", "best_position", "worst_position",
+    "last_position", "last_checked_at", "traffic_sum"
+)
+
+_PARTITION_RE = re.compile(r"^ranking_points_(\d{4})_(\d{2})$")
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value: datetime) -> datetime:
+    return (month_start(value) + timedelta(days=32)).replace(day=1)
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    """Início da semana (segunda-feira) ou do mês que contém `value`"""
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return value
+
+
+def partition_name(month: datetime) -> str:
+    return f"ranking_points_{month:%Y_%m}"
+
+
+def _insert(dialect_name: str, table: Table):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return insert(table)
+
+
+def _merge(totals: Dict[tuple, list], key: tuple, values: list) -> None:
+    """Soma um agregado (na ordem de SUMMARY_VALUES) ao total do bucket"""
+    total = totals.get(key)
+    if total is None:
+        totals[key] = list(values)
+        return
+    total[0] += values[0]
+    total[1] += values[1]
+    total[2] = min(total[2], values[2])
+    total[3] = max(total[3], values[3])
+    if values[5] >= total[5]:
+        total[4], total[5] = values[4], values[5]
+    total[6] += values[6]
+
+
+def aggregate_points(points: Iterable[Dict[str, Any]], totals: Optional[Dict[tuple, list]] = None,
+                     granularities: Tuple[str, ...] = SUMMARY_GRANULARITIES) -> Dict[tuple, list]:
+    """Agrega pontos em buckets semanais/mensais (chave na ordem de SUMMARY_KEY)"""
+    totals = {} if totals is None else totals
+    for point in points:
+        position = point["position"]
+        values = [1, position, position, position, position, point["checked_at"], point["estimated_traffic"] or 0.0]
+        for granularity in granularities:
+            key = (
+                point["domain_id"], point["keyword_id"], granularity,
+                bucket_start(point["checked_at"], granularity),
+                point["engine_id"], point["location_id"], point["device_id"]
+            )
+            _merge(totals, key, values)
+    return totals
+
+
+class DimensionDictionary:
+    """
+    Codifica os textos das dimensões em ids, com cache por processo.
+
+    Só vão para o cache ids lidos do banco antes do INSERT (já gravados);
+    ids criados agora são cacheados na próxima leitura, então um rollback não
+    deixa id inválido no cache. Use um encode por tipo em cada transação.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._values: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def value_hash(value: str) -> str:
+        return hashlib.md5(value.encode()).hexdigest()
+
+    def _remember(self, kind: str, ids: Dict[str, int]) -> None:
+        with self._lock:
+            if len(self._ids) + len(ids) > self.max_entries:
+                self._ids.clear()
+                self._values.clear()
+            for value, id_ in ids.items():
+                self._ids[(kind, value)] = id_
+                self._values[id_] = value
+
+    def _lookup(self, conn: Connection, kind: str, values: List[str]) -> Dict[str, int]:
+        hashes = {self.value_hash(value): value for value in values}
+        rows = conn.execute(
+            select(RankingDimension.value_hash, RankingDimension.id).where(
+                RankingDimension.kind == kind,
+                RankingDimension.value_hash.in_(list(hashes))
+            )
+        )
+        return {hashes[value_hash]: id_ for value_hash, id_ in rows}
+
+    def encode(self, conn: Connection, kind: str, values: Iterable[str]) -> Dict[str, int]:
+        """Ids dos valores, criando os que ainda não existem"""
+        values = set(values)
+        with self._lock:
+            ids = {v: self._ids[(kind, v)] for v in values if (kind, v) in self._ids}
+        missing = [v for v in values if v not in ids]
+        if not missing:
+            return ids
+
+        found = self._lookup(conn, kind, missing)
+        self._remember(kind, found)
+        ids.update(found)
+
+        new = [v for v in missing if v not in found]
+        if new:
+            conn.execute(
+                _insert(conn.dialect.name, RankingDimension.__table__)
+                .on_conflict_do_nothing(index_elements=["kind", "value_hash"]),
+                [{"kind": kind, "value": v, "value_hash": self.value_hash(v)} for v in new]
+            )
+            ids.update(self._lookup(conn, kind, new))
+        return ids
+
+    def decode(self, conn: Connection, ids: Iterable[Optional[int]]) -> Dict[int, str]:
+        """Textos dos ids informados"""
+        ids = {id_ for id_ in ids if id_ is not None}
+        with self._lock:
+            values = {id_: self._values[id_] for id_ in ids if id_ in self._values}
+        missing = [id_ for id_ in ids if id_ not in values]
+        if missing:
+            rows = conn.execute(
+                select(RankingDimension.id, RankingDimension.kind, RankingDimension.value)
+                .where(RankingDimension.id.in_(missing))
+            ).all()
+            for id_, kind, value in rows:
+                self._remember(kind, {value: id_})
+                values[id_] = value
+        return values
+
+
+class RankingStore:
+    """
+    Escrita, consulta por intervalo e compactação do histórico de rankings
+    """
+
+    def __init__(self, dimensions: DimensionDictionary):
+        self.dimensions = dimensions
+        self._shards = MetaData()
+        self._lock = threading.Lock()
+
+    # ============= PARTIÇÕES =============
+
+    def _partition_table(self, name: str) -> Table:
+        """Table de uma partição/tabela mensal (mesmas colunas de ranking_points)"""
+        with self._lock:
+            table = self._shards.tables.get(name)
+            if table is None:
+                table = RankingPoint.__table__.to_metadata(self._shards, name=name)
+            return table
+
+    def ensure_partition(self, conn: Connection, month: datetime) -> Table:
+        """
+        Cria a partição do mês se ainda não existir.
+        Returns: tabela onde inserir (no Postgres, a tabela pai roteia)
+        """
+        name = partition_name(month)
+        if conn.dialect.name == "postgresql":
+            if conn.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is None:
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF ranking_points "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+                ))
+            return RankingPoint.__table__
+        table = self._partition_table(name)
+        table.create(conn, checkfirst=True)
+        return table
+
+    def partitions(self, conn: Connection) -> List[Tuple[datetime, str]]:
+        """Partições existentes, em ordem cronológica"""
+        if conn.dialect.name == "postgresql":
+            names = conn.scalars(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = 'ranking_points'"
+            ))
+        else:
+            names = conn.scalars(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'ranking_points_%'"
+            ))
+        result = []
+        for name in names:
+            match = _PARTITION_RE.match(name)
+            if match:
+                result.append((datetime(int(match[1]), int(match[2]), 1), name))
+        return sorted(result)
+
+    def _sources(self, conn: Connection, start: datetime, end: datetime) -> List[Table]:
+        """Tabelas que cobrem [start, end)"""
+        if conn.dialect.name == "postgresql":
+            # O planner descarta as partições fora do intervalo de checked_at
+            return [RankingPoint.__table__]
+        return [
+            self._partition_table(name)
+            for month, name in self.partitions(conn)
+            if month < end and next_month(month) > start
+        ]
+
+    # ============= ESCRITA =============
+
+    def write_points(self, conn: Connection, domain_id: int, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Grava pontos de ranking de um domínio.
+        Cada linha: keyword_id, checked_at, position, estimated_traffic e as
+        dimensões em texto (search_engine, location, device, source, url).
+        Um ponto com a mesma chave sobrescreve o anterior.
+        Returns: número de pontos gravados
+        """
+        rows = [row for row in rows if row.get("keyword_id") is not None]
+        if not rows:
+            return 0
+
+        encoded = {}
+        for field in DIMENSIONS:
+            default = DEFAULT_DIMENSIONS.get(field)
+            values = {row.get(field) or default for row in rows} - {None}
+            encoded[field] = self.dimensions.encode(conn, field, values) if values else {}
+
+        points: Dict[tuple, Dict[str, Any]] = {}
+        for row in rows:
+            point = {
+                "domain_id": domain_id,
+                "keyword_id": row["keyword_id"],
+                "checked_at": row["checked_at"],
+                "position": row["position"],
+                "estimated_traffic": row.get("estimated_traffic") or 0.0,
+            }
+            for field, column in DIMENSIONS.items():
+                value = row.get(field) or DEFAULT_DIMENSIONS.get(field)
+                point[column] = encoded[field].get(value) if value is not None else None
+            # Repetidos no mesmo lote: vale o último (ON CONFLICT não aceita a mesma chave duas vezes)
+            points[tuple(point[column] for column in POINT_KEY)] = point
+
+        by_month: Dict[datetime, List[Dict[str, Any]]] = {}
+        for point in points.values():
+            by_month.setdefault(month_start(point["checked_at"]), []).append(point)
+
+        for month, batch in sorted(by_month.items()):
+            table = self.ensure_partition(conn, month)
+            stmt = _insert(conn.dialect.name, table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(POINT_KEY),
+                set_={c: stmt.excluded[c] for c in ("source_id", "url_id", "position", "estimated_traffic")}
+            )
+            conn.execute(stmt, batch)
+        return len(points)
+
+    def backfill_from_rankings(self, engine: Engine, domain_id: Optional[int] = None, chunk_size: int = 5000) -> int:
+        """
+        Copia a tabela rankings para o histórico (paginado por id, um lote por transação).
+        Rodar antes da primeira compactação: meses já compactados seriam contados duas vezes.
+        """
+        last_id, total = 0, 0
+        while True:
+            with engine.begin() as conn:
+                query = select(
+                    Ranking.id, Ranking.domain_id, Ranking.keyword, Ranking.keyword_id,
+                    Ranking.position, Ranking.estimated_traffic, Ranking.url,
+                    Ranking.search_engine, Ranking.location, Ranking.device,
+                    Ranking.source, Ranking.checked_at
+                ).where(Ranking.id > last_id).order_by(Ranking.id).limit(chunk_size)
+                if domain_id is not None:
+                    query = query.where(Ranking.domain_id == domain_id)
+                rows = [dict(row) for row in conn.execute(query).mappings()]
+                if not rows:
+                    return total
+                last_id = rows[-1]["id"]
+
+                by_domain: Dict[int, List[Dict[str, Any]]] = {}
+                for row in rows:
+                    by_domain.setdefault(row["domain_id"], []).append(row)
+                for domain, group in by_domain.items():
+                    missing = [row["keyword"] for row in group if row["keyword_id"] is None]
+                    if missing:
+                        ids = ensure_keyword_ids(conn, domain, missing)
+                        for row in group:
+                            row["keyword_id"] = row["keyword_id"] or ids.get(row["keyword"])
+                    total += self.write_points(conn, domain, group)
+
+    # ============= CONSULTA =============
+
+    def points(self, conn: Connection, domain_id: int, keyword_ids: List[int],
+               start: datetime, end: datetime) -> Iterator[Dict[str, Any]]:
+        """Pontos de [start, end) em ordem cronológica"""
+        for table in self._sources(conn, start, end):
+            query = select(table).where(
+                table.c.domain_id == domain_id,
+                table.c.keyword_id.in_(keyword_ids),
+                table.c.checked_at >= start,
+                table.c.checked_at < end
+            ).order_by(table.c.checked_at, table.c.keyword_id)
+            yield from conn.execute(query).mappings()
+
+    def daily_traffic(self, conn: Connection, domain_id: int,
+                      start: datetime, end: datetime) -> Dict[str, Dict[str, float]]:
+        """
+        Tráfego estimado e keywords rankeadas por dia em [start, end),
+        agregados no banco: {"AAAA-MM-DD": {"traffic": ..., "keywords": ...}}
+        """
+        days: Dict[str, Dict[str, float]] = {}
+        for table in self._sources(conn, start, end):
+            day = func.date(table.c.checked_at)
+            query = select(
+                day,
+                func.coalesce(func.sum(table.c.estimated_traffic), 0.0),
+                func.count(func.distinct(case((table.c.position > 0, table.c.keyword_id))))
+            ).where(
+                table.c.domain_id == domain_id,
+                table.c.checked_at >= start,
+                table.c.checked_at < end
+            ).group_by(day)
+            for value, traffic, keywords in conn.execute(query):
+                # date no Postgres, texto no SQLite
+                total = days.setdefault(str(value)[:10], {"traffic": 0.0, "keywords": 0})
+                total["traffic"] += float(traffic)
+                total["keywords"] += keywords
+        return days
+
+    def history(self, conn: Connection, domain_id: int, keyword_ids: List[int],
+                start: datetime, end: datetime, granularity: str = "raw") -> List[Dict[str, Any]]:
+        """
+        Série de [start, end).
+        raw: pontos ainda não compactados.
+        week/month: resumos compactados + agregação na hora dos pontos recentes.
+        """
+        if granularity == "raw":
+            points = list(self.points(conn, domain_id, keyword_ids, start, end))
+            names = self.dimensions.decode(conn, (
+                point[column] for point in points for column in DIMENSIONS.values()
+            ))
+            return [
+                {
+                    "keyword_id": point["keyword_id"],
+                    "granularity": "raw",
+                    "checked_at": point["checked_at"],
+                    "search_engine": names.get(point["engine_id"]),
+                    "location": names.get(point["location_id"]),
+                    "device": names.get(point["device_id"]),
+                    "source": names.get(point["source_id"]),
+                    "url": names.get(point["url_id"]),
+                    "position": point["position"],
+                    "best_position": point["position"],
+                    "worst_position": point["position"],
+                    "last_position": point["position"],
+                    "samples": 1,
+                    "estimated_traffic": point["estimated_traffic"] or 0.0,
+                }
+                for point in points
+            ]
+
+        start = bucket_start(start, granularity)
+        totals: Dict[tuple, list] = {}
+        summaries = conn.execute(select(RankingSummary).where(
+            RankingSummary.domain_id == domain_id,
+            RankingSummary.keyword_id.in_(keyword_ids),
+            RankingSummary.granularity == granularity,
+            RankingSummary.bucket_start >= start,
+            RankingSummary.bucket_start < end
+        )).mappings()
+        for summary in summaries:
+            _merge(
+                totals,
+                tuple(summary[column] for column in SUMMARY_KEY),
+                [summary[column] for column in SUMMARY_VALUES]
+            )
+        aggregate_points(self.points(conn, domain_id, keyword_ids, start, end), totals, (granularity,))
+
+        names = self.dimensions.decode(conn, (
+            id_ for key in totals for id_ in key[4:]
+        ))
+        result = []
+        for key, values in sorted(totals.items(), key=lambda item: (item[0][3], item[0][1])):
+            samples, position_sum, best, worst, last, _, traffic_sum = values
+            result.append({
+                "keyword_id": key[1],
+                "granularity": granularity,
+                "checked_at": key[3],
+                "search_engine": names.get(key[4]),
+                "location": names.get(key[5]),
+                "device": names.get(key[6]),
+                "position": round(position_sum / samples, 2),
+                "best_position": best,
+                "worst_position": worst,
+                "last_position": last,
+                "samples": samples,
+                "estimated_traffic": round(traffic_sum / samples, 2),
+            })
+        return result
+
+    # ============= COMPACTAÇÃO =============
+
+    @staticmethod
+    def _summary_upsert(dialect_name: str):
+        table = RankingSummary.__table__
+        stmt = _insert(dialect_name, table)
+        excluded = stmt.excluded
+        newer = excluded.last_checked_at >= table.c.last_checked_at
+        return stmt.on_conflict_do_update(
+            index_elements=list(SUMMARY_KEY),
+            set_={
+                # Semanas que cruzam a virada do mês recebem duas partições
+                "samples": table.c.samples + excluded.samples,
+                "position_sum": table.c.position_sum + excluded.position_sum,
+                "traffic_sum": table.c.traffic_sum + excluded.traffic_sum,
+                "best_position": case(
+                    (excluded.best_position < table.c.best_position, excluded.best_position),
+                    else_=table.c.best_position
+                ),
+                "worst_position": case(
+                    (excluded.worst_position > table.c.worst_position, excluded.worst_position),
+                    else_=table.c.worst_position
+                ),
+                "last_position": case((newer, excluded.last_position), else_=table.c.last_position),
+                "last_checked_at": case((newer, excluded.last_checked_at), else_=table.c.last_checked_at),
+            }
+        )
+
+    def compact(self, engine: Engine, before: datetime, weekly_before: Optional[datetime] = None,
+                chunk_size: int = 10000) -> Dict[str, int]:
+        """
+        Compacta as partições de meses inteiramente anteriores a `before` em
+        resumos semanais e mensais e descarta a partição (uma transação por mês).
+        Resumos semanais anteriores a `weekly_before` são apagados (os mensais ficam).
+        """
+        stats = {"partitions": 0, "points": 0, "summaries": 0, "weekly_removed": 0}
+        cutoff = month_start(before)
+        with engine.connect() as conn:
+            months = [name for month, name in self.partitions(conn) if next_month(month) <= cutoff]
+
+        for name in months:
+            with engine.begin() as conn:
+                if conn.dialect.name == "postgresql":
+                    # Um compactador por vez entre workers
+                    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('ranking_compaction'))"))
+                if name not in {n for _, n in self.partitions(conn)}:
+                    continue
+
+                table = self._partition_table(name)
+                totals: Dict[tuple, list] = {}
+                result = conn.execution_options(yield_per=chunk_size).execute(select(table))
+                for partition in result.mappings().partitions():
+                    stats["points"] += len(partition)
+                    aggregate_points(partition, totals)
+
+                if totals:
+                    conn.execute(self._summary_upsert(conn.dialect.name), [
+                        {**dict(zip(SUMMARY_KEY, key)), **dict(zip(SUMMARY_VALUES, values))}
+                        for key, values in totals.items()
+                    ])
+                table.drop(conn)
+                stats["partitions"] += 1
+                stats["summaries"] += len(totals)
+
+        if weekly_before:
+            with engine.begin() as conn:
+                stats["weekly_removed"] = conn.execute(delete(RankingSummary).where(
+                    RankingSummary.granularity == "week",
+                    RankingSummary.bucket_start < bucket_start(weekly_before, "week")
+                )).rowcount
+        return stats
+
+
+ranking_store = RankingStore(DimensionDictionary())
@@ -0,0 +1,275 @@
+"""
+Gravação de uploads em disco.
+
+O arquivo é copiado em blocos para UPLOAD_DIR, sem ser lido inteiro para a
+memória, e o limite MAX_UPLOAD_SIZE_MB é verificado durante a cópia.
+
+Arquivos maiores vão em partes por uma sessão de upload (UploadSession): cada
+parte é anexada ao arquivo da sessão no offset informado pelo cliente, que é
+sempre o tamanho já gravado; se a conexão cair, o cliente consulta o offset e
+continua dali. A sessão completa é importada pelo upload_id e só é removida
+quando o import termina: um import interrompido é repetido com o mesmo
+upload_id e continua do checkpoint.
+"""
+from fastapi import HTTPException, UploadFile, status
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+from uuid import uuid4
+import asyncio
+import fcntl
+import os
+from sqlalchemy import select, insert, update, delete
+from app.config import settings
+from app.database import engine
+from app.models.upload import UploadSession, ImportCheckpoint
+
+
+UPLOAD_READ_SIZE = 1024 * 1024
+
+
+async def save_upload(file: UploadFile, prefix: str = "upload") -> str:
+    """
+    Copia o upload para UPLOAD_DIR em blocos de 1 MB.
+    Levanta 413 se o arquivo passar de MAX_UPLOAD_SIZE_MB.
+    Returns: caminho do arquivo gravado (o chamador remove depois de usar)
+    """
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    path = os.path.join(settings.UPLOAD_DIR, f"{prefix}_{uuid4().hex}{suffix}")
+    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_READ_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Arquivo maior que {settings.MAX_UPLOAD_SIZE_MB} MB"
+                    )
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        remove_upload(path)
+        raise
+    return path
+
+
+async def save_batch_uploads(files: Sequence[UploadFile], domain_ids: Sequence[int],
+                             prefix: str = "upload") -> List[Tuple[str, int]]:
+    """
+    Grava os arquivos de um import em lote e associa cada um ao seu domínio
+    (um domain_id para todos ou um por arquivo, na ordem).
+    Levanta 400 se a contagem não bater ou passar de IMPORT_BATCH_MAX_FILES.
+    Returns: (caminho, domain_id) por arquivo (o chamador remove depois de usar)
+    """
+    if len(files) > settings.IMPORT_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.IMPORT_BATCH_MAX_FILES} arquivos por lote"
+        )
+    if len(domain_ids) not in (1, len(files)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe um domain_id para todos os arquivos ou um por arquivo"
+        )
+    if len(domain_ids) == 1:
+        domain_ids = list(domain_ids) * len(files)
+
+    paths: List[str] = []
+    try:
+        for file in files:
+            paths.append(await save_upload(file, prefix=prefix))
+    except BaseException:
+        for path in paths:
+            remove_upload(path)
+        raise
+    return list(zip(paths, domain_ids))
+
+
+def remove_upload(path: str) -> None:
+    """Remove um arquivo de upload, ignorando se já não existir"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# ============= UPLOAD EM PARTES =============
+
+def create_upload_session(client_id: int, filename: Optional[str], total_size: Optional[int]) -> str:
+    """
+    Cria a sessão e o arquivo vazio em UPLOAD_DIR (sessões vencidas são
+    removidas aqui). Levanta 413 se total_size passar de UPLOAD_SESSION_MAX_SIZE_MB.
+    Returns: id da sessão
+    """
+    if total_size is not None and total_size > settings.UPLOAD_SESSION_MAX_SIZE_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Arquivo maior que {settings.UPLOAD_SESSION_MAX_SIZE_MB} MB"
+        )
+    purge_expired_sessions()
+
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    upload_id = uuid4().hex
+    suffix = os.path.splitext(filename or "")[1].lower()
+    path = os.path.join(settings.UPLOAD_DIR, f"session_{upload_id}{suffix}")
+    open(path, "wb").close()
+
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(UploadSession).values(
+            id=upload_id, client_id=client_id, filename=filename, path=path,
+            total_size=total_size, created_at=now, updated_at=now
+        ))
+    return upload_id
+
+
+async def append_upload_part(session: UploadSession, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """
+    Anexa a parte recebida ao arquivo da sessão, a partir de offset.
+    Levanta 409 se offset não for o tamanho já gravado ou se outra parte da
+    sessão estiver sendo gravada; 413 se passar do tamanho anunciado (ou de
+    UPLOAD_SESSION_MAX_SIZE_MB). O que chegou antes de uma queda fica gravado.
+    Returns: novo offset (tamanho gravado)
+    """
+    max_bytes = session.total_size or settings.UPLOAD_SESSION_MAX_SIZE_MB * 1024 * 1024
+    try:
+        out = open(session.path, "ab")
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload não encontrado")
+
+    try:
+        try:
+            fcntl.flock(out.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Outra parte deste upload está sendo gravada"
+            )
+        size = os.fstat(out.fileno()).st_size
+        if offset != size:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Offset {offset} diferente do tamanho já recebido ({size})",
+                headers={"Upload-Offset": str(size)}
+            )
+        async for chunk in chunks:
+            if size + len(chunk) > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Upload maior que o limite de {max_bytes} bytes"
+                )
+            await asyncio.to_thread(out.write, chunk)
+            size += len(chunk)
+    finally:
+        # Fecha (grava o buffer) antes de liberar o lock
+        out.close()
+
+    with engine.begin() as conn:
+        conn.execute(update(UploadSession).where(UploadSession.id == session.id).values(updated_at=datetime.utcnow()))
+    return size
+
+
+def open_upload_session(upload_id: str, client_id: int) -> str:
+    """
+    Arquivo da sessão completa, para um import. A sessão continua existindo
+    até release_import_file(..., done=True); a validade conta da última
+    tentativa de import.
+    Levanta 404 se a sessão não existe e 409 se o upload está incompleto ou
+    recebendo uma parte.
+    Returns: caminho do arquivo
+    """
+    with engine.begin() as conn:
+        session = conn.execute(
+            select(UploadSession).where(UploadSession.id == upload_id, UploadSession.client_id == client_id)
+        ).first()
+        if session is None or not os.path.exists(session.path):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload não encontrado")
+
+        with open(session.path, "rb") as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Upload ainda recebendo uma parte"
+                )
+            size = os.fstat(f.fileno()).st_size
+            if session.total_size is not None and size != session.total_size:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Upload incompleto: {size} de {session.total_size} bytes",
+                    headers={"Upload-Offset": str(size)}
+                )
+        conn.execute(update(UploadSession).where(UploadSession.id == upload_id).values(updated_at=datetime.utcnow()))
+    return session.path
+
+
+def delete_upload_session(upload_id: str, client_id: int) -> bool:
+    """Returns: False se a sessão não existe (ou é de outro cliente)"""
+    with engine.begin() as conn:
+        path = conn.scalar(
+            select(UploadSession.path).where(UploadSession.id == upload_id, UploadSession.client_id == client_id)
+        )
+        if path is None:
+            return False
+        conn.execute(delete(UploadSession).where(UploadSession.id == upload_id))
+    remove_upload(path)
+    return True
+
+
+def purge_expired_sessions() -> int:
+    """
+    Remove sessões sem partes novas e checkpoints de imports abandonados
+    (sem bloco novo) há mais de UPLOAD_SESSION_TTL_HOURS.
+    Returns: número de sessões removidas
+    """
+    expired_before = datetime.utcnow() - timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+    with engine.begin() as conn:
+        expired = conn.execute(
+            select(UploadSession.id, UploadSession.path).where(UploadSession.updated_at < expired_before)
+        ).all()
+        if expired:
+            conn.execute(delete(UploadSession).where(UploadSession.id.in_([row.id for row in expired])))
+        conn.execute(delete(ImportCheckpoint).where(ImportCheckpoint.updated_at < expired_before))
+    for row in expired:
+        remove_upload(row.path)
+    return len(expired)
+
+
+async def resolve_import_file(file: Optional[UploadFile], upload_id: Optional[str], client_id: int,
+                              prefix: str) -> str:
+    """
+    Arquivo de um import: o upload direto (multipart) ou a sessão de upload
+    em partes já completa (upload_id). Levanta 400 se vierem os dois ou nenhum.
+    Sessões e checkpoints vencidos são removidos aqui.
+    Returns: caminho do arquivo (o chamador libera com release_import_file)
+    """
+    if (file is None) == (upload_id is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Envie o arquivo (file) ou o id de um upload em partes (upload_id)"
+        )
+    await asyncio.to_thread(purge_expired_sessions)
+    if upload_id is not None:
+        return await asyncio.to_thread(open_upload_session, upload_id, client_id)
+    return await save_upload(file, prefix=prefix)
+
+
+def release_import_file(path: str, upload_id: Optional[str], done: bool) -> None:
+    """
+    Libera o arquivo de resolve_import_file depois do import. O upload direto
+    é sempre removido (um novo envio do mesmo arquivo continua do checkpoint);
+    a sessão de upload em partes só é removida quando o import terminou
+    (done), senão fica para repetir o import com o mesmo upload_id.
+    """
+    if upload_id is None:
+        remove_upload(path)
+    elif done:
+        with engine.begin() as conn:
+            conn.execute(delete(UploadSession).where(UploadSession.id == upload_id))
+        remove_upload(path)
@@ -0,0 +1,25 @@
+"""
+Normalização de URLs (chaves de deduplicação de backlinks e do crawler)
+"""
+from urllib.parse import urlsplit, urlunsplit
+
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Forma canônica para comparação: esquema e host em minúsculas, sem porta
+    padrão e sem fragmento; path vazio vira "/"
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    host, separator, port = netloc.rpartition(":")
+    if separator and DEFAULT_PORTS.get(scheme) == port:
+        netloc = host
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
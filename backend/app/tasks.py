@@ -0,0 +1,62 @@
+"""
+Worker do Celery para os jobs em background (app/services/jobs.py).
+
+    celery -A app.tasks.celery_app worker --loglevel=info
+    celery -A app.tasks.celery_app worker -Q parallel --pool=threads --concurrency=2 --loglevel=info
+
+O segundo worker consome JOBS_PARALLEL_QUEUE (import em lote, análise
+on-page). Esses jobs distribuem o trabalho em um pool de processos, que o
+worker prefork (processos daemon) não pode criar; no worker de threads o
+processo principal não é daemon e os pools usam todos os núcleos.
+--concurrency limita quantos desses jobs rodam ao mesmo tempo, todos
+dividindo o mesmo pool.
+
+Estado, progresso e resultado ficam na tabela jobs (a API lê de lá); o
+result backend do Celery não é usado.
+"""
+from celery import Celery
+from celery.signals import worker_process_init
+import time
+from app.config import settings
+from app.database import engine
+from app.services import jobs
+
+
+celery_app = Celery(
+    "seo_api",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND
+)
+celery_app.conf.update(
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    task_ignore_result=True,
+    task_serializer="json",
+    accept_content=["json"],
+    # Jobs longos: cada processo do worker reserva um de cada vez
+    worker_prefetch_multiplier=1,
+    # Confirma a task só no fim: se o worker morrer no meio, o broker reentrega
+    # e o job é reassumido (jobs.claim_job)
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+)
+
+
+@worker_process_init.connect
+def reset_engine(**kwargs) -> None:
+    """Conexões do pool herdadas do processo pai não são reaproveitadas após o fork"""
+    engine.dispose(close=False)
+
+
+@celery_app.task(name="jobs.run", bind=True, max_retries=None)
+def run_job_task(self, job_id: str) -> str:
+    outcome = jobs.run_job(job_id)
+    if outcome == "deferred":
+        if self.request.is_eager:
+            # Sem broker (testes): espera a vaga aqui mesmo
+            while outcome == "deferred":
+                time.sleep(settings.JOBS_RETRY_SECONDS)
+                outcome = jobs.run_job(job_id)
+            return outcome
+        # Cliente no limite de jobs em execução: volta para a fila
+        raise self.retry(countdown=settings.JOBS_RETRY_SECONDS)
+    return outcome
@@ -0,0 +1,133 @@
+"""
+Benchmark da leitura de imports.
+
+Formatos: gera o mesmo arquivo de rankings em CSV e XLSX e mede, em um
+processo separado para cada formato, a leitura em blocos + validação
+(read_chunks e prepare_rankings, o caminho que muda entre os formatos; a
+gravação no banco é a mesma) e o pico de memória do processo.
+
+Lote (--files N): N arquivos CSV lidos e validados em sequência x pelo pool
+de parsing do import em lote (importers/batch.py, IMPORT_PARSE_WORKERS
+processos, blocos voltando pela fila para um consumidor que não grava).
+
+    python benchmark_import.py --rows 500000
+    python benchmark_import.py --rows 100000 --files 16
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import resource
+import shutil
+import tempfile
+import time
+
+from openpyxl import Workbook
+
+from app.services.importers.batch import parse_pool, parse_file, parse_workers
+from app.services.importers.semrush_importer import read_chunks, map_columns, parse_chunks, PREPARERS
+
+HEADER = ["Keyword", "Position", "Previous position", "Search Volume", "CPC", "URL", "Traffic", "Timestamp"]
+
+
+def generate_rows(count):
+    for i in range(count):
+        yield [f"keyword {i}", i % 100 + 1, i % 90 + 1, i * 10 % 50000, 1.25, f"https://example.com/page/{i}",
+               i % 700 / 10, f"2026-10-{i % 28 + 1:02d}"]
+
+
+def write_csv(directory, count):
+    csv_path = os.path.join(directory, "rankings.csv")
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write(",".join(HEADER) + "\n")
+        for row in generate_rows(count):
+            f.write(",".join(str(value) for value in row) + "\n")
+    return csv_path
+
+
+def write_xlsx(directory, count):
+    xlsx_path = os.path.join(directory, "rankings.xlsx")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for row in generate_rows(count):
+        sheet.append(row)
+    workbook.save(xlsx_path)
+    return xlsx_path
+
+
+def measure(path, chunk_rows, results):
+    started_at = time.perf_counter()
+    rows = 0
+    mapping = None
+    for chunk, _, _ in read_chunks(path, chunk_rows):
+        if mapping is None:
+            mapping, _ = map_columns(chunk.columns, "rankings")
+        prepared, _ = PREPARERS["rankings"](chunk[list(mapping)].rename(columns=mapping))
+        rows += len(prepared)
+    elapsed = time.perf_counter() - started_at
+    # ru_maxrss em KB no Linux
+    results.put((rows, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def benchmark_batch(directory, rows, files, chunk_rows):
+    source = write_csv(directory, rows)
+    paths = [source]
+    for index in range(1, files):
+        paths.append(shutil.copy(source, os.path.join(directory, f"rankings_{index}.csv")))
+    total = rows * files
+
+    started_at = time.perf_counter()
+    for path in paths:
+        for _ in parse_chunks(path, "rankings", chunk_rows):
+            pass
+    sequential = time.perf_counter() - started_at
+    print(f"sequencial: {sequential:6.2f}s  {total / sequential:9.0f} linhas/s")
+
+    with multiprocessing.Manager() as manager:
+        results, stop = manager.Queue(2 * parse_workers()), manager.Event()
+        started_at = time.perf_counter()
+        for index, path in enumerate(paths):
+            parse_pool.submit(parse_file, index, path, "rankings", chunk_rows, 0, 0, results, stop)
+        finished = 0
+        while finished < files:
+            try:
+                _, kind, _ = results.get(timeout=60)
+            except queue.Empty:
+                break
+            finished += kind != "chunk"
+        parallel = time.perf_counter() - started_at
+    print(f"pool ({parse_workers()} processos): {parallel:6.2f}s  {total / parallel:9.0f} linhas/s  "
+          f"speedup {sequential / parallel:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de leitura CSV x XLSX e do import em lote")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    parser.add_argument("--files", type=int, default=0, help="Benchmark do lote com N arquivos de --rows linhas")
+    args = parser.parse_args()
+
+    if args.files:
+        with tempfile.TemporaryDirectory() as directory:
+            print(f"Gerando {args.files} arquivos de {args.rows} linhas...")
+            benchmark_batch(directory, args.rows, args.files, args.chunk_rows)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Gerando {args.rows} linhas...")
+        paths = [write_csv(directory, args.rows), write_xlsx(directory, args.rows)]
+        context = multiprocessing.get_context("spawn")
+        for path in paths:
+            results = context.Queue()
+            process = context.Process(target=measure, args=(path, args.chunk_rows, results))
+            process.start()
+            rows, elapsed, peak_mb = results.get()
+            process.join()
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"{os.path.splitext(path)[1][1:]:>4}: {size_mb:7.1f} MB  {rows} linhas  {elapsed:6.2f}s  "
+                  f"{rows / elapsed:9.0f} linhas/s  pico de memória {peak_mb:6.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -55,9 +55,10 @@ def seed_database():
 
             # 1. Insert Client
             client_query = text("""
-                INSERT INTO clients (id, name, company, email, is_active, max_api_keys, rate_limit_per_minute, rate_limit_per_day, created_at, updated_at)
-                VALUES (:id, :name, 'FBR Apps', :email, true, 5, 120, 50000, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, email = EXCLUDED.email
+                INSERT INTO clients (id, name, company, email, is_active, max_api_keys, rate_limit_per_minute, rate_limit_per_day, rate_limit_algorithm, created_at, updated_at)
+                VALUES (:id, :name, 'FBR Apps', :email, true, 5, 120, 50000, 'local_lease', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, email = EXCLUDED.email,
+                    rate_limit_algorithm = EXCLUDED.rate_limit_algorithm
             """)
             
             conn.execute(client_query, {